@@ -5,114 +5,345 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import sys
+import math
 import time
+import random
 import pygame
-from pygame.locals import QUIT, KEYUP
+from pygame.locals import QUIT, KEYUP, NOEVENT, VIDEOEXPOSE
 from game import GameState
 from game import GameOverState
 from menu import MenuState
-from solver import SolverState
+from solver import MAX_MODULAR_SIZE, SolverState, SolutionPlayer
+from frames import DEFAULT_FPS, FramePacer, FrameTimeOverlay
+from assets import assets
+from levels import DEFAULT_DIFFICULTY, LevelGenerator, LevelPool
+from levels import difficulty_band
+from levelpack import LevelPack
+from topology import DEFAULT_TOPOLOGY, get_topology
+from replay import InputRecorder
+from scheduler import Scheduler
+from startup import startup
+from memory import app_report
 
-# TODO: Create a better Event system.
 
 class App(object):
 
-    def __init__(self, dev=False):
+    def __init__(self, dev=False, fps=DEFAULT_FPS,
+            difficulty=DEFAULT_DIFFICULTY, level_pack=None, game_size=5,
+            profiler=None, profile_path=None, topology=DEFAULT_TOPOLOGY,
+            states=2, seed=None, record_path=None, speed=1,
+            startup_report=False, mem_report=False, clock=time.perf_counter):
         self.dev = dev
+        self.game_size = game_size
+        self.topology = get_topology(topology)
+        self.states = states
+        self.pacer = FramePacer(fps)
+
+        # Whether to print how long starting up took, once the first frame is
+        # drawn.
+        self.startup_report = startup_report
+
+        # Whether to print the memory used by each part of the game on exit.
+        self.mem_report = mem_report
+
+        # Timers and tweens of the states, such as the solver's steps. `speed`
+        # scales their delays, up to `INSTANT`. `clock` is their time source,
+        # and the recorder's, which a replay stands in for.
+        self.scheduler = Scheduler(clock, speed)
+
+        # All the randomness of levels comes from this, so a game started again
+        # with the same seed gets the same levels. A recording needs a seed to
+        # save, so one is made up if none is given.
+        if seed is None and record_path is not None:
+            seed = random.SystemRandom().getrandbits(63)
+
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # When recording, the input goes to a log that `replay.py` can play
+        # back. The settings are what it needs to start the same `App` again.
+        self.recorder = None
+
+        if record_path is not None:
+            self.recorder = InputRecorder(record_path, seed, {
+                'dev': dev,
+                'difficulty': difficulty,
+                'level_pack': level_pack,
+                'game_size': game_size,
+                'topology': self.topology.name,
+                'states': states,
+                'speed': speed,
+            }, clock)
+
+        # When profiling, the main loop's work is timed into `profiler` and
+        # saved as a trace to `profile_path` on exit.
+        self.profiler = profiler
+        self.profile_path = profile_path
+
+        if self.profiler is not None:
+            self.profiler.instrument(self, 'handle')
+            self.profiler.instrument(self, 'update')
+            self.profiler.instrument(self, 'draw')
+            self.profiler.instrument(self, 'update_display')
+            self.profiler.instrument(SolutionPlayer, 'step')
+
+        # Levels for new games are generated, or picked from a level pack,
+        # ahead of time in the background. Levels with more than two light
+        # states are only made up by the game model, at random.
+        if states != 2:
+            level_source = None
+
+            if level_pack is not None:
+                raise ValueError('Level packs are only for lights with two '
+                        'states.')
+
+            if game_size > MAX_MODULAR_SIZE:
+                raise ValueError('Boards with lights of more than two states '
+                        'are at most {0}x{0}.'.format(MAX_MODULAR_SIZE))
+
+        elif level_pack is None:
+            level_source = LevelGenerator.for_difficulty(self.game_size,
+                    difficulty, self.rng, topology=self.topology)
+        else:
+            pack = LevelPack(level_pack)
 
-        pygame.init()
+            if (pack.size, pack.topology) != (self.game_size,
+                    self.topology.name):
+                raise ValueError('Expected a pack of {0}x{0} {1} levels, got '
+                        '{2}x{2} {3}.'.format(self.game_size,
+                            self.topology.name, pack.size, pack.topology))
 
-        self.display = pygame.display.set_mode((320, 420))
-        pygame.display.set_caption('Lights poof!')
+            level_source = pack.generator(*difficulty_band(pack.size,
+                    difficulty), rng=self.rng)
 
-        self.init_bg_surface()
+        with startup.phase('app', 'level pool'):
+            self.level_pool = (None if level_source is None else
+                    LevelPool(level_source))
 
-        self.solver = SolverState(self.display)
-        self.solver.listen('done-solving', self.on_solver_done)
+        # Whether the whole display needs to be drawn on the next frame, and not
+        # just the parts that changed.
+        self.full_redraw = True
 
-        self.game_over_state = GameOverState(self.display)
-        self.game_over_state.listen('resume-click', self.on_resume_click)
-        self.game_over_state.listen('new-click', self.on_new_click)
-        self.game_over_state.listen('restart-click', self.on_restart_click)
-        self.game_over_state.listen('solve-click', self.on_solve_click)
+        with startup.phase('app', 'pygame.init'):
+            pygame.init()
 
-        self.init_new_game()
+        with startup.phase('app', 'display'):
+            self.display = pygame.display.set_mode((320, 420))
+            pygame.display.set_caption('Lights poof!')
+
+        with startup.phase('app', 'background'):
+            self.init_bg_surface()
 
-        self.menu = MenuState(self.display)
-        self.menu.listen('resume-click', self.on_resume_click)
-        self.menu.listen('new-click', self.on_new_click)
-        self.menu.listen('restart-click', self.on_restart_click)
-        self.menu.listen('solve-click', self.on_solve_click)
+        # Frame time stats, shown only in dev mode.
+        self.frame_overlay = (FrameTimeOverlay(self.display, self.pacer)
+                if self.dev else None)
+
+        # Only the game is needed for the first frame. The other states are
+        # built the first time they are asked for.
+        self._solver = self._game_over_state = self._menu = None
+
+        self.init_new_game()
 
         self.current_state = None
         self.set_state(self.game)
 
+        if self.dev:
+            print('Asset load times:')
+            print(assets.report())
+
     def main_loop(self):
 
+        # The first frame goes up right away, not with the first event.
+        self.draw()
+        startup.mark_first_frame()
+
+        if self.startup_report:
+            print('Startup:')
+            print(startup.report(assets.load_times))
+
         while True:
 
+            # Sleep until there's an event or a timer is due, then take all the
+            # events that are queued.
+            timeout = self.scheduler.timeout()
+
+            if timeout is None:
+                event = pygame.event.wait()
+            else:
+                # A timeout of 0 would wait for an event forever.
+                event = pygame.event.wait(max(1, int(math.ceil(
+                        timeout * 1000))))
+
+            self.pacer.begin_frame()
+
+            if event.type != NOEVENT:
+                self.handle(event)
+
             for event in pygame.event.get():
                 self.handle(event)
 
+            self.update()
             self.draw()
-            time.sleep(.01)
+            self.pacer.end_frame()
+
+    def update(self):
+        # Run the timers and tweens that are due. This might change the current
+        # state.
+        self.scheduler.advance()
 
     def draw(self):
-        # Draw background.
-        self.display.blit(self.bg_surface, (0, 0))
 
-        # Draw the state.
-        self.current_state.draw()
+        if self.full_redraw:
+            rects = [self.display.get_rect()]
+            self.full_redraw = False
+        else:
+            rects = self.current_state.dirty_rects()
+
+        if self.frame_overlay is not None:
+            self.frame_overlay.render()
+            rects.append(self.frame_overlay.rect)
+
+        # Nothing changed, nothing to draw.
+        if not rects:
+            return
+
+        for rect in rects:
+            # Restore the background under the rect and draw the state over
+            # it, without touching anything outside of it.
+            self.display.set_clip(rect)
+            self.display.blit(self.bg_surface, rect, rect)
+            self.current_state.draw(rect)
+
+            if self.frame_overlay is not None:
+                self.frame_overlay.draw(rect)
+
+        self.display.set_clip(None)
+
+        self.update_display(rects)
 
-        # Update the display.
-        pygame.display.update()
+    def update_display(self, rects):
+        # Update only the changed parts of the display.
+        pygame.display.update(rects)
 
     def handle(self, event):
 
+        if self.recorder is not None:
+            self.recorder.record(event)
+
         if event.type == QUIT or (event.type == KEYUP and event.key == 27):
-            pygame.quit()
-            sys.exit()
+            self.quit()
+
+        elif event.type == VIDEOEXPOSE:
+            self.full_redraw = True
 
         else:
             self.current_state.handle(event)
 
+    def quit(self):
+
+        if self.mem_report:
+            print('Memory:')
+            print(app_report(self).format())
+
+        if self.recorder is not None:
+            self.recorder.close()
+            print('Recorded {} events.'.format(self.recorder.count))
+
+        if self.profiler is not None:
+            self.profiler.dump(self.profile_path)
+            print('Saved a trace of {} samples to {}.'.format(
+                    min(self.profiler.count, self.profiler.capacity),
+                    self.profile_path))
+
+        pygame.quit()
+        sys.exit()
+
     def init_bg_surface(self):
-        bg_image = pygame.image.load('img/bg.png')
-        self.bg_surface = pygame.Surface(self.display.get_size())
+        self.bg_surface = assets.tiled('bg', self.display.get_size())
+
+    @property
+    def solver(self):
+
+        if self._solver is None:
+            with startup.phase('state', 'SolverState'):
+                self._solver = SolverState(self.display, self.scheduler)
+
+            self._solver.listen('done-solving', self.on_solver_done)
+            self._solver.game = self.game
+
+        return self._solver
 
-        x = y = 0
-        image_width, image_height = bg_image.get_size()
-        bg_width, bg_height = self.display.get_size()
+    @property
+    def game_over_state(self):
 
-        while x < bg_width:
-            y = 0
+        if self._game_over_state is None:
+            with startup.phase('state', 'GameOverState'):
+                self._game_over_state = GameOverState(self.display)
 
-            while y < bg_height:
-                self.bg_surface.blit(bg_image, (x, y))
-                y += image_height
+            self.listen_to_menu(self._game_over_state)
+            self._game_over_state.game = self.game
 
-            x += image_width
+        return self._game_over_state
+
+    @property
+    def menu(self):
+
+        if self._menu is None:
+            with startup.phase('state', 'MenuState'):
+                self._menu = MenuState(self.display)
+
+            self.listen_to_menu(self._menu)
+
+        return self._menu
+
+    def listen_to_menu(self, state):
+        state.listen('resume-click', self.on_resume_click)
+        state.listen('new-click', self.on_new_click)
+        state.listen('restart-click', self.on_restart_click)
+        state.listen('solve-click', self.on_solve_click)
 
     def init_new_game(self):
-        self.game = GameState(self.display,
-                level=([(2, 2)] if self.dev else None))
+
+        with startup.phase('app', 'level'):
+            if self.dev:
+                level = [(2, 2)]
+            elif self.level_pool is not None:
+                level = self.level_pool.take()
+            else:
+                level = None
+
+        with startup.phase('state', 'GameState'):
+            self.game = GameState(self.display, level=level,
+                    game_size=self.game_size, topology=self.topology,
+                    states=self.states, rng=self.rng,
+                    scheduler=self.scheduler)
+
         self.game.listen('menu-click', self.on_menu_click)
         self.game.listen('game-over', self.on_game_over)
 
-        self.solver.game = self.game
+        # States that aren't built yet get the game when they are.
+        if self._solver is not None:
+            self._solver.game = self.game
 
-        self.game_over_state.game = self.game
+        if self._game_over_state is not None:
+            self._game_over_state.game = self.game
 
     def set_state(self, state):
         old_state = self.current_state
         self.current_state = state
 
+        if self.profiler is not None:
+            for method in ('handle', 'draw'):
+                self.profiler.instrument(state, method)
+
         if hasattr(old_state, 'deactivated'):
             old_state.deactivated()
 
         if hasattr(self.current_state, 'activated'):
             self.current_state.activated()
 
+        self.full_redraw = True
+
     def on_menu_click(self, event):
         self.set_state(self.menu)
 
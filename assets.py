@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import time
+import pygame
+from collections import OrderedDict
+from pygame.locals import SRCALPHA
+
+
+class AssetManager(object):
+    """Loads every image and font once and keeps them around.
+
+    Images are converted to the display's pixel format as they are loaded, so
+    the display must be set up before the first one is asked for. Rendered text
+    is memoized too, so it should only be used for text that doesn't change
+    all the time.
+    """
+
+    def __init__(self, image_dir='img'):
+        self.image_dir = image_dir
+        self.images = {}
+        self.fonts = {}
+        self.texts = {}
+        self.tiles = {}
+        self.light_states = {}
+
+        # Seconds taken to load each asset, in load order.
+        self.load_times = OrderedDict()
+
+    def image(self, name):
+
+        try:
+            return self.images[name]
+        except KeyError:
+            pass
+
+        path = '{}/{}.png'.format(self.image_dir, name)
+        start = time.perf_counter()
+
+        surface = pygame.image.load(path)
+        if surface.get_flags() & SRCALPHA:
+            surface = surface.convert_alpha()
+        else:
+            surface = surface.convert()
+
+        self.load_times[path] = time.perf_counter() - start
+        self.images[name] = surface
+
+        return surface
+
+    def tiled(self, name, size):
+        """A surface of `size` covered with the image `name`, side by side
+        from the top left."""
+
+        key = name, tuple(size)
+
+        try:
+            return self.tiles[key]
+        except KeyError:
+            pass
+
+        image = self.image(name)
+        start = time.perf_counter()
+
+        surface = pygame.Surface(size).convert()
+        width, height = size
+        image_width, image_height = image.get_size()
+
+        surface.blits([(image, (x, y))
+                for x in range(0, width, image_width)
+                for y in range(0, height, image_height)], doreturn=False)
+
+        self.load_times['{} tiled {}x{}'.format(name, width, height)] = (
+                time.perf_counter() - start)
+        self.tiles[key] = surface
+
+        return surface
+
+    def state_images(self, states):
+        """An image per light state, from off to fully on. States in between
+        fade the on image in over the off one."""
+
+        try:
+            return self.light_states[states]
+        except KeyError:
+            pass
+
+        off_image = self.image('light-off')
+        on_image = self.image('light-on')
+        start = time.perf_counter()
+        images = [off_image]
+
+        for value in range(1, states - 1):
+            image = off_image.copy()
+            faded = on_image.copy()
+            faded.set_alpha(255 * value // (states - 1))
+            image.blit(faded, (0, 0))
+            images.append(image)
+
+        images.append(on_image)
+
+        self.load_times['light states ({})'.format(states)] = (
+                time.perf_counter() - start)
+        self.light_states[states] = images
+
+        return images
+
+    def font(self, filename, size):
+        key = filename, size
+
+        try:
+            return self.fonts[key]
+        except KeyError:
+            pass
+
+        start = time.perf_counter()
+        font = self.fonts[key] = pygame.font.Font(filename, size)
+        self.load_times['{} ({})'.format(filename, size)] = (
+                time.perf_counter() - start)
+
+        return font
+
+    def text(self, filename, size, text, color):
+        """The antialiased `text` rendered in the font, in `color`."""
+
+        key = filename, size, text, tuple(color)
+
+        try:
+            return self.texts[key]
+        except KeyError:
+            surface = self.font(filename, size).render(text, True, color)
+            surface = self.texts[key] = surface.convert_alpha()
+            return surface
+
+    def report(self):
+        """Load times of all the assets, slowest first."""
+
+        lines = ['{:8.2f} ms  {}'.format(seconds * 1000, name)
+                for name, seconds in sorted(self.load_times.items(),
+                    key=lambda item: item[1], reverse=True)]
+
+        lines.append('{:8.2f} ms  total, {} images, {} fonts, {} texts'.format(
+                sum(self.load_times.values()) * 1000, len(self.images),
+                len(self.fonts), len(self.texts)))
+
+        return '\n'.join(lines)
+
+
+assets = AssetManager()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Solve many boards at once with NumPy.
+
+Boards are rows of an `(N, size * size)` uint8 array, one cell per column in
+the same order as the bits of `Board.state`. Run this module to solve a `.npy`
+file of boards or to benchmark against the scalar solver:
+
+    python batch.py solve boards.npy -o solutions.npz
+    python batch.py bench --size 5 --count 1000000
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import time
+import argparse
+import numpy as np
+from board import popcount
+from cache import default_cache
+from solver import MAX_ENUMERATED_NULLITY, TOPOLOGY, get_solver
+
+# Boards are solved this many at a time, to keep the intermediate arrays small.
+CHUNK_SIZE = 1 << 16
+
+# Up to this many dimensions, the null space is enumerated with one pass over
+# the boards per vector in it. Above, and up to the scalar solver's
+# `MAX_ENUMERATED_NULLITY`, each board is compared with the whole null space
+# instead, see `BatchSolver.minimize_each`. Beyond that, basis vectors are
+# applied greedily, as in the scalar solver.
+MAX_PASSES_NULLITY = 10
+
+# Combinations of the null space compared with one board at a time, as bits.
+NULL_CHUNK_BITS = 12
+
+try:
+    bit_count = np.bitwise_count
+except AttributeError:
+    # NumPy before 2.0. Count 16 bits at a time from a table.
+    BIT_COUNTS = np.array([popcount(n) for n in range(1 << 16)],
+            dtype=np.uint8)
+
+    def bit_count(values):
+        counts = np.zeros(values.shape, dtype=np.uint8)
+
+        for shift in range(0, 64, 16):
+            counts += BIT_COUNTS[(values >> np.uint64(shift)) & np.uint64(
+                    0xffff)]
+
+        return counts
+
+
+def states_to_boards(states, size):
+    """Convert `Board.state` integers into an `(N, size * size)` array."""
+
+    cells = size * size
+    width = (cells + 7) // 8
+    data = b''.join(state.to_bytes(width, 'little') for state in states)
+    packed = np.frombuffer(data, dtype=np.uint8).reshape(-1, width)
+
+    return np.unpackbits(packed, axis=1, count=cells, bitorder='little')
+
+
+def boards_to_states(boards):
+    """Convert an `(N, size * size)` array of boards into integers."""
+
+    packed = np.packbits(boards, axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+def unpack_matrix(matrix):
+    """A `PackedMatrix` as a uint8 array with one column per bit."""
+
+    if not matrix.nbytes:
+        return np.zeros((matrix.rows, matrix.width), dtype=np.uint8)
+
+    packed = np.frombuffer(matrix.buffer, dtype=np.uint8).reshape(matrix.rows,
+            matrix.row_bytes)
+
+    return np.unpackbits(packed, axis=1, count=matrix.width, bitorder='little')
+
+
+def pack_words(rows):
+    """Bit-pack the rows of a uint8 array of bits into uint64 words."""
+
+    packed = np.packbits(rows, axis=1, bitorder='little')
+    padding = -packed.shape[1] % 8
+    packed = np.pad(packed, ((0, 0), (0, padding)))
+
+    return np.ascontiguousarray(packed).view('<u8')
+
+
+def gray_combinations(basis):
+    """Every combination of the rows of `basis`, in Gray code order so that
+    each one differs from the previous by one basis vector."""
+
+    combinations = np.zeros((1 << len(basis),) + basis.shape[1:],
+            dtype=basis.dtype)
+
+    for step in range(1, 1 << len(basis)):
+        vector = basis[(step & -step).bit_length() - 1]
+        combinations[step] = combinations[step - 1] ^ vector
+
+    return combinations
+
+
+def batch_matrices(size):
+    """Tabulate the scalar solver's linear maps for `MatrixCache`.
+
+    Row `b` of `pseudo_inverse` is the press pattern for the board with only
+    cell `b` lit, and of `consistency` the parity of each check for it.
+    """
+
+    solver = get_solver(size)
+    checks = solver.elimination.checks
+    pseudo_inverse = []
+    consistency = []
+
+    for index in range(solver.cell_count):
+        presses, residual = solver.reduce(1 << index)
+        pseudo_inverse.append(presses)
+        consistency.append(sum((popcount(check & residual) & 1) << c
+                for c, check in enumerate(checks)))
+
+    return {
+        'pseudo_inverse': (pseudo_inverse, solver.cell_count),
+        'consistency': (consistency, len(checks)),
+        'null_basis': (solver.null_basis, solver.cell_count),
+    }
+
+
+class BatchSolver(object):
+    """Vectorized counterpart of `BoardSolver` for a single board size.
+
+    The scalar solver's particular solution and consistency checks are linear
+    in the board, so they are tabulated once as matrices over GF(2) by
+    `batch_matrices`. Solving a batch is then a matrix product mod 2, followed
+    by a pass per null space vector to pick the fewest presses. Solutions are
+    minimal as long as the scalar solver's are, up to `MAX_ENUMERATED_NULLITY`
+    dimensions of null space.
+    """
+
+    def __init__(self, size, matrices):
+        self.size = size
+        self.cells = size * size
+
+        self.inverse = unpack_matrix(matrices['pseudo_inverse']).astype(
+                np.float32)
+        self.consistency = unpack_matrix(matrices['consistency']).astype(
+                np.float32)
+        self.null_basis = unpack_matrix(matrices['null_basis'])
+
+        nullity = len(self.null_basis)
+        self.null_space = self.low_space = self.high_basis = None
+
+        if nullity <= MAX_PASSES_NULLITY:
+            self.null_space = gray_combinations(self.null_basis)[1:]
+
+        elif nullity <= MAX_ENUMERATED_NULLITY:
+            # The combinations of the low basis vectors as a table of packed
+            # words, and the high ones to step through it in Gray code.
+            basis = pack_words(self.null_basis)
+            self.low_space = gray_combinations(basis[:NULL_CHUNK_BITS])
+            self.high_basis = basis[NULL_CHUNK_BITS:]
+
+        self.nbytes = sum(array.nbytes for array in (self.inverse,
+                self.consistency, self.null_basis, self.null_space,
+                self.low_space) if array is not None)
+
+    def solve(self, boards):
+        """Solve every board of an `(N, size * size)` uint8 array.
+
+        Returns a boolean array of which boards are solvable, and a uint8 array
+        with the minimal solution of each board, as presses per cell. Rows of
+        unsolvable boards are all zero.
+        """
+
+        boards = np.asarray(boards, dtype=np.uint8)
+
+        if boards.ndim != 2 or boards.shape[1] != self.cells:
+            raise ValueError('Expected boards of shape (N, {}), got {}.'.format(
+                    self.cells, boards.shape))
+
+        solvable = np.empty(len(boards), dtype=bool)
+        solutions = np.empty(boards.shape, dtype=np.uint8)
+
+        for start in range(0, len(boards), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            solvable[chunk], solutions[chunk] = self.solve_chunk(boards[chunk])
+
+        return solvable, solutions
+
+    def solve_chunk(self, boards):
+        # Sums stay far below 2 ** 24, so float32 products are exact and use
+        # the BLAS matrix multiply.
+        values = boards.astype(np.float32)
+
+        if self.consistency.shape[1]:
+            parities = (values @ self.consistency).astype(np.int32) & 1
+            solvable = ~parities.any(axis=1)
+        else:
+            solvable = np.ones(len(boards), dtype=bool)
+
+        presses = ((values @ self.inverse).astype(np.int32) & 1).astype(
+                np.uint8)
+        presses[~solvable] = 0
+        presses[solvable] = self.minimize(presses[solvable])
+
+        return solvable, presses
+
+    def minimize(self, presses):
+
+        if self.low_space is not None:
+            return self.minimize_each(presses)
+
+        if self.null_space is None:
+            return self.reduce_greedily(presses)
+
+        best = presses.copy()
+        best_counts = presses.sum(axis=1, dtype=np.int32)
+
+        for vector in self.null_space:
+            candidates = presses ^ vector
+            counts = candidates.sum(axis=1, dtype=np.int32)
+            better = counts < best_counts
+
+            best[better] = candidates[better]
+            best_counts[better] = counts[better]
+
+        return best
+
+    def minimize_each(self, presses):
+        """Minimize one board at a time, against a chunk of `2 **
+        NULL_CHUNK_BITS` combinations of the null space at once."""
+
+        low_space = self.low_space
+        high_basis = self.high_basis
+
+        for row, packed in zip(presses, pack_words(presses)):
+            best_count = None
+            offset = packed
+
+            for step in range(1 << len(high_basis)):
+                if step:
+                    offset = offset ^ high_basis[(step & -step).bit_length()
+                            - 1]
+
+                counts = bit_count(low_space ^ offset).sum(axis=1,
+                        dtype=np.int32)
+                index = counts.argmin()
+
+                if best_count is None or counts[index] < best_count:
+                    best_count = counts[index]
+                    best = low_space[index] ^ offset
+
+            row[:] = np.unpackbits(best.view(np.uint8), count=self.cells,
+                    bitorder='little')
+
+        return presses
+
+    def reduce_greedily(self, presses):
+        counts = presses.sum(axis=1, dtype=np.int32)
+        improved = True
+
+        while improved:
+            improved = False
+
+            for vector in self.null_basis:
+                candidates = presses ^ vector
+                candidate_counts = candidates.sum(axis=1, dtype=np.int32)
+                better = candidate_counts < counts
+
+                if better.any():
+                    presses[better] = candidates[better]
+                    counts[better] = candidate_counts[better]
+                    improved = True
+
+        return presses
+
+
+def get_batch_solver(size):
+    """The batch solver for `size`, with its matrices from `default_cache`."""
+
+    return default_cache.get(size, TOPOLOGY, 'batch',
+            lambda: batch_matrices(size),
+            lambda matrices: BatchSolver(size, matrices))
+
+
+def solve_boards(boards, size):
+    """Solvability flags and minimal solutions for an array of boards."""
+    return get_batch_solver(size).solve(boards)
+
+
+def random_boards(count, size, seed=None):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2, size=(count, size * size), dtype=np.uint8)
+
+
+def bench(size, count, scalar_count, seed=None):
+    boards = random_boards(count, size, seed)
+
+    start = time.perf_counter()
+    solver = get_batch_solver(size)
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solvable, solutions = solver.solve(boards)
+    batch_time = time.perf_counter() - start
+
+    # The scalar solver is far slower, so it only gets a sample.
+    sample = boards[:scalar_count]
+    states = boards_to_states(sample)
+    scalar = get_solver(size)
+
+    start = time.perf_counter()
+    results = [scalar.solve(state) for state in states]
+    scalar_time = time.perf_counter() - start
+
+    # Both paths must agree on solvability and on the minimal move counts.
+    for index, result in enumerate(results):
+        assert (result is not None) == solvable[index]
+        if result is not None:
+            assert popcount(result) == solutions[index].sum()
+
+    batch_rate = count / batch_time
+    scalar_rate = len(states) / scalar_time
+
+    print('Board size: {0}x{0}'.format(size))
+    print('Batch setup: {:.3f} s'.format(setup_time))
+    print('Batch: {} boards in {:.3f} s, {:,.0f} boards/s'.format(
+            count, batch_time, batch_rate))
+    print('Scalar: {} boards in {:.3f} s, {:,.0f} boards/s'.format(
+            len(states), scalar_time, scalar_rate))
+    print('Speedup: {:.1f}x'.format(batch_rate / scalar_rate))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve lights out boards in '
+            'batches.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    solve_parser = commands.add_parser('solve', help='Solve the boards in a '
+            '.npy file of shape (N, size * size).')
+    solve_parser.add_argument('boards')
+    solve_parser.add_argument('-o', '--output', default='solutions.npz',
+            help='Where to save the `solvable` and `solutions` arrays.')
+
+    bench_parser = commands.add_parser('bench', help='Benchmark the batch '
+            'solver against the scalar one on random boards.')
+    bench_parser.add_argument('--size', type=int, default=5)
+    bench_parser.add_argument('--count', type=int, default=1000000)
+    bench_parser.add_argument('--scalar-count', type=int, default=10000)
+    bench_parser.add_argument('--seed', type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'solve':
+        boards = np.load(args.boards)
+        size = int(round(boards.shape[1] ** .5))
+
+        if size * size != boards.shape[1]:
+            parser.error('Boards must have a square number of cells.')
+
+        solvable, solutions = solve_boards(boards, size)
+        np.savez_compressed(args.output, solvable=solvable,
+                solutions=solutions)
+
+        print('Solved {} of {} boards, saved to {}.'.format(
+                int(solvable.sum()), len(boards), args.output))
+
+    else:
+        bench(args.size, args.count, args.scalar_count, args.seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Micro-benchmarks of `EventSystem` dispatch.
+
+    python benchmarks/bench_events.py
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import Event, EventSystem
+
+
+def handler(event):
+    pass
+
+
+def make_cases():
+    silent = EventSystem()
+
+    single = EventSystem()
+    single.listen('click', handler)
+
+    wildcard = EventSystem()
+    wildcard.listen('click', handler)
+    wildcard.listen('*', handler)
+
+    weak = EventSystem()
+    weak.listen('click', handler, weak=True)
+
+    # Like a button's click going through a menu bar and a menu to the app.
+    chain = [EventSystem() for _ in range(3)]
+    for source, target in zip(chain, chain[1:]):
+        source.listen('*', target.emit)
+    chain[-1].listen('click', handler)
+
+    event = Event('click', pos=(1, 2))
+
+    return [
+        ('emit, no listeners', lambda: silent.emit('click')),
+        ('emit, one handler', lambda: single.emit('click')),
+        ('emit with kwargs, one handler',
+            lambda: single.emit('click', pos=(1, 2), button=1)),
+        ('emit, handler and wildcard', lambda: wildcard.emit('click')),
+        ('emit, weak handler', lambda: weak.emit('click')),
+        ('emit event object through 3 systems', lambda: chain[0].emit(event)),
+    ]
+
+
+def run(number=200000):
+    results = []
+
+    for name, fn in make_cases():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        results.append((name, seconds / number))
+
+    return results
+
+
+if __name__ == '__main__':
+    for name, seconds in run():
+        print('{:>10.0f} ns  {}'.format(seconds * 1e9, name))
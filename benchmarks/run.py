@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Benchmarks of the game's hot paths, run headless with SDL's dummy drivers.
+
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json --threshold .2
+
+With `--compare`, the exit status is 1 if any benchmark got slower than the
+baseline by more than the threshold.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import random
+import timeit
+import platform
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# These must be set before pygame is first imported.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from pygame.locals import MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+
+DEFAULT_SIZES = (5, 16, 32, 64)
+
+# Each benchmark is `(name, per_size, setup)`. `setup(size)` returns the
+# function to time, `size` being `None` for those that don't depend on the
+# board size.
+BENCHMARKS = []
+
+
+def benchmark(name, per_size=True):
+
+    def register(setup):
+        BENCHMARKS.append((name, per_size, setup))
+        return setup
+
+    return register
+
+
+def random_level(size, seed=0):
+    rng = random.Random(seed)
+    cells = [(i, j) for i in range(size) for j in range(size)]
+    return rng.sample(cells, min(len(cells), size * 2))
+
+
+def make_display():
+    pygame.init()
+    return pygame.display.set_mode((320, 420))
+
+
+def make_app(size):
+    from app import App
+
+    app = App(game_size=size)
+
+    # Stop generating levels in the background, it would compete with the
+    # benchmarks for the CPU.
+    app.level_pool.close()
+    app.level_pool.thread.join()
+
+    return app
+
+
+@benchmark('GameState.toggle')
+def bench_toggle(size):
+    from game import GameState
+
+    game = GameState(make_display(), level=random_level(size), game_size=size)
+    center = size // 2
+
+    return lambda: game.toggle(center, center)
+
+
+@benchmark('GameState.check_game_over')
+def bench_check_game_over(size):
+    from game import GameState
+
+    game = GameState(make_display(), level=random_level(size), game_size=size)
+    return game.check_game_over
+
+
+@benchmark('GameState.apply_level')
+def bench_apply_level(size):
+    from game import GameState
+
+    level = random_level(size)
+    game = GameState(make_display(), level=level, game_size=size)
+
+    return lambda: game.apply_level(level)
+
+
+@benchmark('SolverState playback')
+def bench_solver(size):
+    from game import GameState
+    from solver import SolverState
+    from scheduler import INSTANT, Scheduler
+
+    game = GameState(make_display(), level=random_level(size), game_size=size)
+    scheduler = Scheduler(speed=INSTANT)
+    solver = SolverState(game.display, scheduler)
+    solver.game = game
+
+    done = []
+    solver.listen('done-solving', done.append)
+
+    def play():
+        # Solve the board and step through the whole solution, without the
+        # delays between steps.
+        del done[:]
+        solver.activated()
+
+        while not done:
+            scheduler.advance()
+
+        solver.deactivated()
+
+    return play
+
+
+@benchmark('EventSystem.emit', per_size=False)
+def bench_emit(size):
+    from events import EventSystem
+
+    source = EventSystem()
+    target = EventSystem()
+    source.listen('*', target.emit)
+    target.listen('click', lambda event: None)
+
+    return lambda: source.emit('click', pos=(1, 2))
+
+
+@benchmark('MenuButtonBar.handle', per_size=False)
+def bench_menu_handle(size):
+    from menu import MenuButtonBar
+
+    bar = MenuButtonBar(make_display())
+    button = bar.buttons[0]
+    pos = button.rect.centerx + bar.rect.x, button.rect.centery + bar.rect.y
+
+    events = [
+        pygame.event.Event(MOUSEMOTION, pos=pos, rel=(0, 0),
+            buttons=(0, 0, 0)),
+        pygame.event.Event(MOUSEBUTTONDOWN, pos=pos, button=1),
+        pygame.event.Event(MOUSEBUTTONUP, pos=(0, 0), button=1),
+    ]
+
+    def handle():
+        for event in events:
+            bar.handle(event)
+
+        bar.draw()
+
+    return handle
+
+
+@benchmark('App.draw full frame')
+def bench_app_draw(size):
+    app = make_app(size)
+
+    def draw():
+        app.full_redraw = True
+        app.draw()
+
+    return draw
+
+
+@benchmark('App.draw after a move')
+def bench_app_move(size):
+    app = make_app(size)
+    app.draw()
+
+    # Alternate between two cells, so every frame has lights to redraw.
+    board = app.game.board
+    cells = [(0, 0), (board.size - 1, board.size - 1)]
+    moves = []
+
+    def move():
+        if not moves:
+            moves.extend(cells)
+
+        app.game.model.press(*moves.pop())
+        app.draw()
+
+    return move
+
+
+def measure(fn, min_time=.2, repeat=3):
+    """Best time of a single call to `fn`, in seconds."""
+
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / .2))
+
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(sizes, name_filter=None):
+    results = {}
+
+    for name, per_size, setup in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+
+        for size in (sizes if per_size else [None]):
+            key = name if size is None else '{} [{}]'.format(name, size)
+
+            seconds = measure(setup(size))
+            results[key] = seconds
+            print('{:>12.2f} us  {}'.format(seconds * 1e6, key))
+            sys.stdout.flush()
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each result against its baseline. Returns the names of the ones
+    slower by more than `threshold`, as a fraction."""
+
+    regressions = []
+
+    print()
+    print('{:>12} {:>12} {:>8}  {}'.format('baseline', 'now', 'change',
+            'benchmark'))
+
+    for key, seconds in sorted(results.items()):
+        if key not in baseline:
+            continue
+
+        change = seconds / baseline[key] - 1
+        flag = ''
+
+        if change > threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+
+        print('{:>9.2f} us {:>9.2f} us {:>+7.0%}  {}{}'.format(
+                baseline[key] * 1e6, seconds * 1e6, change, key, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+            help='Comma separated board sizes.')
+    parser.add_argument('--filter', help='Only run benchmarks whose name '
+            'contains this.')
+    parser.add_argument('--save', metavar='PATH', help='Save the results as a '
+            'JSON baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a '
+            'saved baseline.')
+    parser.add_argument('--threshold', type=float, default=.2,
+            help='Slowdown, as a fraction, flagged as a regression.')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    os.chdir(ROOT)
+    results = run(sizes, args.filter)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'pygame': pygame.version.ver,
+                'machine': platform.machine(),
+                'results': results,
+            }, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+        regressions = compare(results, baseline, args.threshold)
+
+        if regressions:
+            print()
+            print('{} regression(s) over {:.0%}.'.format(len(regressions),
+                    args.threshold))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
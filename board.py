@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+try:
+    # Counting bits is on the path of every move, so use the builtin directly
+    # where there is one, rather than through a wrapper.
+    popcount = int.bit_count
+except AttributeError:
+
+    def popcount(n):
+        """Number of set bits in the non-negative integer `n`."""
+        return bin(n).count('1')
+
+
+def toggle_masks(size, topology=DEFAULT_TOPOLOGY):
+    """Return a list with one toggle mask per cell of a `size` x `size` board.
+
+    Cell `(i, j)` is bit `i * size + j`. The mask at that index has the bits of
+    the cell itself and its neighbours in `topology` set, so a move is a single
+    XOR of the board state with it. The masks are computed once per size and
+    topology and shared.
+    """
+    return get_topology(topology).masks(size)
+
+
+_toggle_spans_cache = {}
+
+
+def toggle_spans(size, topology=DEFAULT_TOPOLOGY):
+    """Return a list with, for each of the `toggle_masks(size, topology)`, the
+    index of its lowest bit and its number of set bits.
+
+    Shifting a masked state down by the lowest bit before counting its bits
+    keeps the count to the few words the mask covers, rather than the whole
+    board.
+    """
+
+    topology = get_topology(topology)
+    key = size, topology.key
+
+    try:
+        return _toggle_spans_cache[key]
+    except KeyError:
+        pass
+
+    spans = [((mask & -mask).bit_length() - 1, popcount(mask))
+            for mask in topology.masks(size)]
+
+    _toggle_spans_cache[key] = spans
+    return spans
+
+
+class Board(object):
+    """Pure model of a lights out board, with no pygame dependency.
+
+    The whole board is stored in `state`, a single integer with one bit per
+    cell, set when the light is on. The number of lights on is kept up to date
+    in `lit_count` as moves are made.
+    """
+
+    # Lights are either off or on.
+    states = 2
+
+    def __init__(self, size, state=0, topology=DEFAULT_TOPOLOGY):
+        self.size = size
+        self.cell_count = size * size
+        self.topology = get_topology(topology)
+        self.toggle_masks = toggle_masks(size, self.topology)
+        self.toggle_spans = toggle_spans(size, self.topology)
+        self.state = state
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        # Setting the whole board at once needs a full count.
+        self._state = state
+        self.lit_count = popcount(state)
+
+    def index(self, i, j):
+        return i * self.size + j
+
+    def value(self, i, j):
+        return bool(self._state >> (i * self.size + j) & 1)
+
+    def set_value(self, i, j, value):
+        bit = 1 << (i * self.size + j)
+
+        if value:
+            self.state = self._state | bit
+        else:
+            self.state = self._state & ~bit
+
+    def toggle(self, i, j):
+        """Make a move at `(i, j)`, toggling it and its neighbours."""
+        self.toggle_index(i * self.size + j)
+
+    def toggle_index(self, index):
+        mask = self.toggle_masks[index]
+        shift, count = self.toggle_spans[index]
+        state = self._state
+
+        # Lights under the mask that were on go off, the others come on.
+        self.lit_count += count - 2 * popcount((state & mask) >> shift)
+        self._state = state ^ mask
+
+    # Making a move twice leaves the board as it was.
+    untoggle_index = toggle_index
+
+    def apply_moves(self, moves):
+        """Toggle each of the `(i, j)` coordinates in `moves`, in order."""
+
+        masks = self.toggle_masks
+        size = self.size
+        state = self._state
+
+        for i, j in moves:
+            state ^= masks[i * size + j]
+
+        self.state = state
+
+    def clear(self):
+        self.state = 0
+
+    def snapshot(self):
+        """The board's state, to be put back with `restore`."""
+        return self._state, self.lit_count
+
+    def restore(self, snapshot):
+        self._state, self.lit_count = snapshot
+
+    def is_solved(self):
+        return self.lit_count == 0
+
+    def __unicode__(self):
+        return '<Board {0}x{0} {1:#x}>'.format(self.size, self._state)
+
+    __str__ = __repr__ = __unicode__
+
+
+class CyclicBoard(object):
+    """A board whose lights go through `states` states, 0 being off. A move
+    steps each light it toggles to its next state, and the last one back to
+    off.
+
+    The state of each cell is a byte of `cells`. `state` is an immutable copy
+    of them, and `lit_count` is kept up to date as with `Board`.
+    """
+
+    def __init__(self, size, states, state=None, topology=DEFAULT_TOPOLOGY):
+
+        if not 2 <= states <= 255:
+            raise ValueError('Lights have 2 to 255 states, got {}.'.format(
+                    states))
+
+        self.size = size
+        self.cell_count = size * size
+        self.states = states
+        self.topology = get_topology(topology)
+        self.neighbours = self.topology.neighbours(size)
+
+        self.cells = bytearray(self.cell_count)
+        self.lit_count = 0
+
+        if state is not None:
+            self.state = state
+
+    @property
+    def state(self):
+        return bytes(self.cells)
+
+    @state.setter
+    def state(self, state):
+        self.cells[:] = state
+        self.lit_count = self.cell_count - self.cells.count(0)
+
+    def index(self, i, j):
+        return i * self.size + j
+
+    def value(self, i, j):
+        return self.cells[i * self.size + j]
+
+    def set_value(self, i, j, value):
+        index = i * self.size + j
+        self.lit_count += bool(value) - bool(self.cells[index])
+        self.cells[index] = value
+
+    def toggle(self, i, j):
+        """Make a move at `(i, j)`, stepping it and its neighbours."""
+        self.toggle_index(i * self.size + j)
+
+    def toggle_index(self, index):
+        cells = self.cells
+        last = self.states - 1
+
+        for cell in self.neighbours[index]:
+            value = cells[cell]
+
+            if value == last:
+                cells[cell] = 0
+                self.lit_count -= 1
+            else:
+                cells[cell] = value + 1
+
+                if not value:
+                    self.lit_count += 1
+
+    def untoggle_index(self, index):
+        """Take back a move at `index`, stepping the lights backwards."""
+
+        cells = self.cells
+        last = self.states - 1
+
+        for cell in self.neighbours[index]:
+            value = cells[cell]
+
+            if not value:
+                cells[cell] = last
+                self.lit_count += 1
+            else:
+                cells[cell] = value - 1
+
+                if value == 1:
+                    self.lit_count -= 1
+
+    def apply_moves(self, moves):
+        """Make each of the `(i, j)` moves in `moves`, in order."""
+
+        size = self.size
+        for i, j in moves:
+            self.toggle_index(i * size + j)
+
+    def clear(self):
+        self.cells[:] = bytes(self.cell_count)
+        self.lit_count = 0
+
+    def snapshot(self):
+        return bytes(self.cells), self.lit_count
+
+    def restore(self, snapshot):
+        self.cells[:], self.lit_count = snapshot
+
+    def is_solved(self):
+        return self.lit_count == 0
+
+    def __unicode__(self):
+        return '<CyclicBoard {0}x{0} mod {1}>'.format(self.size, self.states)
+
+    __str__ = __repr__ = __unicode__
+
+
+def make_board(size, topology=DEFAULT_TOPOLOGY, states=2):
+    """A `Board` for on/off lights, or a `CyclicBoard` for more states."""
+
+    if states == 2:
+        return Board(size, topology=topology)
+
+    return CyclicBoard(size, states, topology=topology)
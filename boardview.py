@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Drawing of boards too big to be shown whole with the lights at full size."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import pygame
+from pygame.locals import SRCALPHA, MOUSEMOTION, MOUSEWHEEL, KEYDOWN
+from pygame.locals import K_UP, K_DOWN, K_LEFT, K_RIGHT, K_PLUS, K_EQUALS
+from pygame.locals import K_MINUS, K_0
+from assets import assets
+
+# Distance from the start of a cell to the start of the next one at full size,
+# a 42 px light and a 6 px gap.
+FULL_PITCH = 48
+
+# Below this pitch, cells are squares of a single colour with no gap, and the
+# whole board is drawn from an image of the board state rather than a cell at a
+# time.
+DOT_PITCH = 4
+
+# Each zoom step multiplies or divides the pitch by this.
+ZOOM_STEP = 1.5
+
+# Beyond this many changed cells, the whole viewport is drawn again rather than
+# each cell on its own.
+MAX_CELL_RECTS = 64
+
+# Maps the `'0'` and `'1'` digits of a board state in binary to palette indexes.
+BITS = bytes.maketrans(b'01', b'\0\1')
+
+
+class BoardView(object):
+    """Draws a board of any size into `viewport`, a rect of the display, with
+    zoom and pan.
+
+    The visible part of the board is kept rendered on `surface` between
+    frames. Only the cells that changed since are rendered again, and cells
+    outside of the viewport never are.
+    """
+
+    def __init__(self, display, board, viewport):
+        self.display = display
+        self.board = board
+        self.size = board.size
+        self.viewport = pygame.Rect(viewport)
+        self.surface = pygame.Surface(self.viewport.size, SRCALPHA)
+
+        # Zoomed all the way out, the whole board fits.
+        self.min_pitch = max(1, min(FULL_PITCH,
+                self.viewport.width // self.size,
+                self.viewport.height // self.size))
+        self.pitch = self.min_pitch
+
+        # The board pixel at the viewport's top left corner. Negative when the
+        # board is smaller than the viewport, to center it.
+        self.offset_x = self.offset_y = 0
+
+        # The index of the highlighted cell, if any. Used by solver.
+        self.spotlight = None
+
+        # Cell images at the current pitch.
+        self.images = self.spotlight_image = None
+        self.images_pitch = None
+
+        # The board state and spotlight rendered on `surface`. `None` when it
+        # must be rendered again whole.
+        self.drawn_state = None
+        self.drawn_spotlight = None
+
+        self.clamp_offsets()
+
+    @property
+    def gap(self):
+        return self.pitch // 8 if self.pitch >= DOT_PITCH else 0
+
+    @property
+    def cell_size(self):
+        return self.pitch - self.gap
+
+    def invalidate(self):
+        self.drawn_state = None
+
+    def load_images(self):
+
+        if self.images_pitch == self.pitch:
+            return
+
+        images = assets.state_images(self.board.states)
+        spotlight_image = assets.image('light-spotlight')
+        size = self.cell_size
+
+        if self.pitch < DOT_PITCH:
+            # Too small for any detail, use the colour in the middle of each.
+            def scale(image):
+                dot = pygame.Surface((size, size))
+                dot.fill(image.get_at((image.get_width() // 2,
+                        image.get_height() // 2)))
+                return dot
+
+            self.palette = [image.get_at((image.get_width() // 2,
+                    image.get_height() // 2)) for image in images]
+            self.spotlight_image = pygame.Surface((size, size))
+            self.spotlight_image.fill((255, 255, 255))
+
+        elif size == images[0].get_width():
+            scale = lambda image: image
+            self.spotlight_image = spotlight_image
+
+        else:
+            scale = lambda image: pygame.transform.smoothscale(image,
+                    (size, size))
+            self.spotlight_image = scale(spotlight_image)
+
+        self.images = [scale(image) for image in images]
+        self.images_pitch = self.pitch
+
+    def board_pixels(self):
+        """Width and height of the whole board at the current pitch."""
+        return self.size * self.pitch - self.gap
+
+    def clamp_offsets(self):
+        board_pixels = self.board_pixels()
+
+        def clamp(offset, view):
+            if board_pixels <= view:
+                return -((view - board_pixels) // 2)
+
+            return max(0, min(offset, board_pixels - view))
+
+        self.offset_x = clamp(self.offset_x, self.viewport.width)
+        self.offset_y = clamp(self.offset_y, self.viewport.height)
+
+    def zoom(self, factor, pos=None):
+        """Multiply the pitch by `factor`, keeping the board point under `pos`
+        on the display, by default the viewport's center, where it is."""
+
+        if factor == 1:
+            return
+
+        pitch = int(round(self.pitch * factor))
+
+        # Always move by at least a pixel, so small pitches can zoom too.
+        if factor > 1:
+            pitch = max(pitch, self.pitch + 1)
+        elif factor < 1:
+            pitch = min(pitch, self.pitch - 1)
+
+        pitch = max(self.min_pitch, min(FULL_PITCH, pitch))
+
+        if pitch == self.pitch:
+            return
+
+        if pos is None:
+            pos = self.viewport.center
+
+        view_x = pos[0] - self.viewport.x
+        view_y = pos[1] - self.viewport.y
+        scale = pitch / self.pitch
+
+        self.offset_x = int((self.offset_x + view_x) * scale - view_x)
+        self.offset_y = int((self.offset_y + view_y) * scale - view_y)
+        self.pitch = pitch
+
+        self.clamp_offsets()
+        self.invalidate()
+
+    def fit(self):
+        self.pitch = self.min_pitch
+        self.clamp_offsets()
+        self.invalidate()
+
+    def pan(self, dx, dy):
+        """Move the board by `(dx, dy)` pixels on the display."""
+
+        offsets = self.offset_x, self.offset_y
+
+        self.offset_x -= dx
+        self.offset_y -= dy
+        self.clamp_offsets()
+
+        if (self.offset_x, self.offset_y) != offsets:
+            self.invalidate()
+
+    def reveal(self, i, j):
+        """Pan to `(i, j)` if it isn't in view."""
+
+        rect = self.cell_rect(i * self.size + j)
+
+        if self.surface.get_rect().contains(rect):
+            return
+
+        self.offset_x = j * self.pitch + self.pitch // 2 - (
+                self.viewport.width // 2)
+        self.offset_y = i * self.pitch + self.pitch // 2 - (
+                self.viewport.height // 2)
+        self.clamp_offsets()
+        self.invalidate()
+
+    def visible_range(self):
+        """The rows `i0` to `i1` and columns `j0` to `j1`, excluded, of the
+        cells at least partly in view."""
+
+        pitch = self.pitch
+
+        i0 = max(0, self.offset_y // pitch)
+        i1 = min(self.size, (self.offset_y + self.viewport.height) // pitch + 1)
+        j0 = max(0, self.offset_x // pitch)
+        j1 = min(self.size, (self.offset_x + self.viewport.width) // pitch + 1)
+
+        return i0, i1, j0, j1
+
+    def cell_rect(self, index):
+        """The rect of the cell at board `index` on `surface`."""
+
+        i, j = divmod(index, self.size)
+        size = self.cell_size
+
+        return pygame.Rect(j * self.pitch - self.offset_x,
+                i * self.pitch - self.offset_y, size, size)
+
+    def cell_at(self, pos):
+        """The `(i, j)` of the cell under `pos` on the display, if any."""
+
+        if not self.viewport.collidepoint(pos):
+            return None
+
+        i, offset_y = divmod(pos[1] - self.viewport.y + self.offset_y,
+                self.pitch)
+        j, offset_x = divmod(pos[0] - self.viewport.x + self.offset_x,
+                self.pitch)
+
+        if not (0 <= i < self.size and 0 <= j < self.size):
+            return None
+
+        # Not in the gap between cells.
+        if offset_x >= self.cell_size or offset_y >= self.cell_size:
+            return None
+
+        return i, j
+
+    def row_values(self, state, i, j0, j1):
+        """The values of cells `j0` to `j1` of row `i` of `state`, as bytes."""
+
+        size = self.size
+        start = i * size + j0
+
+        if self.board.states > 2:
+            return state[start:i * size + j1]
+
+        # One binary digit per cell, reversed to go from low bits to high.
+        width = j1 - j0
+        row = state >> start & ((1 << width) - 1)
+        return format(row, '0{}b'.format(width))[::-1].encode(
+                'ascii').translate(BITS)
+
+    def render(self):
+        """Render the whole visible part of the board on `surface`."""
+
+        self.load_images()
+        self.surface.fill((0, 0, 0, 0))
+
+        state = self.board.state
+        pitch = self.pitch
+        i0, i1, j0, j1 = self.visible_range()
+
+        if i0 >= i1 or j0 >= j1:
+            return
+
+        x0 = j0 * pitch - self.offset_x
+        y0 = i0 * pitch - self.offset_y
+
+        if pitch < DOT_PITCH:
+            # One pixel per cell with the state's colour from a palette, then
+            # scaled up to the pitch.
+            data = b''.join(self.row_values(state, i, j0, j1)
+                    for i in range(i0, i1))
+
+            dots = pygame.image.frombuffer(data, (j1 - j0, i1 - i0), 'P')
+            dots.set_palette(self.palette)
+
+            if pitch > 1:
+                dots = pygame.transform.scale(dots,
+                        ((j1 - j0) * pitch, (i1 - i0) * pitch))
+
+            self.surface.blit(dots, (x0, y0))
+
+        else:
+            images = self.images
+            blits = []
+
+            for i in range(i0, i1):
+                y = y0 + (i - i0) * pitch
+                x = x0
+
+                for value in bytearray(self.row_values(state, i, j0, j1)):
+                    blits.append((images[value], (x, y)))
+                    x += pitch
+
+            self.surface.blits(blits, doreturn=False)
+
+        if self.spotlight is not None:
+            self.surface.blit(self.spotlight_image,
+                    self.cell_rect(self.spotlight))
+
+    def render_cell(self, state, index, rect):
+        i, j = divmod(index, self.size)
+        value = bytearray(self.row_values(state, i, j, j + 1))[0]
+
+        # Blits are clipped to the surface, but a fill moves a rect that is
+        # partly off it onto it instead, over the next cell.
+        self.surface.fill((0, 0, 0, 0), rect.clip(self.surface.get_rect()))
+        self.surface.blit(self.images[value], rect)
+
+        if index == self.spotlight:
+            self.surface.blit(self.spotlight_image, rect)
+
+    def changed_cells(self, state):
+        """Indexes of the cells that differ between `state` and the one drawn,
+        or `None` if there are more than `MAX_CELL_RECTS`."""
+
+        drawn = self.drawn_state
+        changed = []
+
+        if self.board.states > 2:
+            if state != drawn:
+                changed = [index for index, (old, new)
+                        in enumerate(zip(drawn, state)) if old != new]
+
+        else:
+            bits = state ^ drawn
+
+            while bits and len(changed) <= MAX_CELL_RECTS:
+                low = bits & -bits
+                changed.append(low.bit_length() - 1)
+                bits ^= low
+
+        if len(changed) > MAX_CELL_RECTS:
+            return None
+
+        return changed
+
+    def refresh(self):
+        """Bring `surface` up to date with the board. Returns the rects of the
+        display that changed."""
+
+        state = self.board.state
+
+        if self.drawn_state is not None:
+            changed = self.changed_cells(state)
+
+            if changed is not None:
+                if self.spotlight != self.drawn_spotlight:
+                    changed.extend(index for index in (self.spotlight,
+                            self.drawn_spotlight) if index is not None)
+
+                self.drawn_state = state
+                self.drawn_spotlight = self.spotlight
+
+                bounds = self.surface.get_rect()
+                rects = []
+
+                for index in changed:
+                    rect = self.cell_rect(index)
+
+                    # Cells out of view aren't drawn at all.
+                    if bounds.colliderect(rect):
+                        self.render_cell(state, index, rect)
+                        rects.append(rect.clip(bounds).move(
+                                self.viewport.topleft))
+
+                return rects
+
+        self.render()
+        self.drawn_state = state
+        self.drawn_spotlight = self.spotlight
+
+        return [self.viewport]
+
+    def dirty_rects(self):
+        return self.refresh()
+
+    def draw(self, rect=None):
+        self.refresh()
+
+        area = self.viewport if rect is None else self.viewport.clip(rect)
+
+        self.display.blit(self.surface, area,
+                area.move(-self.viewport.x, -self.viewport.y))
+
+    def handle(self, event):
+        """Zoom with the mouse wheel or `+`, `-` and `0`, and pan by dragging
+        with the right or middle button or with the arrow keys."""
+
+        if event.type == MOUSEWHEEL:
+            # Replayed wheel events say where the mouse was.
+            pos = getattr(event, 'pos', None) or pygame.mouse.get_pos()
+
+            # Sideways scrolling doesn't zoom.
+            if event.y and self.viewport.collidepoint(pos):
+                self.zoom(ZOOM_STEP ** event.y, pos)
+
+        elif event.type == MOUSEMOTION and (event.buttons[1] or
+                event.buttons[2]):
+            self.pan(*event.rel)
+
+        elif event.type == KEYDOWN:
+            step = self.viewport.width // 4
+
+            if event.key == K_LEFT:
+                self.pan(step, 0)
+            elif event.key == K_RIGHT:
+                self.pan(-step, 0)
+            elif event.key == K_UP:
+                self.pan(0, step)
+            elif event.key == K_DOWN:
+                self.pan(0, -step)
+            elif event.key in (K_PLUS, K_EQUALS):
+                self.zoom(ZOOM_STEP)
+            elif event.key == K_MINUS:
+                self.zoom(1 / ZOOM_STEP)
+            elif event.key == K_0:
+                self.fit()
@@ -7,6 +7,7 @@ from __future__ import print_function
 import pygame
 from pygame.locals import MOUSEBUTTONUP, MOUSEBUTTONDOWN
 from events import EventSystem
+from assets import assets
 
 class Button(EventSystem):
 
@@ -16,15 +17,17 @@ class Button(EventSystem):
     def __init__(self, display, label, **kwargs):
 
         if Button.active_image is None:
-            Button.label_font = pygame.font.Font('Signika-Light.ttf', 24)
-            Button.active_image = pygame.image.load('img/button-active.png')
-            Button.inactive_image = pygame.image.load('img/button-inactive.png')
+            Button.active_image = assets.image('button-active')
+            Button.inactive_image = assets.image('button-inactive')
 
         self.display = display
         self.is_mousedown = False
 
+        # The `is_mousedown` last drawn, to tell if it has changed.
+        self.drawn = None
+
         self.label = label
-        self.label_surface = Button.label_font.render(self.label, True,
+        self.label_surface = assets.text('Signika-Light.ttf', 24, self.label,
                 (240, 240, 240))
 
         self.rect = pygame.Rect((0, 0), Button.active_image.get_size())
@@ -38,6 +41,9 @@ class Button(EventSystem):
 
         self.label_rect.center = self.rect.center
 
+    def is_dirty(self):
+        return self.is_mousedown != self.drawn
+
     def draw(self):
 
         if self.is_mousedown:
@@ -47,17 +53,27 @@ class Button(EventSystem):
 
         self.display.blit(self.label_surface, self.label_rect)
 
+        self.drawn = self.is_mousedown
+
     def handle(self, event):
 
-        if event.type == MOUSEBUTTONDOWN and self.contains(event.pos):
-            self.is_mousedown = True
+        if event.type == MOUSEBUTTONDOWN:
+            self.mousedown(event.pos)
 
         elif event.type == MOUSEBUTTONUP:
+            self.mouseup(event.pos)
 
-            if self.is_mousedown and self.contains(event.pos):
-                self.emit('click')
+    def mousedown(self, pos):
 
-            self.is_mousedown = False
+        if self.contains(pos):
+            self.is_mousedown = True
+
+    def mouseup(self, pos):
+
+        if self.is_mousedown and self.contains(pos):
+            self.emit('click')
+
+        self.is_mousedown = False
 
     def contains(self, point):
         return self.rect.collidepoint(point)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from topology import get_topology
+
+# Header of a matrix file: magic, format version, number of matrices, board
+# size and topology. It is followed by one `MATRIX_ENTRY` per matrix and then
+# the matrices themselves, each one as fixed width, bit-packed rows.
+MAGIC = b'LPMX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI16s')
+MATRIX_ENTRY = struct.Struct('<16sIIQ')
+
+DEFAULT_DIRECTORY = os.environ.get('LIGHTS_POOF_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'lights-poof'))
+
+DEFAULT_MAX_BYTES = int(os.environ.get('LIGHTS_POOF_CACHE_BYTES',
+        256 * 1024 * 1024))
+
+
+def row_bytes(width):
+    return (width + 7) // 8
+
+
+def pack_rows(rows, width):
+    """Bit-pack integer `rows` of `width` bits each, little endian."""
+
+    size = row_bytes(width)
+    return b''.join(row.to_bytes(size, 'little') for row in rows)
+
+
+class PackedMatrix(object):
+    """A matrix over GF(2) as bit-packed rows in a buffer, which may be a
+    memory-mapped file. Row `r` is an integer with bit `c` set for column `c`.
+    """
+
+    def __init__(self, buffer, rows, width):
+        self.buffer = buffer
+        self.rows = rows
+        self.width = width
+        self.row_bytes = row_bytes(width)
+        self.nbytes = rows * self.row_bytes
+
+    def row(self, index):
+        start = index * self.row_bytes
+        return int.from_bytes(self.buffer[start:start + self.row_bytes],
+                'little')
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for index in range(self.rows):
+            yield self.row(index)
+
+
+class MatrixSet(object):
+    """The named matrices of one matrix file."""
+
+    def __init__(self, buffer):
+        magic, version, count, self.size, topology = HEADER.unpack_from(buffer)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a version {} matrix file.'.format(VERSION))
+
+        self.topology = topology.rstrip(b'\0').decode('ascii')
+        self.buffer = buffer
+        self.nbytes = len(buffer)
+        self.matrices = {}
+
+        view = memoryview(buffer)
+        for index in range(count):
+            name, rows, width, offset = MATRIX_ENTRY.unpack_from(buffer,
+                    HEADER.size + index * MATRIX_ENTRY.size)
+
+            end = offset + rows * row_bytes(width)
+            self.matrices[name.rstrip(b'\0').decode('ascii')] = PackedMatrix(
+                    view[offset:end], rows, width)
+
+    def __getitem__(self, name):
+        return self.matrices[name]
+
+    def __contains__(self, name):
+        return name in self.matrices
+
+
+def encode_matrix_set(size, topology, matrices):
+    """Serialize `matrices`, a dict of name to `(rows, width)`, into the bytes
+    of a matrix file."""
+
+    names = sorted(matrices)
+    offset = HEADER.size + len(names) * MATRIX_ENTRY.size
+    entries = []
+    chunks = []
+
+    for name in names:
+        rows, width = matrices[name]
+
+        # Keep every matrix 8 byte aligned, so it can be viewed as an array.
+        padding = -offset % 8
+        chunks.append(b'\0' * padding)
+        offset += padding
+
+        data = pack_rows(rows, width)
+        entries.append(MATRIX_ENTRY.pack(name.encode('ascii'), len(rows),
+                width, offset))
+        chunks.append(data)
+        offset += len(data)
+
+    header = HEADER.pack(MAGIC, VERSION, len(names), size,
+            topology.encode('ascii'))
+
+    return header + b''.join(entries) + b''.join(chunks)
+
+
+class MatrixCache(object):
+    """Per board size and topology matrices, saved to `directory` and
+    memory-mapped back on first use. Topologies are told apart by their `key`,
+    so two with the same name never share matrices.
+
+    Mapped matrix sets are kept in least recently used order, and the oldest
+    ones are dropped once together they are over `max_bytes`. If `directory`
+    can't be written to, matrices are kept in memory only.
+
+    The cache can be used from several threads. Each set is built once, by the
+    first thread to ask for it, while the others asking for the same one wait.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY,
+            max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+        # `lock` guards `entries` and `nbytes`, and is never held while a set
+        # is built. `building` has a lock per set being built.
+        self.lock = threading.Lock()
+        self.building = {}
+
+    def path(self, size, topology, kind):
+        return os.path.join(self.directory,
+                '{}-{}-{}.lpm'.format(topology.key, size, kind))
+
+    def get(self, size, topology, kind, build, decode=None):
+        """The `MatrixSet` of `kind` for `(size, topology)`, or what `decode`
+        makes of it. When it's not cached, `build()` is called to compute it,
+        as a dict of name to `(rows, width)`. `topology` is a `Topology` or
+        the name of a built-in one.
+
+        Decoded values are cached in place of the set, and count towards the
+        budget with their `nbytes` if they have one.
+        """
+
+        topology = get_topology(topology)
+        key = size, topology.key, kind
+
+        with self.lock:
+            if key in self.entries:
+                return self.use(key)
+
+            key_lock = self.building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                # Built by another thread while this one waited.
+                if key in self.entries:
+                    return self.use(key)
+
+            value = self.load(size, topology, kind, build)
+            nbytes = value.nbytes
+
+            if decode is not None:
+                value = decode(value)
+                nbytes = getattr(value, 'nbytes', nbytes)
+
+            with self.lock:
+                self.entries[key] = value, nbytes
+                self.nbytes += nbytes
+                self.building.pop(key, None)
+                self.evict()
+
+        return value
+
+    def use(self, key):
+        """The cached value of `key`, made the most recently used."""
+
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def load(self, size, topology, kind, build):
+        path = self.path(size, topology, kind)
+
+        try:
+            return self.map(path)
+        except (IOError, OSError, ValueError):
+            pass
+
+        data = encode_matrix_set(size, topology.name, build())
+
+        try:
+            self.save(path, data)
+            return self.map(path)
+        except (IOError, OSError):
+            return MatrixSet(data)
+
+    def map(self, path):
+
+        with open(path, 'rb') as matrix_file:
+            buffer = mmap.mmap(matrix_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return MatrixSet(buffer)
+
+    def save(self, path, data):
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        # Write to a temporary file first, so that another process never maps
+        # a partially written one.
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as matrix_file:
+            matrix_file.write(data)
+
+        os.replace(temp_path, path)
+
+    def evict(self):
+
+        # Called with `lock` held. The most recently used set is always kept,
+        # even if it alone is over the budget.
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            key, (value, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+# The cache used by the solvers. Its `directory` and `max_bytes` can be changed
+# before first use.
+default_cache = MatrixCache()
@@ -4,17 +4,22 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
-from collections import defaultdict
-from itertools import chain
+import weakref
 
 class Event(object):
 
+    __slots__ = ('type', 'props')
+
     def __init__(self, type_, **kwargs):
         self.type = type_
         self.props = kwargs
 
-        for name, value in kwargs.items():
-            setattr(self, name, value)
+    def __getattr__(self, name):
+        # The keyword arguments of the event are available as attributes.
+        try:
+            return self.props[name]
+        except KeyError:
+            raise AttributeError(name)
 
     def __unicode__(self):
         return '<Event (' + self.type + ')>'
@@ -22,18 +27,46 @@ class Event(object):
     __str__ = __repr__ = __unicode__
 
 
+class WeakHandler(object):
+    """Calls a handler through a weak reference, so that listening doesn't
+    keep the handler's object alive. Removes itself once the object is gone."""
+
+    __slots__ = ('ref',)
+
+    def __init__(self, fn, on_dead):
+
+        if hasattr(fn, '__self__'):
+            self.ref = weakref.WeakMethod(fn, on_dead)
+        else:
+            self.ref = weakref.ref(fn, on_dead)
+
+    def __call__(self, event):
+        fn = self.ref()
+
+        if fn is not None:
+            fn(event)
+
+    def matches(self, fn):
+        return self.ref() == fn
+
+
 class EventSystem(object):
 
-    def init(self):
-        # So that the subclasses don't have to call this class's __init__
-        # method.
-        try:
-            self.handlers
-        except AttributeError:
-            self.handlers = defaultdict(list)
+    # Both are only created on the first `listen`, so that the subclasses don't
+    # have to call this class's `__init__` method.
+    #
+    # `_handlers` maps an event type to its handlers, in the order they were
+    # added. `_dispatch` caches, by event type, a tuple of the handlers to call
+    # for it, including the `'*'` ones.
+    _handlers = None
+    _dispatch = None
 
     def emit(self, event, **kwargs):
-        self.init()
+        dispatch = self._dispatch
+
+        if dispatch is None:
+            # Nobody ever listened.
+            return
 
         if not isinstance(event, Event):
             event = Event(event, **kwargs)
@@ -42,9 +75,52 @@ class EventSystem(object):
             raise ValueError('When emitting an event object, no keyword '
                     'arguments are accepted.')
 
-        for handler in chain(self.handlers[event.type], self.handlers['*']):
+        try:
+            handlers = dispatch[event.type]
+        except KeyError:
+            handlers = dispatch[event.type] = tuple(
+                    self._handlers.get(event.type, []) +
+                    self._handlers.get('*', []))
+
+        for handler in handlers:
             handler(event)
 
-    def listen(self, event_name, fn):
-        self.init()
-        self.handlers[event_name].append(fn)
+    def listen(self, event_name, fn, weak=False):
+        """Call `fn` with every `event_name` event, or every event at all for
+        `'*'`. With `weak`, only a weak reference to `fn` is kept, and it stops
+        being called once it's garbage collected."""
+
+        if self._handlers is None:
+            self._handlers = {}
+            self._dispatch = {}
+
+        if weak:
+            fn = WeakHandler(fn, lambda ref: self._remove(event_name, ref))
+
+        self._handlers.setdefault(event_name, []).append(fn)
+        self._dispatch.clear()
+
+    def unlisten(self, event_name, fn):
+        """Stop calling `fn` for `event_name` events. It's fine if it wasn't
+        listening."""
+
+        handlers = self._handlers and self._handlers.get(event_name)
+
+        if not handlers:
+            return
+
+        for index, handler in enumerate(handlers):
+            if handler == fn or (isinstance(handler, WeakHandler) and
+                    handler.matches(fn)):
+                del handlers[index]
+                self._dispatch.clear()
+                return
+
+    def _remove(self, event_name, ref):
+        handlers = self._handlers.get(event_name, [])
+
+        for index, handler in enumerate(handlers):
+            if isinstance(handler, WeakHandler) and handler.ref is ref:
+                del handlers[index]
+                self._dispatch.clear()
+                return
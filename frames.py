@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import time
+import pygame
+from collections import deque
+from assets import assets
+
+DEFAULT_FPS = 60
+
+
+class FramePacer(object):
+    """Keeps the main loop at a target frame rate and measures how long the
+    work of each frame took, not counting the time spent sleeping."""
+
+    def __init__(self, fps=DEFAULT_FPS, history=120):
+        self.fps = fps
+        self.budget = 1 / fps
+        self.clock = pygame.time.Clock()
+
+        # Work time of the last `history` frames, in seconds.
+        self.frame_times = deque(maxlen=history)
+
+        # Frames whose work alone took longer than the budget of a frame.
+        self.dropped = 0
+        self.frame_count = 0
+
+        self.frame_start = None
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        frame_time = time.perf_counter() - self.frame_start
+        self.frame_times.append(frame_time)
+        self.frame_count += 1
+
+        if frame_time > self.budget:
+            self.dropped += 1
+
+        # Sleep for whatever is left of this frame's budget.
+        self.clock.tick(self.fps)
+
+    def average(self):
+
+        if not self.frame_times:
+            return 0
+
+        return sum(self.frame_times) / len(self.frame_times)
+
+    def percentile(self, percent):
+
+        if not self.frame_times:
+            return 0
+
+        times = sorted(self.frame_times)
+        index = int(round(percent / 100 * (len(times) - 1)))
+        return times[index]
+
+
+class FrameTimeOverlay(object):
+    """A line of frame time stats along the bottom of the display, shown in dev
+    mode."""
+
+    def __init__(self, display, pacer):
+        self.display = display
+        self.pacer = pacer
+
+        self.font = assets.font('Signika-Light.ttf', 12)
+        self.rect = pygame.Rect(0, 0, self.display.get_width(),
+                self.font.get_linesize())
+        self.rect.bottom = self.display.get_height()
+
+        self.text_surface = None
+
+    def render(self):
+        pacer = self.pacer
+
+        text = ('frame {:.1f} ms  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  '
+                'dropped {}/{}').format(pacer.average() * 1000,
+                pacer.percentile(50) * 1000, pacer.percentile(95) * 1000,
+                pacer.percentile(99) * 1000, pacer.dropped, pacer.frame_count)
+
+        self.text_surface = self.font.render(text, True, (240, 240, 240))
+
+    def draw(self, rect=None):
+
+        if rect is not None and not rect.colliderect(self.rect):
+            return
+
+        self.display.fill((0, 0, 0), self.rect)
+        self.display.blit(self.text_surface, (self.rect.x + 4, self.rect.y))
@@ -4,141 +4,283 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
-import random
 import pygame
-from pygame.locals import MOUSEBUTTONUP
+from pygame.locals import MOUSEBUTTONUP, KEYDOWN, BLEND_RGB_MULT
+from pygame.locals import K_h, K_y, K_z, KMOD_CTRL, KMOD_SHIFT
+from model import make_model
+from topology import DEFAULT_TOPOLOGY
 from light import Light
+from boardview import BoardView
 from button import Button
 from menu import MenuButtonBar
 from events import EventSystem
+from assets import assets
+
+# Seconds of scheduler time a hint stays highlighted.
+HINT_TIME = 1.5
+
+# What the game over screen multiplies the colours of the game under it by,
+# out of 256. The same as black at an alpha of 230 over it, without a
+# display-sized overlay surface to blend.
+DIM_COLOR = (25, 25, 25)
 
 class GameState(EventSystem):
 
-    def __init__(self, display, level=None):
+    def __init__(self, display, level=None, game_size=5,
+            topology=DEFAULT_TOPOLOGY, states=2, rng=None, scheduler=None):
 
         self.display = display
 
-        title_font = pygame.font.Font('Signika-Regular.ttf', 36)
-        self.title_surface = title_font.render('Lights poof!', True,
-                (213, 85, 148))
+        # Times hints out, if given. Without it, a hint stays until the next
+        # move.
+        self.scheduler = scheduler
+        self.hint_timer = None
+
+        self.title_surface = assets.text('Signika-Regular.ttf', 36,
+                'Lights poof!', (213, 85, 148))
         self.title_rect = self.title_surface.get_rect()
         self.title_rect.centerx = self.display.get_width() / 2
         self.title_rect.top = 24
 
-        self.game_size = 5
+        # The rules and the board, without any of the drawing.
+        self.model = make_model(game_size, level, rng, topology=topology,
+                states=states)
+        self.model.listen('game-over', self.emit, weak=True)
+
+        self.game_size = self.model.game_size
+        self.board = self.model.board
+
+        # The number of lights left on, under the title. It changes with every
+        # move, so it's rendered here rather than memoized by the assets.
+        self.lights_left_font = assets.font('Signika-Light.ttf', 18)
+        self.lights_left_rect = pygame.Rect(0, self.title_rect.bottom,
+                self.display.get_width(),
+                self.lights_left_font.get_linesize())
+        self.lights_left_surface = None
+        self.lights_left_drawn = None
+
         self.light_size = 42
         self.light_gap = 6
 
-        self.level = self.solution = None
-        self.is_game_over = False
-
         self.board_size = ((self.light_size + self.light_gap) * self.game_size
                 - self.light_gap)
 
         self.board_x = (self.display.get_width() - self.board_size) / 2
         self.board_y = (self.display.get_height() - self.board_size) / 2
 
-        self.board = [[Light(self.display) for _ in range(self.game_size)]
-                for _ in range(self.game_size)]
-        self.apply_level(level)
-        self.update_light_positions()
-
         self.menu_btn = Button(self.display, 'Menu',
-                centerx=self.display.get_width() / 2,
-                y=self.board_y + self.board_size + 24)
+                centerx=self.display.get_width() / 2)
+
+        # The space between the number of lights left and the menu button.
+        viewport = pygame.Rect(16, self.lights_left_rect.bottom + 8,
+                self.display.get_width() - 32,
+                self.display.get_height() - self.lights_left_rect.bottom -
+                self.menu_btn.rect.height - 40)
+
+        # The light highlighted by the solver or as a hint, if any.
+        self.spotlight = None
+
+        if self.board_size <= min(viewport.size):
+            # The board model holds the actual state, the lights only draw it.
+            self.view = None
+            self.lights = [[Light(self.display, self.board, i, j)
+                    for j in range(self.game_size)]
+                    for i in range(self.game_size)]
+            self.update_light_positions()
+
+            self.menu_btn.update_rect(y=self.board_y + self.board_size + 24)
+
+        else:
+            # Too big to show whole at full size. A view draws it, zoomed out
+            # to fit to begin with, with no `Light` for each cell.
+            self.view = BoardView(self.display, self.board, viewport)
+            self.lights = None
+
+            self.menu_btn.update_rect(y=viewport.bottom + 16)
 
         # Menu button click handler should be set from outside this class.
         self.menu_btn.listen('click',
                 lambda event: self.emit('menu-click', **event.props))
 
-    def apply_level(self, level):
+    # The game's state lives in `self.model`, these pass through to it.
 
-        if level is None:
-            # How many turns should the game be of?
-            min_turns = self.game_size
-            max_turns = self.game_size * 2
-            turns = random.randint(min_turns, max_turns)
+    @property
+    def level(self):
+        return self.model.level
 
-            # Create a list of all possible coordinates and select `turns` of
-            # them in random.
-            all_coordinates = [(i, j) for i in range(self.game_size)
-                    for j in range(self.game_size)]
-            random.shuffle(all_coordinates)
+    @property
+    def solution(self):
+        return self.model.solution
+
+    @property
+    def is_game_over(self):
+        return self.model.is_game_over
 
-            # Here's the level. Toggling these coordinates will give us the
-            # level just generated.
-            self.level = all_coordinates[:turns]
+    @property
+    def lights_left(self):
+        return self.model.lights_left
 
-            # They are also the solution of this game. Keeping it separate as
-            # the level representation might change in the future.
-            self.solution = all_coordinates[:turns]
+    def apply_level(self, level):
+        self.model.apply_level(level)
 
+    def dirty_rects(self):
+
+        if self.view is not None:
+            rects = self.view.dirty_rects()
         else:
-            self.level = level
-            self.solution = list(level)
+            rects = [light.rect for row in self.lights for light in row
+                    if light.is_dirty()]
 
-        # Empty the board first.
-        for row in self.board:
-            for light in row:
-                light.value = False
+        if self.menu_btn.is_dirty():
+            rects.append(self.menu_btn.rect)
 
-        # Toggle each of the selected coordinate.
-        for i, j in self.level:
-            self.toggle(i, j)
+        if self.lights_left != self.lights_left_drawn:
+            rects.append(self.lights_left_rect)
 
-    def draw(self):
+        return rects
+
+    def draw(self, rect=None):
         # Draw the title.
-        self.display.blit(self.title_surface, self.title_rect)
+        if rect is None or rect.colliderect(self.title_rect):
+            self.display.blit(self.title_surface, self.title_rect)
+
+        # Draw the number of lights left.
+        if rect is None or rect.colliderect(self.lights_left_rect):
+            self.draw_lights_left()
 
         # Draw the lights.
-        for row in self.board:
-            for light in row:
-                light.draw()
+        if self.view is not None:
+            if rect is None or rect.colliderect(self.view.viewport):
+                self.view.draw(rect)
+
+        else:
+            for row in self.lights:
+                for light in row:
+                    if rect is None or rect.colliderect(light.rect):
+                        light.draw()
 
         # Draw the buttons.
-        self.menu_btn.draw()
+        if rect is None or rect.colliderect(self.menu_btn.rect):
+            self.menu_btn.draw()
 
     def handle(self, event):
 
         # Pass to any components that might need it.
         self.menu_btn.handle(event)
 
+        if self.view is not None:
+            self.view.handle(event)
+
         # Left click.
         if event.type == MOUSEBUTTONUP and event.button == 1:
             self.on_left_click(event)
 
+        # Ctrl+Z to undo, Ctrl+Y or Ctrl+Shift+Z to redo.
+        elif event.type == KEYDOWN and event.mod & KMOD_CTRL:
+
+            if event.key == K_z and not event.mod & KMOD_SHIFT:
+                self.undo()
+
+            elif event.key in (K_y, K_z):
+                self.redo()
+
+        # H for a hint.
+        elif event.type == KEYDOWN and event.key == K_h:
+            self.show_hint()
+
     def update_light_positions(self):
 
         y = self.board_y
-        for i, row in enumerate(self.board):
+        for row in self.lights:
             x = self.board_x
 
-            for j, light in enumerate(row):
+            for light in row:
                 light.update_rect(x=x, y=y)
                 x += self.light_size + self.light_gap
 
             y += self.light_size + self.light_gap
 
+    def set_spotlight(self, cell):
+        """Highlight the light at `cell`, an `(i, j)`, or none if `None`."""
+
+        if self.view is not None:
+            if cell is None:
+                self.view.spotlight = None
+            else:
+                self.view.spotlight = self.board.index(*cell)
+                self.view.reveal(*cell)
+
+        else:
+            if self.spotlight is not None:
+                i, j = self.spotlight
+                self.lights[i][j].in_spotlight = False
+
+            if cell is not None:
+                i, j = cell
+                self.lights[i][j].in_spotlight = True
+
+        self.spotlight = cell
+
+    def show_hint(self):
+        """Highlight a move of the solution for `HINT_TIME`."""
+
+        self.clear_hint()
+        self.set_spotlight(self.model.hint())
+
+        if self.scheduler is not None and self.spotlight is not None:
+            self.hint_timer = self.scheduler.call_later(HINT_TIME,
+                    self.clear_hint)
+
+    def clear_hint(self):
+
+        if self.hint_timer is not None:
+            self.hint_timer.cancel()
+            self.hint_timer = None
+
+        self.set_spotlight(None)
+
+    def deactivated(self):
+        # Leave no hint behind for the solver or the next visit.
+        self.clear_hint()
+
+    def draw_lights_left(self):
+        lights_left = self.lights_left
+
+        if lights_left != self.lights_left_drawn:
+            self.lights_left_surface = self.lights_left_font.render(
+                    '{} light{} left'.format(lights_left,
+                        '' if lights_left == 1 else 's'),
+                    True, (150, 150, 150))
+            self.lights_left_drawn = lights_left
+
+        self.display.blit(self.lights_left_surface,
+                self.lights_left_surface.get_rect(
+                    center=self.lights_left_rect.center))
+
     def on_left_click(self, event):
 
         # Get the light's coordinates under the click, if any.
         light_pos = self.get_light_under_point(event.pos)
 
         # No light under the click. Do nothing.
-        if light_pos is not None:
+        if light_pos is None:
+            return
 
-            # Toggle this light and all the lights that go with it.
-            self.toggle(*light_pos)
+        # A move makes way for the next hint.
+        self.clear_hint()
 
-            # Add/remove it to/from the solution.
-            try:
-                self.solution.remove(light_pos)
-            except ValueError:
-                self.solution.append(light_pos)
+        # Toggle this light and all the lights that go with it.
+        self.model.press(*light_pos)
 
+        # Only a move can end the game, and the board keeps count of the
+        # lights on, so this doesn't look at the lights themselves.
         self.check_game_over()
 
     def get_light_under_point(self, point):
+
+        if self.view is not None:
+            return self.view.cell_at(point)
+
         point_x, point_y = point
 
         # Check if the point is even on the board or not.
@@ -157,51 +299,30 @@ class GameState(EventSystem):
 
         # Return this (i, j) only if the click is not in the padding space.
         if offset_x <= self.light_size and offset_y <= self.light_size:
-            return i, j
+            return int(i), int(j)
         else:
             return None
 
-    def toggle(self, light_i, light_j):
-        # List of coordinates of lights to be toggled.
-        toggle_positions = [(light_i, light_j)]
-
-        game_size = self.game_size
+    def undo(self):
+        self.clear_hint()
 
-        if light_j < game_size - 1:
-            toggle_positions.append((light_i, light_j + 1))
+        if self.model.undo():
+            self.check_game_over()
 
-        if light_j > 0:
-            toggle_positions.append((light_i, light_j - 1))
+    def redo(self):
+        self.clear_hint()
 
-        if light_i < game_size - 1:
-            toggle_positions.append((light_i + 1, light_j))
+        if self.model.redo():
+            self.check_game_over()
 
-        if light_i > 0:
-            toggle_positions.append((light_i - 1, light_j))
-
-        # Toggle the light at this location.
-        for i, j in toggle_positions:
-            self.board[i][j].toggle()
+    def toggle(self, light_i, light_j):
+        self.model.toggle(light_i, light_j)
 
     def check_game_over(self):
-
-        for row in self.board:
-            for light in row:
-                if light.value:
-                    self.is_game_over = False
-                    return
-
-        self.is_game_over = True
-        self.emit('game-over')
+        self.model.check_game_over()
 
     def restart(self):
-        self.apply_level(self.level)
-
-    def print_board(self):
-        for row in self.board:
-            for light in row:
-                print('⁕' if light.value else '•', end=' ')
-            print()
+        self.model.restart()
 
 
 class GameOverState(EventSystem):
@@ -210,31 +331,32 @@ class GameOverState(EventSystem):
         self.display = display
         self.game = game
 
-        self.overlay_surface = self.display.convert_alpha()
-        self.overlay_surface.fill((0, 0, 0, 230))
+        self.title_surface = assets.text('Signika-Regular.ttf', 40,
+                'Yay! You won!', (213, 85, 148))
+
+        self.title_rect = self.title_surface.get_rect()
+        self.title_rect.centerx = self.display.get_width() / 2
+        self.title_rect.top = 64
+
+        self.menu_bar = MenuButtonBar(self.display, solve_button=False,
+                resume_button=False)
+        self.menu_bar.update_rect(y=self.title_rect.bottom + 18)
+        # Pass all of the menu's events on, as they are.
+        self.menu_bar.listen('*', self.emit)
 
-        title_font = pygame.font.Font('Signika-Regular.ttf', 40)
-        title_surface = title_font.render('Yay! You won!', True,
-                (213, 85, 148))
+    def dirty_rects(self):
+        return self.menu_bar.dirty_rects()
 
-        title_rect = title_surface.get_rect()
-        title_rect.centerx = self.display.get_width() / 2
-        title_rect.top = 64
+    def draw(self, rect=None):
+        self.game.draw(rect)
 
-        self.overlay_surface.blit(title_surface, title_rect)
+        # Dim the game in place.
+        self.display.fill(DIM_COLOR, rect, special_flags=BLEND_RGB_MULT)
 
-        self.menu_bar = MenuButtonBar(self.overlay_surface, solve_button=False,
-                resume_button=False)
-        self.menu_bar.update_rect(y=title_rect.top + title_rect.height + 18)
-        self.menu_bar.listen('*', self.on_menu_event)
+        if rect is None or rect.colliderect(self.title_rect):
+            self.display.blit(self.title_surface, self.title_rect)
 
-    def draw(self):
-        self.game.draw()
-        self.display.blit(self.overlay_surface, (0, 0))
-        self.menu_bar.draw()
+        self.menu_bar.draw(rect)
 
     def handle(self, event):
         self.menu_bar.handle(event)
-
-    def on_menu_event(self, event):
-        self.emit(event)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Level packs: many levels of one board size in a compact binary file.
+
+    python levelpack.py build levels.lpk --size 5 --count 100000
+    python levelpack.py info levels.lpk
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import sys
+import mmap
+import random
+import struct
+import argparse
+from board import popcount
+from cache import row_bytes
+from solver import TOPOLOGY, get_solver
+from levels import DIFFICULTIES, DEFAULT_DIFFICULTY, LevelGenerator
+from topology import TOPOLOGIES, get_topology
+
+# Header of a pack: magic, format version, board size, a reserved field,
+# topology, number of levels, bytes per level record and number of index
+# entries. It's followed by the index and then the records.
+#
+# Each record is a level's minimal solution as a bit-packed press mask over
+# the cells, little endian. Records are sorted by move count, and each index
+# entry gives the first record and the number of records of one move count.
+MAGIC = b'LPLV'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI16sQII')
+INDEX_ENTRY = struct.Struct('<IQQ')
+
+
+def write_pack(path, size, levels, topology=TOPOLOGY):
+    """Save `levels`, given as press masks, as a pack for `size` boards in
+    `topology`."""
+
+    levels = sorted(levels, key=popcount)
+    record_bytes = row_bytes(size * size)
+
+    index = []
+    for position, presses in enumerate(levels):
+        moves = popcount(presses)
+
+        if index and index[-1][0] == moves:
+            index[-1][2] += 1
+        else:
+            index.append([moves, position, 1])
+
+    with open(path, 'wb') as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, VERSION, size, 0,
+                get_topology(topology).name.encode('ascii'), len(levels),
+                record_bytes, len(index)))
+
+        for entry in index:
+            pack_file.write(INDEX_ENTRY.pack(*entry))
+
+        for presses in levels:
+            pack_file.write(presses.to_bytes(record_bytes, 'little'))
+
+
+class LevelPack(object):
+    """A memory-mapped level pack. Only the header and index are read up
+    front, records are read from the map as they are asked for."""
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as pack_file:
+            self.buffer = mmap.mmap(pack_file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+
+        (magic, version, self.size, _, topology, self.count, self.record_bytes,
+                index_count) = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} level pack.'.format(path,
+                    VERSION))
+
+        self.topology = topology.rstrip(b'\0').decode('ascii')
+
+        # Move count to `(first record, number of records)`.
+        self.index = {}
+        for position in range(index_count):
+            moves, start, count = INDEX_ENTRY.unpack_from(self.buffer,
+                    HEADER.size + position * INDEX_ENTRY.size)
+            self.index[moves] = start, count
+
+        self.records_offset = HEADER.size + index_count * INDEX_ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def presses(self, position):
+        start = self.records_offset + position * self.record_bytes
+        return int.from_bytes(self.buffer[start:start + self.record_bytes],
+                'little')
+
+    def level(self, position):
+        """The level at `position`, as a list of `(i, j)` presses."""
+        return get_solver(self.size, self.topology).moves(
+                self.presses(position))
+
+    def positions(self, min_moves, max_moves):
+        """Ranges of the positions of levels with `min_moves` to `max_moves`
+        moves."""
+
+        return [range(start, start + count)
+                for moves, (start, count) in sorted(self.index.items())
+                if min_moves <= moves <= max_moves]
+
+    def moves_histogram(self):
+        return dict((moves, count)
+                for moves, (start, count) in self.index.items())
+
+    def generator(self, min_moves, max_moves, rng=None):
+        return PackLevelSource(self, min_moves, max_moves, rng)
+
+    def close(self):
+        self.buffer.close()
+
+
+class PackLevelSource(object):
+    """Random levels from a pack within a band of move counts. It can stand in
+    for a `LevelGenerator` behind a `LevelPool`."""
+
+    def __init__(self, pack, min_moves, max_moves, rng=None):
+        self.pack = pack
+        self.rng = random.Random() if rng is None else rng
+        self.ranges = pack.positions(min_moves, max_moves)
+        self.total = sum(len(positions) for positions in self.ranges)
+
+        if not self.total:
+            raise ValueError('The pack has no levels with {}-{} moves.'.format(
+                    min_moves, max_moves))
+
+    def generate(self):
+        position = self.rng.randrange(self.total)
+
+        for positions in self.ranges:
+            if position < len(positions):
+                return self.pack.level(positions[position])
+
+            position -= len(positions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and inspect level '
+            'packs.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    build_parser = commands.add_parser('build', help='Generate a pack of '
+            'random levels.')
+    build_parser.add_argument('path')
+    build_parser.add_argument('--size', type=int, default=5)
+    build_parser.add_argument('--count', type=int, default=10000)
+    build_parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES),
+            default=DEFAULT_DIFFICULTY)
+    build_parser.add_argument('--topology', choices=sorted(TOPOLOGIES),
+            default=TOPOLOGY)
+    build_parser.add_argument('--seed', type=int, default=None)
+
+    info_parser = commands.add_parser('info', help='Show the levels in a '
+            'pack by move count.')
+    info_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        generator = LevelGenerator.for_difficulty(args.size, args.difficulty,
+                random.Random(args.seed), args.topology)
+
+        # The same board can come up more than once, keep it only once.
+        levels = set()
+        for _ in range(args.count):
+            levels.add(generator.generate_presses())
+
+        write_pack(args.path, args.size, levels, args.topology)
+        print('Saved {} levels to {}.'.format(len(levels), args.path))
+
+    else:
+        pack = LevelPack(args.path)
+        print('{0}x{0} {1}, {2} levels'.format(pack.size, pack.topology,
+                len(pack)))
+
+        for moves, count in sorted(pack.moves_histogram().items()):
+            print('{:4} moves: {}'.format(moves, count))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
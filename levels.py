@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import threading
+from collections import deque
+from board import popcount
+from solver import get_solver
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+# Bands of minimal move counts, as multiples of the board size.
+DIFFICULTIES = {
+    'easy': (.6, 1.2),
+    'normal': (1, 2),
+    'hard': (2, 3),
+}
+
+DEFAULT_DIFFICULTY = 'normal'
+
+# Random press patterns tried per level, before giving up on a band.
+MAX_ATTEMPTS = 1000
+
+# Boards with up to this many cells have their longest minimal solution found
+# by trying every position, see `max_minimal_moves`.
+MAX_SEARCHED_CELLS = 16
+
+
+def difficulty_band(size, difficulty=DEFAULT_DIFFICULTY):
+    """The `(min_moves, max_moves)` of a named difficulty on a board size."""
+
+    low, high = DIFFICULTIES[difficulty]
+    cells = size * size
+
+    min_moves = max(1, min(cells, int(round(low * size))))
+    max_moves = max(min_moves, min(cells, int(round(high * size))))
+
+    return min_moves, max_moves
+
+
+def max_minimal_moves(solver):
+    """The most moves the minimal solution of any position takes with a GF(2)
+    `solver`. On boards with more than `MAX_SEARCHED_CELLS` cells, it's an
+    upper bound of it.
+
+    The solutions of a position are a coset of the null space. With the basis
+    in echelon form, exactly one of them has no presses on the pivot cells,
+    so no minimal solution is longer than the number of other cells.
+    """
+
+    cells = solver.cell_count
+
+    # Basis vectors by their pivot, their lowest bit. Each vector only has
+    # bits above its pivot, which clears the pivots of a press pattern one
+    # after the other, from the lowest.
+    echelon = {}
+    for vector in solver.null_basis:
+        while vector and (vector & -vector) in echelon:
+            vector ^= echelon[vector & -vector]
+
+        if vector:
+            echelon[vector & -vector] = vector
+
+    free = [1 << index for index in range(cells) if 1 << index not in echelon]
+
+    if cells > MAX_SEARCHED_CELLS or not echelon:
+        return len(free)
+
+    null_space = [0]
+    for vector in echelon.values():
+        null_space.extend([combination ^ vector for combination in null_space])
+
+    # Every solution with no presses on the pivots, in Gray code order.
+    longest = presses = 0
+    for step in range(1, 1 << len(free)):
+        presses ^= free[(step & -step).bit_length() - 1]
+        longest = max(longest, min(popcount(presses ^ vector)
+                for vector in null_space))
+
+    return longest
+
+
+class LevelGenerator(object):
+    """Makes levels whose minimal solution is between `min_moves` and
+    `max_moves` long.
+
+    A level is the list of `(i, j)` presses that create it from an empty
+    board, which is also its minimal solution. Only lights that are on or off
+    are supported, in any topology.
+    """
+
+    def __init__(self, size, min_moves, max_moves, rng=None,
+            topology=DEFAULT_TOPOLOGY):
+
+        if not 1 <= min_moves <= max_moves <= size * size:
+            raise ValueError('Invalid move count band {}-{} for a {}x{} '
+                    'board.'.format(min_moves, max_moves, size, size))
+
+        self.size = size
+        self.min_moves = min_moves
+        self.max_moves = max_moves
+        self.rng = random.Random() if rng is None else rng
+        self.solver = get_solver(size, topology)
+
+        longest = max_minimal_moves(self.solver)
+        if min_moves > longest:
+            raise ValueError('No level of a {0}x{0} {1} board takes more than '
+                    '{2} moves, asked for {3}-{4}.'.format(size,
+                        get_topology(topology).name, longest, min_moves,
+                        max_moves))
+
+    @classmethod
+    def for_difficulty(cls, size, difficulty=DEFAULT_DIFFICULTY, rng=None,
+            topology=DEFAULT_TOPOLOGY):
+        min_moves, max_moves = difficulty_band(size, difficulty)
+        return cls(size, min_moves, max_moves, rng, topology)
+
+    def generate(self):
+        return self.solver.moves(self.generate_presses())
+
+    def generate_presses(self):
+        """A level as a press mask over the board's cells."""
+
+        cells = self.size * self.size
+
+        for attempt in range(MAX_ATTEMPTS):
+            # Press a random set of cells, then cut that down to the fewest
+            # presses giving the same board. That's the real move count.
+            count = self.rng.randint(self.min_moves, self.max_moves)
+            presses = 0
+            for index in self.rng.sample(range(cells), count):
+                presses |= 1 << index
+
+            presses = self.solver.minimize(presses)
+
+            if self.min_moves <= popcount(presses) <= self.max_moves:
+                return presses
+
+        raise ValueError('Could not generate a level with {}-{} moves on a '
+                '{}x{} board.'.format(self.min_moves, self.max_moves,
+                    self.size, self.size))
+
+
+class LevelPool(object):
+    """Levels generated ahead of time, so taking one is instant.
+
+    With `background`, a daemon thread keeps the pool topped up to `capacity`.
+    Otherwise it can be filled with `fill`, or with levels generated offline
+    through `extend`. If it runs dry, `take` waits for the thread's next level,
+    or without one generates a level right away. Either way only one thread
+    draws from the generator's random numbers, so a seeded generator gives the
+    same levels in the same order. If the thread fails to generate a level,
+    `take` raises its error once the pool is empty.
+    """
+
+    def __init__(self, generator, capacity=16, background=True):
+        self.generator = generator
+        self.capacity = capacity
+        self.levels = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # What the background thread raised, if it stopped on an error.
+        self.error = None
+
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.run,
+                    name='level-pool')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def __len__(self):
+        return len(self.levels)
+
+    def take(self):
+
+        with self.condition:
+            if self.thread is not None:
+                while (not self.levels and not self.closed and
+                        self.error is None):
+                    self.condition.wait()
+
+            if self.levels:
+                level = self.levels.popleft()
+
+                # Wake up the background thread to replace it.
+                self.condition.notify_all()
+                return level
+
+            if self.error is not None:
+                raise self.error
+
+        return self.generator.generate()
+
+    def extend(self, levels):
+
+        with self.condition:
+            self.levels.extend(levels)
+
+    def fill(self):
+
+        while len(self.levels) < self.capacity:
+            level = self.generator.generate()
+
+            with self.condition:
+                self.levels.append(level)
+
+    def run(self):
+
+        while True:
+
+            with self.condition:
+                while not self.closed and len(self.levels) >= self.capacity:
+                    self.condition.wait()
+
+                if self.closed:
+                    return
+
+            # Generate outside the lock, so `take` never waits on it for
+            # longer than a level takes.
+            try:
+                level = self.generator.generate()
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.levels.append(level)
+                self.condition.notify_all()
+
+    def close(self):
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -5,48 +5,60 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import pygame
+from assets import assets
 
 class Light(object):
+    """A view of a single cell of a `Board`, used only for drawing. There's
+    one per cell, so they have slots rather than a dict each."""
+
+    __slots__ = ('display', 'board', 'i', 'j', 'images', 'rect',
+            'in_spotlight', 'drawn')
 
     on_image = None
     off_image = None
+    spotlight_image = None
 
-    def __init__(self, display, value=False):
+    def __init__(self, display, board, i, j):
         self.display = display
-        self.value = value
+        self.board = board
+        self.i = i
+        self.j = j
 
         if Light.on_image is None:
-            Light.on_image = pygame.image.load('img/light-on.png')
-            Light.off_image = pygame.image.load('img/light-off.png')
-            Light.spotlight_image = pygame.image.load('img/light-spotlight.png')
+            Light.on_image = assets.image('light-on')
+            Light.off_image = assets.image('light-off')
+            Light.spotlight_image = assets.image('light-spotlight')
+
+        self.images = assets.state_images(board.states)
 
         self.rect = pygame.Rect((0, 0), Light.on_image.get_size())
 
         # Whether to highlight this light. Used by solver.
         self.in_spotlight = False
 
+        # The `(value, in_spotlight)` last drawn, to tell if it has changed.
+        self.drawn = None
+
+    @property
+    def value(self):
+        return self.board.value(self.i, self.j)
+
     def update_rect(self, **kwargs):
         for name, value in kwargs.items():
             setattr(self.rect, name, value)
 
+    def is_dirty(self):
+        return (self.value, self.in_spotlight) != self.drawn
+
     def draw(self):
-        self.display.blit(Light.on_image if self.value else Light.off_image,
-                self.rect)
+        value = self.value
+
+        self.display.blit(self.images[value], self.rect)
 
         if self.in_spotlight:
             self.display.blit(Light.spotlight_image, self.rect)
 
-    def toggle(self):
-        self.value = not self.value
-
-    def __deepcopy__(self, memo):
-        # Deep copying the surface doesn't make sense and doesn't work out
-        # either.
-        clone = Light(self.display, self.value)
-
-        clone.update_rect(x=self.rect.x, y=self.rect.y)
-
-        return clone
+        self.drawn = value, self.in_spotlight
 
     def __unicode__(self):
         return '<Light ' + ('on' if self.value else 'off') + '>'
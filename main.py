@@ -4,12 +4,114 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
-import sys
-from app import App
+from startup import startup, blocked_imports
+
+# Imported first here only to time it apart from the game's own modules. As it
+# loads, pygame imports NumPy for surfarray and pkg_resources for its package
+# data, which the game uses neither of. Together they take most of pygame's
+# import time, so they are left out while it loads, and only then: importing
+# pygame.surfarray or NumPy later still works.
+with startup.phase('import', 'pygame'), blocked_imports('numpy',
+        'pkg_resources'):
+    import pygame
+
+with startup.phase('import', 'game modules'):
+    import argparse
+    from app import App
+    from frames import DEFAULT_FPS
+    from profiler import Profiler
+    from levels import DIFFICULTIES, DEFAULT_DIFFICULTY
+    from levels import difficulty_band, max_minimal_moves
+    from levelpack import LevelPack
+    from solver import MAX_MODULAR_SIZE, get_solver, is_prime
+    from topology import TOPOLOGIES, DEFAULT_TOPOLOGY
+
+parser = argparse.ArgumentParser(description='Lights poof!')
+parser.add_argument('--dev', action='store_true',
+        help='Start with an easy level and show frame time stats.')
+parser.add_argument('--fps', type=int, default=DEFAULT_FPS,
+        help='Target frame rate.')
+parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES),
+        default=DEFAULT_DIFFICULTY, help='How many moves new levels take.')
+parser.add_argument('--size', type=int, default=5,
+        help='Number of lights on each side of the board.')
+parser.add_argument('--topology', choices=sorted(TOPOLOGIES),
+        default=DEFAULT_TOPOLOGY, help='Which lights a move toggles: the plus '
+        'or king (3x3) neighbourhood, on a flat board or wrapping around as a '
+        'torus.')
+parser.add_argument('--states', type=int, default=2,
+        help='Number of states each light cycles through. Must be prime.')
+parser.add_argument('--level-pack', metavar='PATH',
+        help='Take levels from a level pack instead of generating them.')
+parser.add_argument('--profile', nargs='?', const='trace.json',
+        metavar='PATH', help='Time each frame\'s work and save it on exit as a '
+        'Chrome trace, to trace.json by default.')
+parser.add_argument('--speed', type=float, default=1,
+        help='Speed of the solver and other animations, or inf for '
+        'instant.')
+parser.add_argument('--seed', type=int,
+        help='Seed of the random levels, to get the same ones again.')
+parser.add_argument('--record', metavar='PATH',
+        help='Record the input to a log that replay.py plays back.')
+parser.add_argument('--mem-report', action='store_true',
+        help='Print the memory used by surfaces and objects of each part of '
+        'the game on exit.')
+parser.add_argument('--startup-report', action='store_true',
+        help='Print how long starting up took, by import, asset and state.')
+args = parser.parse_args()
+
+# Settings the game can't start with are usage errors, rather than the
+# tracebacks of `App` refusing them.
+if args.size < 1:
+    parser.error('--size must be at least 1.')
+
+if args.states != 2:
+
+    if not is_prime(args.states):
+        parser.error('--states must be prime, got {}.'.format(args.states))
+
+    if args.level_pack is not None:
+        parser.error('Level packs are only for lights with two states.')
+
+    if args.size > MAX_MODULAR_SIZE:
+        parser.error('Boards with lights of more than two states are at most '
+                '{0}x{0}.'.format(MAX_MODULAR_SIZE))
+
+elif args.level_pack is not None:
+
+    try:
+        pack = LevelPack(args.level_pack)
+    except (IOError, OSError, ValueError) as error:
+        parser.error('Could not open the level pack: {}'.format(error))
+
+    if (pack.size, pack.topology) != (args.size, args.topology):
+        parser.error('{0} has {1}x{1} {2} levels, pass --size {1} --topology '
+                '{2} to play them.'.format(args.level_pack, pack.size,
+                    pack.topology))
+
+    try:
+        pack.generator(*difficulty_band(pack.size, args.difficulty))
+    except ValueError as error:
+        parser.error(error)
+
+    pack.close()
 
-if '--dev' in sys.argv:
-    app = App(dev=True)
 else:
-    app = App()
+    min_moves, max_moves = difficulty_band(args.size, args.difficulty)
+    longest = max_minimal_moves(get_solver(args.size, args.topology))
+
+    if min_moves > longest:
+        parser.error('{0} levels take {1}-{2} moves, but none of a {3}x{3} {4} '
+                'board takes more than {5}. Pick an easier --difficulty or a '
+                'bigger --size.'.format(args.difficulty, min_moves, max_moves,
+                    args.size, args.topology, longest))
+
+app = App(dev=args.dev, fps=args.fps, difficulty=args.difficulty,
+        level_pack=args.level_pack, game_size=args.size,
+        topology=args.topology, states=args.states,
+        profiler=(Profiler() if args.profile else None),
+        profile_path=args.profile, seed=args.seed,
+        record_path=args.record, speed=args.speed,
+        startup_report=args.startup_report, mem_report=args.mem_report)
 
 app.main_loop()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Memory used by each part of the game, for `--mem-report`."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import gc
+import sys
+import types
+import pygame
+from assets import assets
+from cache import default_cache
+
+# Objects not followed when sizing a subsystem: code, and what's shared by
+# everything, such as classes and modules.
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType,
+        types.BuiltinFunctionType, types.CodeType)
+
+
+def surface_bytes(surface):
+    """Bytes of pixel data of `surface`."""
+    return surface.get_pitch() * surface.get_height()
+
+
+class MemoryReport(object):
+    """Sizes subsystems from their root objects, by following what they
+    reference. Anything already counted, by an earlier subsystem or as
+    `exclude`d, is left out, so shared objects count once, for the first
+    subsystem that has them."""
+
+    def __init__(self):
+        self.seen = set()
+
+        # `(name, surface count, surface bytes, object count, object bytes)`.
+        self.rows = []
+
+    def exclude(self, *objects):
+        self.seen.update(id(obj) for obj in objects)
+
+    def add(self, name, *roots):
+        seen = self.seen
+        pending = [root for root in roots if root is not None]
+        surfaces = surface_total = objects = object_total = 0
+
+        while pending:
+            obj = pending.pop()
+
+            if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+                continue
+
+            seen.add(id(obj))
+            objects += 1
+            object_total += sys.getsizeof(obj)
+
+            if isinstance(obj, pygame.Surface):
+                surfaces += 1
+                surface_total += surface_bytes(obj)
+
+            pending.extend(gc.get_referents(obj))
+
+        self.rows.append((name, surfaces, surface_total, objects,
+                object_total))
+
+    def format(self):
+        lines = ['{:>16} {:>9} {:>12} {:>9} {:>12}'.format('', 'surfaces',
+                'pixels', 'objects', 'object size')]
+
+        for name, surfaces, surface_total, objects, object_total in self.rows:
+            lines.append('{:>16} {:>9} {:>9.1f} KB {:>9} {:>9.1f} KB'.format(
+                    name, surfaces, surface_total / 1024, objects,
+                    object_total / 1024))
+
+        surfaces, surface_total, objects, object_total = [sum(column)
+                for column in list(zip(*self.rows))[1:]]
+        lines.append('{:>16} {:>9} {:>9.1f} KB {:>9} {:>9.1f} KB'.format(
+                'total', surfaces, surface_total / 1024, objects,
+                object_total / 1024))
+
+        return '\n'.join(lines)
+
+
+def app_report(app):
+    """A `MemoryReport` of the subsystems of an `App`. States it hasn't built
+    yet aren't in it."""
+
+    report = MemoryReport()
+    states = [app.game, app._menu, app._game_over_state, app._solver]
+
+    # Everything can be reached from the app, so it's only ever followed
+    # through the subsystems.
+    report.exclude(app, app.__dict__)
+
+    report.add('display', app.display)
+    report.add('assets', assets)
+    report.add('solver matrices', default_cache)
+    report.add('level pool', app.level_pool)
+    report.add('scheduler', app.scheduler)
+
+    # What else the app holds, such as its random numbers and frame pacer, is
+    # shared by the states, so it's counted before them and not under them.
+    report.add('app', *[value for value in app.__dict__.values()
+            if not any(value is state for state in states)])
+
+    report.add('board and rules', app.game.model)
+    report.add('game', app.game)
+    report.add('menu', app._menu)
+    report.add('game over', app._game_over_state)
+    report.add('solver', app._solver)
+
+    return report
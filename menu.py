@@ -5,9 +5,10 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import pygame
-from pygame.locals import MOUSEBUTTONUP, MOUSEBUTTONDOWN
+from pygame.locals import MOUSEBUTTONUP, MOUSEBUTTONDOWN, SRCALPHA
 from button import Button
 from events import EventSystem
+from assets import assets
 
 class MenuState(EventSystem):
 
@@ -16,9 +17,8 @@ class MenuState(EventSystem):
 
         # The title is a bit bigger in the menu, than the game.
         # FIXME: Remove repetition with the title display code in `Game`.
-        title_font = pygame.font.Font('Signika-Regular.ttf', 48)
-        self.title_surface = title_font.render('Lights poof!', True,
-                (213, 85, 148))
+        self.title_surface = assets.text('Signika-Regular.ttf', 48,
+                'Lights poof!', (213, 85, 148))
         self.title_rect = self.title_surface.get_rect()
         self.title_rect.centerx = self.display.get_width() / 2
         self.title_rect.top = 18
@@ -26,31 +26,31 @@ class MenuState(EventSystem):
         self.menu_bar = MenuButtonBar(self.display)
         self.menu_bar.update_rect(y=self.title_rect.top +
                 self.title_rect.height + 24)
-        self.menu_bar.listen('*', self.on_menu_event)
-        self.menu_bar.handler = self
+        # Pass all of the menu's events on, as they are.
+        self.menu_bar.listen('*', self.emit)
 
-    def draw(self):
+    def dirty_rects(self):
+        return self.menu_bar.dirty_rects()
+
+    def draw(self, rect=None):
         # Draw the title.
-        self.display.blit(self.title_surface, self.title_rect)
+        if rect is None or rect.colliderect(self.title_rect):
+            self.display.blit(self.title_surface, self.title_rect)
 
-        self.menu_bar.draw()
+        self.menu_bar.draw(rect)
 
     def handle(self, event):
         self.menu_bar.handle(event)
 
-    def on_menu_event(self, event):
-        self.emit(event)
-
 
 class MenuButtonBar(EventSystem):
 
     def __init__(self, display, solve_button=True, resume_button=True):
 
         self.display = display
-        self.surface = self.display.convert_alpha()
-        self.rect = self.surface.get_rect()
 
-        # Maintain a list of buttons in this menu.
+        # Maintain a list of buttons in this menu. They draw on `surface`,
+        # made once they are laid out, with their rects relative to the bar.
         self.buttons = []
 
         # Create the buttons.
@@ -63,52 +63,125 @@ class MenuButtonBar(EventSystem):
         if resume_button:
             self.new_button('Resume', 'resume-click')
 
-        # Incrementally set the `y` coordinate of the buttons.
+        # Incrementally set the `y` coordinate of the buttons, centered in a
+        # bar as wide as the widest.
+        width = max(button.rect.width for button in self.buttons)
         y = 0
         button_gap = 12
         for button in self.buttons:
-            button.update_rect(y=y)
+            button.update_rect(centerx=width // 2, y=y)
             y += button.rect.height + button_gap
 
-        self.update_rect(x=0, width=self.display.get_width(),
-                height=y - button_gap)
+        # Only as big as the buttons, centered on the display.
+        self.surface = pygame.Surface((width, y - button_gap),
+                SRCALPHA).convert_alpha()
+        self.rect = self.surface.get_rect(
+                centerx=self.display.get_width() // 2)
+
+        for button in self.buttons:
+            button.display = self.surface
+
+        # Buttons pressed down with the mouse, waiting for the mouse up.
+        self.pressed = []
+
+        # Buttons whose pressed state changed since the last draw.
+        self.changed = []
 
+        self.index_buttons()
         self.render()
 
+    def index_buttons(self):
+        """Index the buttons by horizontal bands of `band_height` pixels, so
+        finding the one under a point only checks the buttons in its band."""
+
+        self.band_height = max(button.rect.height for button in self.buttons)
+        self.bands = {}
+
+        for button in self.buttons:
+            first = button.rect.top // self.band_height
+            last = (button.rect.bottom - 1) // self.band_height
+
+            for band in range(first, last + 1):
+                self.bands.setdefault(band, []).append(button)
+
+    def button_at(self, pos):
+        """The button under `pos`, relative to `self.rect`, if any."""
+
+        for button in self.bands.get(pos[1] // self.band_height, ()):
+            if button.contains(pos):
+                return button
+
+        return None
+
     def render(self):
         self.surface.fill((0, 0, 0, 0))
 
         for button in self.buttons:
             button.draw()
 
+    def render_button(self, button):
+        self.surface.fill((0, 0, 0, 0), button.rect)
+        button.draw()
+
     def update_rect(self, **kwargs):
         for name, value in kwargs.items():
             setattr(self.rect, name, value)
 
-    def draw(self):
-        self.display.blit(self.surface, self.rect)
+    def dirty_rects(self):
+        # Buttons are positioned relative to `self.rect`.
+        x, y = self.rect.topleft
+        return [button.rect.move(x, y) for button in self.changed
+                if button.is_dirty()]
+
+    def draw(self, rect=None):
+
+        # Bring the surface up to date, redrawing only the changed buttons.
+        for button in self.changed:
+            if button.is_dirty():
+                self.render_button(button)
+
+        del self.changed[:]
+
+        if rect is None:
+            self.display.blit(self.surface, self.rect)
+
+        elif rect.colliderect(self.rect):
+            # Only blit the part under `rect`, the rest of the display is
+            # already up to date.
+            clip = rect.clip(self.rect)
+            self.display.blit(self.surface, clip,
+                    clip.move(-self.rect.x, -self.rect.y))
 
     def handle(self, event):
 
-        if event.type in (MOUSEBUTTONUP, MOUSEBUTTONDOWN) and event.button == 1:
-            # The event `pos` would be based on the coordinates of the root
-            # display. It needs to be translated to be based on `self.rect`
-            # so the button compares it correctly.
+        # Buttons only care about left clicks. Skip everything else, mouse
+        # motion included, without touching them.
+        if event.type not in (MOUSEBUTTONUP, MOUSEBUTTONDOWN) or \
+                event.button != 1:
+            return
 
-            # Also, events are read-only. So we need to create a new event.
+        # The event `pos` would be based on the coordinates of the root
+        # display. It needs to be translated to be based on `self.rect` so the
+        # button compares it correctly.
+        pos = event.pos[0] - self.rect.x, event.pos[1] - self.rect.y
 
-            pos = event.pos
-            event = pygame.event.Event(event.type, button=event.button,
-                    pos=(pos[0] - self.rect.x, pos[1] - self.rect.y))
+        if event.type == MOUSEBUTTONDOWN:
+            button = self.button_at(pos)
 
-        for button in self.buttons:
-            button.handle(event)
+            if button is not None:
+                button.mousedown(pos)
+                self.pressed.append(button)
+                self.changed.append(button)
 
-        self.render()
+        else:
+            pressed, self.pressed = self.pressed, []
+
+            for button in pressed:
+                button.mouseup(pos)
+                self.changed.append(button)
 
     def new_button(self, label, event_name):
-        button = Button(self.surface, label,
-                centerx=self.display.get_width() / 2)
+        button = Button(None, label)
 
         button.listen('click',
                 lambda event: self.emit(event_name, **event.props))
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+from board import make_board
+from events import EventSystem
+from solver import get_solver, is_prime
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+
+class GameModel(EventSystem):
+    """The rules of a single game, with no pygame or display involved. The
+    pygame `GameState` draws one of these and forwards the player's clicks to
+    it.
+
+    The moves that solve the board are tracked in `presses`, a mask with one
+    bit per cell like the board's state. Pressing a cell twice cancels out, so
+    each move flips its bit. With `minimal`, the `solution` is reduced to the
+    fewest moves, see `BoardSolver.minimize`.
+
+    For the same reason a move is undone by making it again, so the undo and
+    redo history is just the cells pressed.
+
+    Moves toggle the cells of `topology`. For lights with more than two states
+    use `CyclicGameModel`, or `make_model` to pick either.
+    """
+
+    def __init__(self, game_size=5, level=None, rng=None, minimal=True,
+            topology=DEFAULT_TOPOLOGY):
+        self.game_size = game_size
+        self.topology = get_topology(topology)
+        self.board = self.make_board()
+        self.minimal = minimal
+
+        # Source of random levels. Pass a seeded `random.Random` for
+        # reproducible games.
+        self.rng = random if rng is None else rng
+
+        self.level = None
+        self.is_game_over = False
+
+        # `presses`, and its minimal form, reduced when first asked for after
+        # a move.
+        self._presses = None
+        self._minimal_presses = None
+
+        # Board indexes of the moves made, and of the ones undone since the
+        # last move, most recent last.
+        self.history = []
+        self.undone = []
+
+        self.apply_level(level)
+
+    def apply_level(self, level):
+
+        if level is None:
+            # How many turns should the game be of?
+            min_turns = self.game_size
+            max_turns = self.game_size * 2
+            turns = self.rng.randint(min_turns, max_turns)
+
+            # Create a list of all possible coordinates and select `turns` of
+            # them in random.
+            all_coordinates = [(i, j) for i in range(self.game_size)
+                    for j in range(self.game_size)]
+            self.rng.shuffle(all_coordinates)
+
+            # Here's the level. Toggling these coordinates will give us the
+            # level just generated.
+            self.level = all_coordinates[:turns]
+
+        else:
+            self.level = level
+
+        # Empty the board and toggle each of the selected coordinate.
+        self.board.clear()
+        self.board.apply_moves(self.level)
+
+        self.presses = self.level_presses(self.level)
+
+        del self.history[:]
+        del self.undone[:]
+
+    def make_board(self):
+        return make_board(self.game_size, self.topology)
+
+    def level_presses(self, level):
+        """The press pattern that solves `level`. Toggling the same
+        coordinates again does."""
+
+        presses = 0
+        for i, j in level:
+            presses ^= 1 << self.board.index(i, j)
+
+        return presses
+
+    @property
+    def solver(self):
+        return get_solver(self.game_size, self.topology, self.board.states)
+
+    @property
+    def lights_left(self):
+        return self.board.lit_count
+
+    @property
+    def presses(self):
+        return self._presses
+
+    @presses.setter
+    def presses(self, presses):
+
+        if presses != self._presses:
+            self._presses = presses
+            self._minimal_presses = None
+
+    @property
+    def solution(self):
+        """The moves that solve the board, as `(i, j)` coordinates in row
+        order."""
+        return self.solver.moves(self.solution_presses())
+
+    def solution_presses(self):
+        """The moves that solve the board, as a press pattern."""
+
+        if not self.minimal:
+            return self.presses
+
+        if self._minimal_presses is None:
+            self._minimal_presses = self.solver.minimize(self.presses)
+
+        return self._minimal_presses
+
+    def hint(self):
+        """A move of the solution, as `(i, j)`, or `None` if it's solved."""
+
+        presses = self.solution_presses()
+
+        if not presses:
+            return None
+
+        # The lowest press, so hints go through the board in row order.
+        return divmod((presses & -presses).bit_length() - 1, self.game_size)
+
+    def toggle(self, i, j):
+        # Toggle the light at this location and all the lights that go with
+        # it, in a single XOR on the board.
+        self.board.toggle(i, j)
+
+    def press(self, i, j, record=True):
+        """A move made by the player at `(i, j)`. With `record`, it's added to
+        the undo history."""
+
+        index = self.board.index(i, j)
+
+        if record:
+            self.history.append(index)
+            del self.undone[:]
+
+        self.press_index(index)
+
+    def press_index(self, index):
+        self.board.toggle_index(index)
+
+        # Add/remove it to/from the solution.
+        bit = 1 << index
+        self._presses ^= bit
+
+        # Playing a move of the minimal solution leaves the rest of it
+        # minimal, as any shorter one would have been shorter before too.
+        # Other moves need it reduced again.
+        if self._minimal_presses is not None and self._minimal_presses & bit:
+            self._minimal_presses ^= bit
+        else:
+            self._minimal_presses = None
+
+    # Making a move again takes it back.
+    unpress_index = press_index
+
+    def undo(self):
+        """Take back the last move. Returns `False` if there was none."""
+
+        if not self.history:
+            return False
+
+        index = self.history.pop()
+        self.undone.append(index)
+        self.unpress_index(index)
+        return True
+
+    def redo(self):
+        """Make the last undone move again. Returns `False` if there was
+        none."""
+
+        if not self.undone:
+            return False
+
+        index = self.undone.pop()
+        self.history.append(index)
+        self.press_index(index)
+        return True
+
+    def snapshot(self):
+        """The state of the game as a tuple of immutable values, to be put
+        back with `restore`. The history isn't part of it."""
+        return (self.board.snapshot(), self._presses,
+                self._minimal_presses)
+
+    def restore(self, snapshot):
+        board, self._presses, self._minimal_presses = snapshot
+        self.board.restore(board)
+
+    def check_game_over(self):
+
+        if not self.board.is_solved():
+            self.is_game_over = False
+            return
+
+        self.is_game_over = True
+        self.emit('game-over')
+
+    def restart(self):
+        self.apply_level(self.level)
+
+    def print_board(self):
+        for i in range(self.game_size):
+            for j in range(self.game_size):
+                value = self.board.value(i, j)
+
+                if self.board.states > 2 and value:
+                    print(value, end=' ')
+                else:
+                    print('⁕' if value else '•', end=' ')
+            print()
+
+
+class CyclicGameModel(GameModel):
+    """A game whose lights go through `states` states, see `CyclicBoard`.
+
+    Press patterns are bytearrays of the number of moves at each cell, as with
+    `ModularSolver`. Taking back a move is no longer the same as making it, so
+    `presses` counts down as moves are made and up as they are undone.
+    """
+
+    def __init__(self, game_size=5, level=None, rng=None, minimal=True,
+            topology=DEFAULT_TOPOLOGY, states=3):
+
+        if not is_prime(states):
+            raise ValueError('Only games with a prime number of light states '
+                    'can be solved, got {}.'.format(states))
+
+        self.states = states
+        super(CyclicGameModel, self).__init__(game_size, level, rng, minimal,
+                topology)
+
+    def make_board(self):
+        return make_board(self.game_size, self.topology, self.states)
+
+    def level_presses(self, level):
+        # Each move of the level is taken back by making it `states - 1` more
+        # times.
+        presses = bytearray(self.board.cell_count)
+
+        for i, j in level:
+            index = self.board.index(i, j)
+            presses[index] = (presses[index] - 1) % self.states
+
+        return presses
+
+    @property
+    def presses(self):
+        return self._presses
+
+    @presses.setter
+    def presses(self, presses):
+
+        if presses != self._presses:
+            self._presses = bytearray(presses)
+            self._minimal_presses = None
+
+    def hint(self):
+        presses = self.solution_presses()
+
+        for index, count in enumerate(presses):
+            if count:
+                return divmod(index, self.game_size)
+
+        return None
+
+    def press_index(self, index):
+        self.board.toggle_index(index)
+
+        # One move fewer needed there, which as with `GameModel` leaves a
+        # minimal solution that had a move there minimal.
+        self._presses[index] = (self._presses[index] - 1) % self.states
+
+        minimal = self._minimal_presses
+        if minimal is not None and minimal[index]:
+            minimal[index] -= 1
+        else:
+            self._minimal_presses = None
+
+    def unpress_index(self, index):
+        self.board.untoggle_index(index)
+        self._presses[index] = (self._presses[index] + 1) % self.states
+        self._minimal_presses = None
+
+    def snapshot(self):
+        minimal = self._minimal_presses
+        return (self.board.snapshot(), bytes(self._presses),
+                None if minimal is None else bytes(minimal))
+
+    def restore(self, snapshot):
+        board, presses, minimal = snapshot
+        self.board.restore(board)
+        self._presses = bytearray(presses)
+        self._minimal_presses = None if minimal is None else bytearray(minimal)
+
+
+def make_model(game_size=5, level=None, rng=None, minimal=True,
+        topology=DEFAULT_TOPOLOGY, states=2):
+    """A `GameModel` for on/off lights, or a `CyclicGameModel` for more
+    states."""
+
+    if states == 2:
+        return GameModel(game_size, level, rng, minimal, topology)
+
+    return CyclicGameModel(game_size, level, rng, minimal, topology, states)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import time
+import functools
+from array import array
+
+DEFAULT_CAPACITY = 1 << 16
+
+
+class Profiler(object):
+    """Times calls to instrumented functions into a fixed size ring buffer, and
+    saves them in Chrome's trace event format, which trace viewers such as
+    `chrome://tracing` or Perfetto can open.
+
+    Once the buffer is full the oldest samples are overwritten, so memory use
+    stays fixed however long the game runs.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.names = [None] * capacity
+        self.starts = array('d', bytes(8 * capacity))
+        self.durations = array('d', bytes(8 * capacity))
+
+        # Total samples recorded. The next one goes at `count % capacity`.
+        self.count = 0
+
+        self.origin = time.perf_counter()
+
+    def record(self, name, start, duration):
+        index = self.count % self.capacity
+        self.names[index] = name
+        self.starts[index] = start
+        self.durations[index] = duration
+        self.count += 1
+
+    def wrap(self, name, fn):
+        """`fn`, timed into this profiler as `name`."""
+
+        clock = time.perf_counter
+        record = self.record
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = clock()
+
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, start, clock() - start)
+
+        timed.profiled = True
+        return timed
+
+    def instrument(self, owner, attribute, name=None):
+        """Replace the method or function `attribute` of `owner`, an object,
+        class or module, with a timed one. Does nothing if it already is."""
+
+        fn = getattr(owner, attribute, None)
+
+        if fn is None or getattr(fn, 'profiled', False):
+            return
+
+        if name is None:
+            name = '{}.{}'.format(getattr(owner, '__name__',
+                    type(owner).__name__), attribute)
+
+        setattr(owner, attribute, self.wrap(name, fn))
+
+    def samples(self):
+        """The recorded `(name, start, duration)` samples, oldest first."""
+
+        first = max(0, self.count - self.capacity)
+
+        for position in range(first, self.count):
+            index = position % self.capacity
+            yield self.names[index], self.starts[index], self.durations[index]
+
+    def trace_events(self):
+        events = [{
+            'name': 'process_name',
+            'ph': 'M',
+            'pid': 1,
+            'args': {'name': 'Lights poof!'},
+        }]
+
+        for name, start, duration in self.samples():
+            events.append({
+                'name': name,
+                'ph': 'X',
+                'pid': 1,
+                'tid': 1,
+                'ts': (start - self.origin) * 1e6,
+                'dur': duration * 1e6,
+            })
+
+        return events
+
+    def dump(self, path):
+
+        with open(path, 'w') as trace_file:
+            json.dump({
+                'traceEvents': self.trace_events(),
+                'displayTimeUnit': 'ms',
+            }, trace_file)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Recording of the input of a game, and replaying it headless.
+
+    python main.py --record session.lpr
+    python replay.py session.lpr
+
+A replay feeds the recorded events back through `App.handle` as fast as it
+can, and reports its throughput. The scheduler runs on a clock that jumps to
+the recorded time of each event, so timers such as the solver's steps go off
+between the same events as they did, without waiting for them. With the same
+seed the same levels come up, so it ends where the recorded game did.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import pygame
+from pygame.locals import MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+from pygame.locals import MOUSEWHEEL, KEYDOWN, KEYUP, QUIT, K_ESCAPE
+
+# Header of a log: magic, format version, RNG seed and the length of the app's
+# settings, saved as JSON right after it. Then come the events.
+MAGIC = b'LPRC'
+VERSION = 1
+HEADER = struct.Struct('<4sHQI')
+
+# Each event: milliseconds since the recording started, kind, a small signed
+# value (mouse button, pressed mouse buttons as bits, or wheel steps), position,
+# relative motion, key and key modifiers.
+EVENT = struct.Struct('<IBbhhhhIH')
+
+# Event kinds as stored in the log, so the log doesn't depend on pygame's
+# numbering.
+MOUSE_DOWN, MOUSE_UP, MOUSE_MOTION, MOUSE_WHEEL, KEY_DOWN, KEY_UP, QUIT_KIND = (
+        range(7))
+
+KINDS = {
+    MOUSEBUTTONDOWN: MOUSE_DOWN,
+    MOUSEBUTTONUP: MOUSE_UP,
+    MOUSEMOTION: MOUSE_MOTION,
+    MOUSEWHEEL: MOUSE_WHEEL,
+    KEYDOWN: KEY_DOWN,
+    KEYUP: KEY_UP,
+    QUIT: QUIT_KIND,
+}
+
+EVENT_TYPES = dict((kind, type_) for type_, kind in KINDS.items())
+
+
+class InputRecorder(object):
+    """Appends the input events given to `record` to a log at `path`, after
+    the `seed` and `settings` needed to start the same game again. Events are
+    timed with `clock`, the one of the app's scheduler."""
+
+    def __init__(self, path, seed, settings, clock=time.perf_counter):
+        self.file = open(path, 'wb')
+        self.clock = clock
+        self.start = clock()
+        self.count = 0
+
+        settings = json.dumps(settings, sort_keys=True).encode('utf-8')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, len(settings)))
+        self.file.write(settings)
+
+    def record(self, event):
+        kind = KINDS.get(event.type)
+
+        # Anything else, such as the animation timer, is made up again by the
+        # replay.
+        if kind is None:
+            return
+
+        small = x = y = dx = dy = key = mod = 0
+
+        if kind in (MOUSE_DOWN, MOUSE_UP):
+            small = event.button
+            x, y = event.pos
+
+        elif kind == MOUSE_MOTION:
+            small = sum(bool(pressed) << index
+                    for index, pressed in enumerate(event.buttons))
+            x, y = event.pos
+            dx, dy = event.rel
+
+        elif kind == MOUSE_WHEEL:
+            # The wheel doesn't say where the mouse is, but the board view
+            # zooms around it.
+            small = event.y
+            x, y = getattr(event, 'pos', None) or pygame.mouse.get_pos()
+
+        elif kind in (KEY_DOWN, KEY_UP):
+            key = event.key
+            mod = event.mod
+
+        milliseconds = int((self.clock() - self.start) * 1000)
+        self.file.write(EVENT.pack(milliseconds, kind, small, x, y, dx, dy,
+                key, mod))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_log(path):
+    """The `(seed, settings, events)` of a log, events being `(milliseconds,
+    pygame event)` pairs."""
+
+    with open(path, 'rb') as log_file:
+        data = log_file.read()
+
+    magic, version, seed, settings_length = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{} is not a version {} input log.'.format(path,
+                VERSION))
+
+    offset = HEADER.size
+    settings = json.loads(data[offset:offset + settings_length].decode(
+            'utf-8'))
+    offset += settings_length
+
+    events = []
+    for values in EVENT.iter_unpack(data[offset:]):
+        milliseconds, kind, small, x, y, dx, dy, key, mod = values
+        type_ = EVENT_TYPES[kind]
+
+        if kind in (MOUSE_DOWN, MOUSE_UP):
+            event = pygame.event.Event(type_, button=small, pos=(x, y))
+        elif kind == MOUSE_MOTION:
+            event = pygame.event.Event(type_, pos=(x, y), rel=(dx, dy),
+                    buttons=tuple(small >> index & 1 for index in range(3)))
+        elif kind == MOUSE_WHEEL:
+            event = pygame.event.Event(type_, x=0, y=small, pos=(x, y))
+        elif kind in (KEY_DOWN, KEY_UP):
+            event = pygame.event.Event(type_, key=key, mod=mod)
+        else:
+            event = pygame.event.Event(type_)
+
+        events.append((milliseconds, event))
+
+    return seed, settings, events
+
+
+class ReplayClock(object):
+    """A clock that only moves when `time` is set, in seconds. It stands in
+    for `time.perf_counter` as the scheduler's clock in a replay."""
+
+    def __init__(self):
+        self.time = 0.
+
+    def __call__(self):
+        return self.time
+
+
+def is_quit(event):
+    return event.type == QUIT or (event.type == KEYUP and
+            event.key == K_ESCAPE)
+
+
+def replay(path):
+    """Play the log at `path` through a new headless `App`. Returns the app
+    and the replay's stats."""
+
+    # These must be set before pygame is initialised, by the app.
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    # Imported here, as the app imports this module for its recorder.
+    from app import App
+
+    seed, settings, events = read_log(path)
+
+    clock = ReplayClock()
+    app = App(seed=seed, clock=clock, **settings)
+
+    frames = 0
+    start = time.perf_counter()
+
+    for milliseconds, event in events:
+
+        # Run the timers that were due before the event, as the game did while
+        # it waited for it. Those set from others, such as the solver's steps,
+        # run too if they are due.
+        clock.time = milliseconds / 1000
+        app.update()
+
+        # Quitting would exit, and it's the end of the log anyway.
+        if is_quit(event):
+            break
+
+        app.handle(event)
+        app.update()
+        app.draw()
+        frames += 1
+
+    seconds = time.perf_counter() - start
+
+    if app.level_pool is not None:
+        app.level_pool.close()
+
+    return app, {
+        'events': len(events),
+        'frames': frames,
+        'seconds': seconds,
+        'recorded_seconds': events[-1][0] / 1000 if events else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded game as '
+            'fast as possible, headless.')
+    parser.add_argument('path')
+    args = parser.parse_args(argv)
+
+    app, stats = replay(args.path)
+    seconds = max(stats['seconds'], 1e-9)
+
+    print('{} events and {} frames in {:.3f} s'.format(stats['events'],
+            stats['frames'], stats['seconds']))
+    print('{:,.0f} events/s, {:,.0f} frames/s, {:.0f}x the recorded '
+            '{:.1f} s'.format(stats['events'] / seconds,
+                stats['frames'] / seconds,
+                stats['recorded_seconds'] / seconds,
+                stats['recorded_seconds']))
+    print('Board at the end: {}'.format(app.game.board))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
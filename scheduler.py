@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Timed callbacks and tweens, run from the main loop.
+
+Everything that happens over time, such as the solver showing one move after
+the other, registers with the app's `Scheduler` rather than checking the clock
+on every frame. The main loop sleeps until input comes or the next timer is
+due, and only runs a frame a tick while a tween is going.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import time
+import heapq
+import itertools
+
+# A `Scheduler.speed` that runs every timer and finishes every tween as soon as
+# the scheduler advances, whatever its delay.
+INSTANT = float('inf')
+
+
+class Timer(object):
+    """A callback due at `deadline`, in scheduler time. Cancelled timers stay
+    in the queue and are skipped when they come up."""
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Tween(object):
+    """Calls `update(progress)` on every advance of the scheduler, with
+    `progress` going from 0 to 1 over `duration`, then calls `done`."""
+
+    def __init__(self, start, duration, update, done=None):
+        self.start = start
+        self.duration = duration
+        self.update = update
+        self.done = done
+        self.cancelled = False
+
+    def progress(self, now):
+
+        if self.duration <= 0:
+            return 1.
+
+        return max(0., min(1., (now - self.start) / self.duration))
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler(object):
+    """A queue of timers, kept as a heap by deadline, and the running tweens.
+
+    Scheduler time runs at `speed` times the `clock`, so the same delays play
+    faster or slower, or all at once at `INSTANT`. It only moves on in
+    `advance`, which is what runs the timers and tweens, so nothing happens
+    between frames.
+    """
+
+    def __init__(self, clock=time.perf_counter, speed=1):
+        self.clock = clock
+        self.speed = speed
+
+        # The current scheduler time, in seconds, and the clock's time when it
+        # was last advanced.
+        self.now = 0.
+        self.last_clock = clock()
+
+        # `(deadline, sequence, timer)` entries. The sequence number keeps
+        # timers with the same deadline in the order they were added.
+        self.timers = []
+        self.sequence = itertools.count()
+
+        self.tweens = []
+
+    def current_time(self):
+        """The scheduler time now, which `now` only catches up with on the
+        next `advance`. In a timer's callback, that's about its deadline, so
+        timers set from one another don't drift with the frame rate."""
+
+        if self.speed == INSTANT:
+            return self.now
+
+        return self.now + (self.clock() - self.last_clock) * self.speed
+
+    def call_later(self, delay, callback, *args):
+        """Call `callback(*args)` in `delay` seconds of scheduler time. Returns
+        the `Timer`, to cancel it."""
+
+        timer = Timer(self.current_time() + delay, callback, args)
+        heapq.heappush(self.timers, (timer.deadline, next(self.sequence),
+                timer))
+        return timer
+
+    def tween(self, duration, update, done=None):
+        """Start a `Tween` over `duration` seconds of scheduler time. `update`
+        is called with a progress of 0 right away."""
+
+        tween = Tween(self.current_time(), duration, update, done)
+        self.tweens.append(tween)
+        update(0.)
+        return tween
+
+    def advance(self):
+        """Run the timers that are due and move the tweens forward, up to the
+        clock's current time."""
+
+        clock = self.clock()
+        elapsed = clock - self.last_clock
+        self.last_clock = clock
+
+        instant = self.speed == INSTANT
+        target = INSTANT if instant else self.now + elapsed * self.speed
+
+        timers = self.timers
+
+        # Timers run in deadline order, with the scheduler time at their
+        # deadline, so those they add are run too if they are due.
+        while timers and timers[0][0] <= target:
+            deadline, _, timer = heapq.heappop(timers)
+
+            if timer.cancelled:
+                continue
+
+            self.now = max(self.now, deadline)
+            timer.callback(*timer.args)
+
+        if not instant:
+            self.now = target
+
+        self.advance_tweens(instant)
+
+    def advance_tweens(self, instant=False):
+
+        if not self.tweens:
+            return
+
+        tweens = self.tweens
+        self.tweens = []
+
+        for tween in tweens:
+            if tween.cancelled:
+                continue
+
+            progress = 1. if instant else tween.progress(self.now)
+            tween.update(progress)
+
+            if progress < 1:
+                self.tweens.append(tween)
+            elif tween.done is not None:
+                tween.done()
+
+    def timeout(self):
+        """Seconds of clock time until something is due, 0 while a tween is
+        running, or `None` if there is nothing to wait for."""
+
+        if self.tweens:
+            return 0.
+
+        # Drop cancelled timers, so they don't wake up the main loop.
+        timers = self.timers
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+
+        if not timers:
+            return None
+
+        if self.speed == INSTANT:
+            return 0.
+
+        elapsed = self.clock() - self.last_clock
+        return max(0., (timers[0][0] - self.now) / self.speed - elapsed)
+
+    def clear(self):
+        del self.timers[:]
+        del self.tweens[:]
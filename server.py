@@ -0,0 +1,711 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""A game server for many puzzle sessions at once, with no pygame.
+
+    python server.py serve --port 8765
+    python server.py load --spawn --connections 200 --sessions 20
+
+Clients send one JSON request per line over TCP and get one JSON reply per
+line, with the request's `id`:
+
+    {"id": 1, "op": "new", "size": 5, "difficulty": "normal", "seed": 20261018}
+    {"id": 1, "session": 1, "size": 5, "topology": "plus", "state": "1c4a0c0"}
+
+Operations are `new`, `press`, `state`, `hint`, `submit`, `validate` and
+`close`. Boards are hex strings of `Board.state` and moves are lists of
+`[i, j]`. `submit` checks moves against a session's level and `validate`
+against any board. Both are checked in batches, a single NumPy pass for all
+those that came in on the same turn of the event loop.
+
+Generating levels, finding hints and checking batches run on worker threads,
+as factorising a large board's solver can take a while, so they never hold up
+the sessions of other clients. Levels are generated one at a time, in the
+order they were asked for, so a server started with a `--seed` makes the same
+levels for the same requests.
+
+`load` runs sessions through many connections at once and reports the
+latency of each operation.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import json
+import functools
+import time
+import random
+import socket
+import asyncio
+import argparse
+import traceback
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from board import popcount, toggle_masks
+from batch import states_to_boards, get_batch_solver
+from solver import MAX_ENUMERATED_NULLITY, TOPOLOGY, get_solver
+from levels import DIFFICULTIES, DEFAULT_DIFFICULTY, LevelGenerator
+from topology import get_topology
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Sessions are kept until closed, up to this many.
+MAX_SESSIONS = 1 << 20
+
+# Longest request line, in bytes.
+MAX_LINE = 1 << 20
+
+# Pause reading from a connection while this many bytes of replies to it are
+# waiting to be sent.
+MAX_WRITE_BUFFER = 1 << 16
+
+# Most checks done in one batch.
+MAX_BATCH = 4096
+
+# Largest board sizes. Plus boards are solved by light chasing, the others by
+# eliminating the whole toggle matrix, which takes seconds past this size.
+MAX_SIZE = 64
+MAX_MATRIX_SIZE = 32
+
+# Threads for the work that is too slow for the event loop.
+WORKERS = 4
+
+
+class RequestError(Exception):
+    """A request that can't be carried out. Its message goes back to the
+    client."""
+
+
+class Session(object):
+    """One game, in a few integers: the level's board as `start`, the board
+    now as `state` and the number of moves made. Moves are the same single
+    XOR with a toggle mask as on a `Board`."""
+
+    __slots__ = ('size', 'topology', 'start', 'state', 'moves')
+
+    def __init__(self, size, topology, start):
+        self.size = size
+        self.topology = topology
+        self.start = start
+        self.state = start
+        self.moves = 0
+
+    def press(self, indexes):
+        masks = toggle_masks(self.size, self.topology)
+        state = self.state
+
+        for index in indexes:
+            state ^= masks[index]
+
+        self.state = state
+        self.moves += len(indexes)
+
+
+class Validator(object):
+    """Checks whether presses solve boards, in batches.
+
+    `check` queues a board and returns a future. The queue is flushed on the
+    next turn of the event loop, to a thread of `executor`, so every check
+    made on this one shares the same matrix products. A check's result is the
+    reply to the request: whether the presses solve the board, in how many
+    moves, and the length of the board's minimal solution, which can tell a
+    solution found by a solver from one found by a person.
+    """
+
+    def __init__(self, loop, executor=None):
+        self.loop = loop
+        self.executor = executor
+
+        # `(size, topology name)` to a list of `(state, presses, moves,
+        # future)`.
+        self.pending = {}
+        self.flush_handle = None
+
+        # Toggle matrices as float32 arrays, by `(size, topology name)`.
+        self.matrices = {}
+
+        self.batches = self.checks = 0
+
+    def check(self, size, topology, state, moves):
+        """Check the cell indexes `moves` on the board `state`."""
+
+        future = self.loop.create_future()
+        self.pending.setdefault((size, topology), []).append((state,
+                press_pattern(moves), len(moves), future))
+
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_soon(self.flush)
+
+        return future
+
+    def toggle_matrix(self, size, topology):
+
+        try:
+            return self.matrices[size, topology]
+        except KeyError:
+            pass
+
+        # Row `k` has the lights a press at `k` toggles.
+        matrix = self.matrices[size, topology] = states_to_boards(
+                toggle_masks(size, topology), size).astype(np.float32)
+        return matrix
+
+    def flush(self):
+        self.flush_handle = None
+        pending = self.pending
+        self.pending = {}
+
+        for (size, topology), checks in pending.items():
+            for start in range(0, len(checks), MAX_BATCH):
+                batch = checks[start:start + MAX_BATCH]
+                replies = self.loop.run_in_executor(self.executor,
+                        self.check_batch, size, topology, batch)
+                replies.add_done_callback(functools.partial(self.resolve,
+                        batch))
+
+    def resolve(self, checks, replies):
+        error = replies.exception()
+
+        for index, (_, _, _, future) in enumerate(checks):
+            if future.done():
+                continue
+
+            if error is None:
+                future.set_result(replies.result()[index])
+            else:
+                future.set_exception(error)
+
+        self.batches += 1
+        self.checks += len(checks)
+
+    def check_batch(self, size, topology, checks):
+        """The replies to `checks`. Runs on a worker thread, so it leaves the
+        futures to `resolve`."""
+
+        states = [check[0] for check in checks]
+        boards = states_to_boards(states, size)
+        presses = states_to_boards([check[1] for check in checks], size)
+
+        # The lights the presses toggle, as a product mod 2 with the toggle
+        # matrix. Sums stay far below 2 ** 24, so float32 is exact.
+        toggled = (presses.astype(np.float32) @ self.toggle_matrix(size,
+                topology)).astype(np.int32) & 1
+        solved = ~(boards ^ toggled.astype(np.uint8)).any(axis=1)
+
+        # Past the nullity where the batch solver gives up on minimal
+        # solutions, only the scalar one has the length `hint` works with.
+        if (topology == TOPOLOGY and len(get_solver(size).null_basis) <=
+                MAX_ENUMERATED_NULLITY):
+            solvable, solutions = get_batch_solver(size).solve(boards)
+            minimal = solutions.sum(axis=1, dtype=np.int32).tolist()
+            minimal = [moves if ok else None
+                    for moves, ok in zip(minimal, solvable.tolist())]
+        else:
+            solver = get_solver(size, topology)
+            minimal = [None if solution is None else popcount(solution)
+                    for solution in map(solver.solve, states)]
+
+        return [{
+            'solved': ok,
+            'moves': moves,
+            'minimal': fewest,
+        } for (_, _, moves, _), ok, fewest in zip(checks, solved.tolist(),
+                minimal)]
+
+
+def parse_state(value):
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        raise RequestError('Expected a board as a hex string, got '
+                '{!r}.'.format(value))
+
+
+def format_state(state):
+    return format(state, 'x')
+
+
+def parse_moves(moves, size):
+    """The cell indexes of a list of `[i, j]` moves."""
+
+    try:
+        indexes = [i * size + j for i, j in moves]
+
+        # Exactly ints, as floats and bools would pass the bounds.
+        valid = all(type(i) is int and type(j) is int and 0 <= i < size and
+                0 <= j < size for i, j in moves)
+    except (TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        raise RequestError('Expected moves as [i, j] cells of a {0}x{0} '
+                'board.'.format(size))
+
+    return indexes
+
+
+def check_size(size, topology):
+
+    largest = MAX_SIZE if topology == TOPOLOGY else MAX_MATRIX_SIZE
+
+    if type(size) is not int or not 2 <= size <= largest:
+        raise RequestError('Expected a size of 2 to {} for {} boards.'.format(
+                largest, topology))
+
+
+def press_pattern(indexes):
+    presses = 0
+    for index in indexes:
+        presses ^= 1 << index
+
+    return presses
+
+
+def find_hint(size, topology, state):
+    solution = get_solver(size, topology).solve(state)
+
+    if not solution:
+        return {'hint': None}
+
+    # The lowest press, as in `GameModel.hint`.
+    return {'hint': list(divmod((solution & -solution).bit_length() - 1,
+            size))}
+
+
+class GameServer(object):
+    """The sessions, and the requests on them from any connection. It must be
+    made on the event loop it serves from, or be given `loop`."""
+
+    def __init__(self, rng=None, loop=None, workers=WORKERS):
+        self.rng = random.Random() if rng is None else rng
+        self.loop = asyncio.get_running_loop() if loop is None else loop
+        self.executor = ThreadPoolExecutor(workers)
+        self.validator = Validator(self.loop, self.executor)
+
+        # Levels from `rng` are generated on a thread of their own, one after
+        # the other in the order they were asked for, as they share `rng` and
+        # the generators. So a seeded `rng` gives the same levels to the same
+        # requests.
+        self.level_executor = ThreadPoolExecutor(1)
+
+        self.sessions = {}
+        self.next_session = 1
+
+        # Level generators by `(size, topology name, difficulty)`, all drawing
+        # from `rng`. Only used on `level_executor`.
+        self.generators = {}
+
+        self.requests = 0
+
+        self.operations = {
+            'new': self.new,
+            'press': self.press,
+            'state': self.state,
+            'hint': self.hint,
+            'submit': self.submit,
+            'validate': self.validate,
+            'close': self.close,
+        }
+
+    def session(self, request):
+
+        try:
+            return self.sessions[request['session']]
+        except (KeyError, TypeError):
+            raise RequestError('No session {!r}.'.format(request.get(
+                    'session')))
+
+    def session_reply(self, session_id, session):
+        return {
+            'session': session_id,
+            'size': session.size,
+            'topology': session.topology,
+            'state': format_state(session.state),
+            'moves': session.moves,
+            'solved': session.state == 0,
+        }
+
+    def new(self, request):
+        """Start a session on a new level. With a `seed`, the level is always
+        the same one, as for a shared daily puzzle. Returns a future of the
+        reply."""
+
+        if len(self.sessions) >= MAX_SESSIONS:
+            raise RequestError('Too many sessions.')
+
+        size = request.get('size', 5)
+        difficulty = request.get('difficulty', DEFAULT_DIFFICULTY)
+
+        try:
+            topology = get_topology(request.get('topology', TOPOLOGY)).name
+        except ValueError as error:
+            raise RequestError(str(error))
+
+        check_size(size, topology)
+
+        if difficulty not in DIFFICULTIES:
+            raise RequestError('Expected a difficulty in {}.'.format(
+                    ', '.join(sorted(DIFFICULTIES))))
+
+        try:
+            rng = random.Random(request['seed']) if 'seed' in request else None
+        except TypeError:
+            raise RequestError('Expected a seed as a number or a string.')
+
+        return self.loop.create_task(self.start_session(size, topology,
+                difficulty, rng))
+
+    async def start_session(self, size, topology, difficulty, rng):
+
+        # Levels of their own seed share nothing, and can be generated on any
+        # worker.
+        executor = self.level_executor if rng is None else self.executor
+        start = await self.loop.run_in_executor(executor, self.generate_level,
+                size, topology, difficulty, rng)
+
+        session_id = self.next_session
+        self.next_session += 1
+        session = self.sessions[session_id] = Session(size, topology, start)
+
+        return self.session_reply(session_id, session)
+
+    def generate_level(self, size, topology, difficulty, rng=None):
+        """The board of a new level, from `rng` or else the server's. Runs on
+        a worker thread, `level_executor`'s without `rng`."""
+
+        # Bands a board can't reach are rejected by the generator.
+        try:
+            if rng is not None:
+                generator = LevelGenerator.for_difficulty(size, difficulty,
+                        rng, topology)
+            else:
+                key = size, topology, difficulty
+
+                try:
+                    generator = self.generators[key]
+                except KeyError:
+                    generator = self.generators[key] = (
+                            LevelGenerator.for_difficulty(size, difficulty,
+                                self.rng, topology))
+
+            presses = generator.generate_presses()
+        except ValueError as error:
+            raise RequestError(str(error))
+
+        # The level's board is what its presses make of an empty one.
+        masks = toggle_masks(size, topology)
+        start = 0
+        for index in range(size * size):
+            if presses >> index & 1:
+                start ^= masks[index]
+
+        return start
+
+    def press(self, request):
+        session = self.session(request)
+        session.press(parse_moves(request.get('moves'), session.size))
+        return self.session_reply(request['session'], session)
+
+    def state(self, request):
+        return self.session_reply(request['session'], self.session(request))
+
+    def hint(self, request):
+        """A future of the next move towards solving a session's board."""
+
+        session = self.session(request)
+
+        return self.loop.run_in_executor(self.executor, find_hint,
+                session.size, session.topology, session.state)
+
+    def submit(self, request):
+        """Check moves from the start of a session's level. Returns a future
+        of the reply."""
+
+        session = self.session(request)
+        moves = parse_moves(request.get('moves'), session.size)
+
+        return self.validator.check(session.size, session.topology,
+                session.start, moves)
+
+    def validate(self, request):
+        """Check moves on any board. Returns a future of the reply."""
+
+        size = request.get('size', 5)
+
+        try:
+            topology = get_topology(request.get('topology', TOPOLOGY)).name
+        except ValueError as error:
+            raise RequestError(str(error))
+
+        check_size(size, topology)
+
+        state = parse_state(request.get('state'))
+
+        if state >> (size * size):
+            raise RequestError('The board has lights beyond its cells.')
+
+        moves = parse_moves(request.get('moves'), size)
+
+        return self.validator.check(size, topology, state, moves)
+
+    def close(self, request):
+        self.session(request)
+        del self.sessions[request['session']]
+        return {'closed': True}
+
+    def handle(self, request):
+        """The reply to `request`, a dict or a future of one."""
+
+        self.requests += 1
+
+        try:
+            operation = self.operations[request['op']]
+        except (KeyError, TypeError):
+            raise RequestError('Expected an op in {}.'.format(
+                    ', '.join(sorted(self.operations))))
+
+        return operation(request)
+
+    async def handle_connection(self, reader, writer):
+
+        def send(request_id, reply):
+            reply['id'] = request_id
+            writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+        def send_later(request_id, future):
+
+            def done(future):
+                try:
+                    reply = future.result()
+                except RequestError as error:
+                    reply = {'error': str(error)}
+                except Exception:
+                    traceback.print_exc()
+                    reply = {'error': 'Internal error.'}
+
+                send(request_id, reply)
+
+            future.add_done_callback(done)
+
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                request_id = None
+
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    request_id = request.get('id')
+                    reply = self.handle(request)
+                except RequestError as error:
+                    reply = {'error': str(error)}
+                except (ValueError, AttributeError):
+                    reply = {'error': 'Expected a JSON object per line.'}
+                except Exception:
+                    # A bug shouldn't take the connection down with it.
+                    traceback.print_exc()
+                    reply = {'error': 'Internal error.'}
+
+                if isinstance(reply, asyncio.Future):
+                    send_later(request_id, reply)
+                else:
+                    send(request_id, reply)
+
+                # Let replies go out before reading more, if they pile up.
+                if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                    await writer.drain()
+
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port,
+                limit=MAX_LINE)
+
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait)
+        self.level_executor.shutdown(wait)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, seed=None):
+    server = None
+
+    async def run():
+        nonlocal server
+        server = GameServer(random.Random(seed))
+        await server.serve(host, port)
+
+    print('Serving on {}:{}'.format(host, port))
+    sys.stdout.flush()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+            print('{} requests, {} checks in {} batches.'.format(
+                    server.requests, server.validator.checks,
+                    server.validator.batches))
+
+
+def percentile(times, percent):
+    times = sorted(times)
+    index = int(round(percent / 100 * (len(times) - 1)))
+    return times[index]
+
+
+async def play_sessions(host, port, sessions, size, topology, difficulty,
+        latencies):
+    """Play `sessions` games in a row over one connection: start a level,
+    make half of its solution's moves one at a time, then submit the whole
+    solution. Adds each request's latency to `latencies`, by operation, and
+    returns the number of replies that were errors or not as expected."""
+
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    solver = get_solver(size, topology)
+    clock = time.perf_counter
+    request_id = 0
+    errors = 0
+
+    async def call(op, **request):
+        nonlocal request_id, errors
+        request_id += 1
+        request.update(id=request_id, op=op)
+
+        start = clock()
+        writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        reply = json.loads((await reader.readline()).decode('utf-8'))
+        latencies.setdefault(op, []).append(clock() - start)
+
+        if 'error' in reply or reply.get('id') != request_id:
+            errors += 1
+
+        return reply
+
+    for _ in range(sessions):
+        game = await call('new', size=size, topology=topology,
+                difficulty=difficulty)
+        session = game['session']
+        moves = [list(move) for move in solver.moves(solver.solve(
+                int(game['state'], 16)))]
+
+        for move in moves[:len(moves) // 2]:
+            await call('press', session=session, moves=[move])
+
+        result = await call('submit', session=session, moves=moves)
+        if (result.get('solved') is not True or result.get('moves') !=
+                len(moves) or result.get('minimal') != len(moves)):
+            errors += 1
+
+        await call('close', session=session)
+
+    writer.close()
+    return errors
+
+
+async def load(host, port, connections, sessions, size, topology, difficulty):
+    latencies = {}
+    start = time.perf_counter()
+
+    errors = await asyncio.gather(*[play_sessions(host, port, sessions, size,
+            topology, difficulty, latencies) for _ in range(connections)])
+
+    return latencies, time.perf_counter() - start, sum(errors)
+
+
+def wait_for_server(host, port, timeout=10):
+    deadline = time.time() + timeout
+
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+
+            time.sleep(.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve puzzle sessions over '
+            'JSON lines, or load test a server.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    serve_parser = commands.add_parser('serve', help='Run the server.')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--seed', type=int, default=None)
+
+    load_parser = commands.add_parser('load', help='Play sessions on a server '
+            'over many connections and report the latencies.')
+    load_parser.add_argument('--host', default=DEFAULT_HOST)
+    load_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    load_parser.add_argument('--spawn', action='store_true',
+            help='Start a server for the test, and stop it after.')
+    load_parser.add_argument('--connections', type=int, default=100)
+    load_parser.add_argument('--sessions', type=int, default=10,
+            help='Sessions played one after the other on each connection.')
+    load_parser.add_argument('--size', type=int, default=5)
+    load_parser.add_argument('--topology', default=TOPOLOGY)
+    load_parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES),
+            default=DEFAULT_DIFFICULTY)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.host, args.port, args.seed)
+        return 0
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, __file__, 'serve',
+                '--host', args.host, '--port', str(args.port)])
+        wait_for_server(args.host, args.port)
+
+    try:
+        latencies, seconds, errors = asyncio.run(load(args.host, args.port,
+                args.connections, args.sessions, args.size, args.topology,
+                args.difficulty))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(times) for times in latencies.values())
+
+    print('{} connections, {} sessions, {} requests in {:.2f} s, {:,.0f} '
+            'requests/s'.format(args.connections,
+                args.connections * args.sessions, total, seconds,
+                total / seconds))
+    print('{:>10} {:>9} {:>9} {:>9}'.format('op', 'count', 'p50', 'p99'))
+
+    for op, times in sorted(latencies.items()):
+        print('{:>10} {:>9} {:>6.2f} ms {:>6.2f} ms'.format(op, len(times),
+                percentile(times, 50) * 1e3, percentile(times, 99) * 1e3))
+
+    if errors:
+        print('{} replies were errors or not as expected.'.format(errors))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,87 +3,744 @@
 
 from __future__ import unicode_literals
 from __future__ import print_function
+from __future__ import division
 
-import time
-import copy
+import itertools
+from collections import namedtuple
+from board import popcount
+from cache import default_cache, row_bytes
 from events import EventSystem
+from topology import get_topology
 
-class SolverState(EventSystem):
+# The neighbourhood light chasing works for, see `BoardSolver`. Boards in other
+# topologies are solved by `MatrixSolver`.
+TOPOLOGY = 'plus'
 
-    def __init__(self, display):
-        self.display = display
+# Enumerating the null space is exponential in its dimension. Beyond this many
+# dimensions the solution is only improved greedily, see `minimize`.
+MAX_ENUMERATED_NULLITY = 20
 
-        self.game = None
+# The same for the null space of lights with more than two states, as the
+# number of combinations of its basis vectors.
+MAX_ENUMERATED_COMBINATIONS = 1 << 12
+
+# Largest boards with lights of more than two states. Their elimination isn't
+# bit-packed, and takes over a second past this size, though only once, as it
+# is cached.
+MAX_MODULAR_SIZE = 16
+
+
+Elimination = namedtuple('Elimination', 'inverse checks null_basis')
+
+
+def eliminate(rows, width):
+    """Gauss-Jordan elimination over GF(2) of the system given by `rows`.
+
+    Each row is an integer whose low `width` bits are the coefficients of the
+    variables of one equation. Returns an `Elimination` where
+
+      - `inverse[var]` is a mask over the equations, so that with the free
+        variables set to zero, `var` is the parity of `inverse[var] & rhs`.
+      - `checks` are masks over the equations. The system is consistent for a
+        right hand side `rhs` only when every `check & rhs` has even parity.
+      - `null_basis` is a basis of the null space, as masks over the variables.
+    """
+
+    count = len(rows)
+
+    # Each row is augmented with the equations it is a combination of, in the
+    # bits above `width`.
+    aug = [row | (1 << (width + r)) for r, row in enumerate(rows)]
+    pivots = []
+
+    for var in range(width):
+        bit = 1 << var
+        top = len(pivots)
+
+        for r in range(top, count):
+            if aug[r] & bit:
+                break
+        else:
+            # No pivot for this variable, it's a free one.
+            continue
+
+        aug[top], aug[r] = aug[r], aug[top]
+        pivot_row = aug[top]
+
+        for r in range(count):
+            if r != top and aug[r] & bit:
+                aug[r] ^= pivot_row
+
+        pivots.append(var)
+
+    inverse = [0] * width
+    for r, var in enumerate(pivots):
+        inverse[var] = aug[r] >> width
+
+    checks = [row >> width for row in aug[len(pivots):]]
+
+    null_basis = []
+    pivot_set = set(pivots)
+    for free in range(width):
+        if free in pivot_set:
+            continue
+
+        vector = 1 << free
+        for r, var in enumerate(pivots):
+            if aug[r] >> free & 1:
+                vector |= 1 << var
+
+        null_basis.append(vector)
+
+    return Elimination(inverse, checks, null_basis)
+
+
+def apply_inverse(inverse, rhs):
+    """Multiply the `rhs` mask by the matrix whose rows are `inverse`."""
+
+    result = 0
+    for var, row in enumerate(inverse):
+        if popcount(row & rhs) & 1:
+            result |= 1 << var
+
+    return result
+
+
+class BoardSolver(object):
+    """Solves any position of a `size` x `size` lights out board.
+
+    Light chasing reduces the board to a system in the `size` presses of the
+    first row. Pressing under every light left on in a row clears it, so the
+    first row's presses decide all the others and only the last row can be
+    left lit. That residual is linear in the first row's presses and in the
+    board, which gives a `size` x `size` system solved by `eliminate`.
+    """
+
+    def __init__(self, size, matrices=None):
+        self.size = size
+        self.cell_count = size * size
+        self.row_mask = (1 << size) - 1
+
+        if matrices is None:
+            self.factorize()
+        else:
+            self.var_presses = list(matrices['var_presses'])
+            self.elimination = Elimination(list(matrices['inverse']),
+                    list(matrices['checks']), list(matrices['reduced_null']))
+            self.null_basis = list(matrices['null_basis'])
+
+        self.nbytes = sum(row_bytes(width) * len(rows)
+                for rows, width in self.matrices().values())
+
+    def factorize(self):
+        size = self.size
+
+        # Chase each of the first row presses on an empty board. The press
+        # patterns and residuals are the columns of the reduced system.
+        self.var_presses = []
+        residuals = []
+
+        for k in range(size):
+            presses, residual = self.chase([0] * size, 1 << k)
+            self.var_presses.append(presses)
+            residuals.append(residual)
+
+        # Row `e` of the system has bit `k` set when first row press `k` leaves
+        # the last row's light `e` on.
+        rows = [sum(1 << k for k in range(size) if residuals[k] >> e & 1)
+                for e in range(size)]
+
+        self.elimination = eliminate(rows, size)
+
+        # Expand the null space of the reduced system to full press patterns.
+        self.null_basis = [self.expand(vector)
+                for vector in self.elimination.null_basis]
+
+    def matrices(self):
+        """The factorisation, as `(rows, width)` by name for `MatrixCache`."""
+
+        size = self.size
+        cells = self.cell_count
+
+        return {
+            'var_presses': (self.var_presses, cells),
+            'inverse': (self.elimination.inverse, size),
+            'checks': (self.elimination.checks, size),
+            'reduced_null': (self.elimination.null_basis, size),
+            'null_basis': (self.null_basis, cells),
+        }
+
+    def chase(self, rows, first):
+        """Chase the lights of `rows` down the board, starting by pressing
+        `first` in the first row. Returns the press pattern as a board mask and
+        the lights left on in the last row."""
+
+        size = self.size
+        row_mask = self.row_mask
+        rows = list(rows)
+        presses = 0
+        press = first
+
+        for i in range(size):
+            if press:
+                presses |= press << (i * size)
+                rows[i] ^= press ^ ((press << 1) & row_mask) ^ (press >> 1)
+
+                if i > 0:
+                    rows[i - 1] ^= press
+
+                if i < size - 1:
+                    rows[i + 1] ^= press
+
+            if i < size - 1:
+                press = rows[i]
+
+        return presses, rows[size - 1]
+
+    def expand(self, first):
+        """Press pattern on an empty board from the first row presses."""
+
+        presses = 0
+        for k, var_presses in enumerate(self.var_presses):
+            if first >> k & 1:
+                presses ^= var_presses
+
+        return presses
+
+    def split_rows(self, state):
+        size = self.size
+        row_mask = self.row_mask
+        return [state >> (i * size) & row_mask for i in range(size)]
+
+    def reduce(self, state):
+        """Chase `state` and pick the first row presses from the reduced
+        system, whether or not it is consistent. Returns the press pattern and
+        the last row residual, both linear in `state`."""
+
+        presses, residual = self.chase(self.split_rows(state), 0)
+        first = apply_inverse(self.elimination.inverse, residual)
+        return presses ^ self.expand(first), residual
+
+    def is_consistent(self, residual):
+
+        for check in self.elimination.checks:
+            if popcount(check & residual) & 1:
+                return False
+
+        return True
+
+    def particular(self, state):
+        """Some press pattern that solves `state`, or `None` if unsolvable."""
+
+        presses, residual = self.reduce(state)
+
+        if not self.is_consistent(residual):
+            return None
+
+        return presses
+
+    def is_solvable(self, state):
+        return self.particular(state) is not None
+
+    def minimize(self, presses):
+        """Fewest-press pattern equivalent to `presses`.
+
+        Every solution is `presses` plus some vector of the null space, so the
+        whole null space is enumerated in Gray code order, one XOR per step. If
+        it has more than `MAX_ENUMERATED_NULLITY` dimensions, basis vectors are
+        applied greedily instead and the result may not be minimal.
+        """
+
+        basis = self.null_basis
+
+        if len(basis) > MAX_ENUMERATED_NULLITY:
+            return self.reduce_greedily(presses)
+
+        best = current = presses
+        best_count = popcount(presses)
+
+        for step in range(1, 1 << len(basis)):
+            current ^= basis[(step & -step).bit_length() - 1]
+            count = popcount(current)
+
+            if count < best_count:
+                best, best_count = current, count
+
+        return best
+
+    def reduce_greedily(self, presses):
+        count = popcount(presses)
+        improved = True
+
+        while improved:
+            improved = False
+
+            for vector in self.null_basis:
+                candidate = presses ^ vector
+                candidate_count = popcount(candidate)
+
+                if candidate_count < count:
+                    presses, count = candidate, candidate_count
+                    improved = True
+
+        return presses
+
+    def solve(self, state):
+        """Minimal press pattern that turns all of `state` off, or `None` if
+        the position is unsolvable."""
+
+        presses = self.particular(state)
+
+        if presses is None:
+            return None
+
+        return self.minimize(presses)
+
+    def moves(self, presses):
+        """The `(i, j)` coordinates of the presses in a press pattern."""
+
+        size = self.size
+        return [divmod(index, size) for index in range(self.cell_count)
+                if presses >> index & 1]
+
+    def count(self, presses):
+        """The number of moves of a press pattern."""
+        return popcount(presses)
+
+    def press_pattern(self, indexes):
+        """The press pattern of one move at each of the cell `indexes`."""
+
+        presses = 0
+        for index in indexes:
+            presses ^= 1 << index
+
+        return presses
+
+
+class MatrixSolver(BoardSolver):
+    """Solves any position of a `size` x `size` board in any topology.
+
+    Light chasing needs each row's presses to be decided by the row above, so
+    other topologies are solved by eliminating the whole toggle matrix, with
+    one variable per cell. That's practical up to a few dozen cells a side,
+    where light chasing goes to hundreds.
+    """
+
+    def __init__(self, size, topology, matrices=None):
+        self.size = size
+        self.cell_count = size * size
+        self.topology = get_topology(topology)
+
+        if matrices is None:
+            self.factorize()
+        else:
+            self.elimination = Elimination(list(matrices['inverse']),
+                    list(matrices['checks']), list(matrices['null_basis']))
+            self.null_basis = self.elimination.null_basis
+
+        self.nbytes = sum(row_bytes(width) * len(rows)
+                for rows, width in self.matrices().values())
+
+    def factorize(self):
+        masks = self.topology.masks(self.size)
 
-        self.spotlight = None
-        self.spotlight_pos = 0, 0
+        # Row `e` of the system has bit `k` set when a move at `k` toggles `e`.
+        # For symmetric neighbourhoods, that's the move's own mask.
+        if self.topology.is_symmetric:
+            rows = list(masks)
+        else:
+            rows = [sum(1 << k for k, mask in enumerate(masks) if mask >> e & 1)
+                    for e in range(self.cell_count)]
 
-        # Specified what stage we are in, in solving. Can take following values.
-        #   show - A spotlight is being shown.
-        #   hide - No spotlight is currently shown.
-        self.spot_stage = 'show'
+        self.elimination = eliminate(rows, self.cell_count)
+        self.null_basis = self.elimination.null_basis
 
-        # The last time at which spot stage changed. Helps with delays between
-        # stage changes.
-        self.last_spot_time = 0
+    def matrices(self):
+        cells = self.cell_count
 
-        self._board = self._solution = None
+        return {
+            'inverse': (self.elimination.inverse, cells),
+            'checks': (self.elimination.checks, cells),
+            'null_basis': (self.null_basis, cells),
+        }
 
-    def draw(self):
+    def reduce(self, state):
+        """The press pattern from the inverse, and the residual the checks
+        apply to, which is the board itself."""
+        return apply_inverse(self.elimination.inverse, state), state
 
-        # Time since last spot stage change.
-        time_diff = time.time() - self.last_spot_time
 
-        if not self.spotlight or \
-                (self.spot_stage == 'show' and time_diff > 1) or \
-                (self.spot_stage == 'hide' and time_diff > .6):
+def is_prime(number):
+    return number > 1 and all(number % divisor
+            for divisor in range(2, int(number ** .5) + 1))
 
-            self.last_spot_time = time.time()
 
-            if self.spotlight and self.spot_stage == 'show':
-                # When there is a spotlight and the stage is `show`. These two
-                # conditions might seem redundant, but on the first run, there
-                # is no spotlight but the stage is `show`.
+class ModularSolver(object):
+    """Solves boards whose lights have `states` states, by Gauss-Jordan
+    elimination of the toggle matrix over GF(`states`), which must be prime.
 
-                self.spotlight.in_spotlight = False
-                self.game.toggle(*self.spotlight_pos)
-                self.spot_stage = 'hide'
+    Boards are `CyclicBoard` states. Press patterns are bytearrays with the
+    number of moves at each cell, from 0 to `states - 1`, as making a move
+    `states` times does nothing. So are the rows of the factorisation, which
+    `matrices` gives the matrix cache as a byte per value.
+    """
 
-            elif self.game.solution:
-                # There is no spotlight, but the solution is still non-empty.
+    def __init__(self, size, topology, states, matrices=None):
 
-                i, j = self.spotlight_pos = self.game.solution.pop()
+        if not is_prime(states) or states > 256:
+            raise ValueError('Boards can only be solved for a prime number of '
+                    'states up to 256, got {}.'.format(states))
 
-                self.spotlight = self.game.board[i][j]
-                self.spotlight.in_spotlight = True
+        self.size = size
+        self.cell_count = size * size
+        self.topology = get_topology(topology)
+        self.states = states
 
-                self.spot_stage = 'show'
+        if matrices is None:
+            self.factorize()
+        else:
+            cells = self.cell_count
+            self.pivots = list(matrices['pivots'])
+            self.inverse, self.checks, self.null_basis = [
+                    [bytearray(row.to_bytes(cells, 'little'))
+                        for row in matrices[name]]
+                    for name in ('inverse', 'checks', 'null_basis')]
 
+        self.nbytes = sum(row_bytes(width) * len(rows)
+                for rows, width in self.matrices().values())
+
+    def factorize(self):
+        p = self.states
+        cells = self.cell_count
+
+        # Each row is the equation of one cell, the coefficients of the moves
+        # that step it followed by the identity, to track which combination of
+        # the equations it has become.
+        aug = [[0] * (2 * cells) for _ in range(cells)]
+        for k, neighbours in enumerate(self.topology.neighbours(self.size)):
+            for e in neighbours:
+                aug[e][k] += 1
+
+        for e in range(cells):
+            aug[e][cells + e] = 1
+
+        pivots = []
+
+        for var in range(cells):
+            top = len(pivots)
+
+            for r in range(top, cells):
+                if aug[r][var] % p:
+                    break
             else:
-                # Solution is empty. Finished.
-                self.emit('done-solving')
+                continue
+
+            aug[top], aug[r] = aug[r], aug[top]
+
+            # Scale the pivot to 1, then clear its column in the other rows.
+            scale = pow(aug[top][var], p - 2, p)
+            pivot_row = aug[top] = [value * scale % p for value in aug[top]]
+
+            for r in range(cells):
+                factor = aug[r][var] % p
+
+                if r != top and factor:
+                    aug[r] = [(value - factor * pivot) % p
+                            for value, pivot in zip(aug[r], pivot_row)]
+
+            pivots.append(var)
+
+        self.pivots = pivots
+        self.inverse = [bytearray(row[cells:]) for row in aug[:len(pivots)]]
+        self.checks = [bytearray(row[cells:]) for row in aug[len(pivots):]]
+
+        self.null_basis = []
+        pivot_set = set(pivots)
+        for free in range(cells):
+            if free in pivot_set:
+                continue
+
+            vector = bytearray(cells)
+            vector[free] = 1
+            for r, var in enumerate(pivots):
+                vector[var] = -aug[r][free] % p
+
+            self.null_basis.append(vector)
+
+    def matrices(self):
+        """The factorisation for `MatrixCache`, with a byte per value."""
+
+        width = self.cell_count * 8
+
+        def pack(rows):
+            return [int.from_bytes(bytes(row), 'little') for row in rows], width
+
+        return {
+            'pivots': (self.pivots, 32),
+            'inverse': pack(self.inverse),
+            'checks': pack(self.checks),
+            'null_basis': pack(self.null_basis),
+        }
+
+    def particular(self, state):
+        """Some press pattern that solves `state`, or `None` if unsolvable."""
+
+        p = self.states
+
+        # Moves that turn everything off step each light by minus its state.
+        rhs = [-value % p for value in bytearray(state)]
+
+        for check in self.checks:
+            if sum(c * value for c, value in zip(check, rhs)) % p:
+                return None
+
+        presses = bytearray(self.cell_count)
+        for var, row in zip(self.pivots, self.inverse):
+            presses[var] = sum(c * value for c, value in zip(row, rhs)) % p
+
+        return presses
+
+    def is_solvable(self, state):
+        return self.particular(state) is not None
+
+    def minimize(self, presses):
+        """Fewest-move pattern equivalent to `presses`. As with
+        `BoardSolver.minimize`, combinations of the null space are all tried
+        when there aren't too many of them, and greedily otherwise."""
+
+        p = self.states
+        basis = self.null_basis
+
+        if p ** len(basis) > MAX_ENUMERATED_COMBINATIONS:
+            return self.reduce_greedily(presses)
+
+        best = bytearray(presses)
+        best_count = sum(best)
+
+        for factors in itertools.product(range(p), repeat=len(basis)):
+            candidate = bytearray(presses)
+
+            for factor, vector in zip(factors, basis):
+                if factor:
+                    candidate = bytearray((value + factor * step) % p
+                            for value, step in zip(candidate, vector))
+
+            count = sum(candidate)
+            if count < best_count:
+                best, best_count = candidate, count
+
+        return best
+
+    def reduce_greedily(self, presses):
+        p = self.states
+        presses = bytearray(presses)
+        count = sum(presses)
+        improved = True
+
+        while improved:
+            improved = False
+
+            for vector in self.null_basis:
+                for factor in range(1, p):
+                    candidate = bytearray((value + factor * step) % p
+                            for value, step in zip(presses, vector))
+                    candidate_count = sum(candidate)
+
+                    if candidate_count < count:
+                        presses, count = candidate, candidate_count
+                        improved = True
+
+        return presses
+
+    def solve(self, state):
+        """Minimal press pattern that turns all of `state` off, or `None` if
+        the position is unsolvable."""
+
+        presses = self.particular(state)
+
+        if presses is None:
+            return None
+
+        return self.minimize(presses)
+
+    def moves(self, presses):
+        """The `(i, j)` coordinates of the moves of a press pattern, repeated
+        as many times as each is made."""
+
+        size = self.size
+        return [divmod(index, size) for index, count in enumerate(presses)
+                for _ in range(count)]
+
+    def count(self, presses):
+        return sum(presses)
 
-        self.game.draw()
+    def press_pattern(self, indexes):
+        presses = bytearray(self.cell_count)
+
+        for index in indexes:
+            presses[index] = (presses[index] + 1) % self.states
+
+        return presses
+
+
+def get_solver(size, topology=TOPOLOGY, states=2):
+    """The solver for `size` x `size` boards in `topology`, with lights of
+    `states` states, with its factorisation from `default_cache`."""
+
+    topology = get_topology(topology)
+
+    if states != 2:
+        return default_cache.get(size, topology, 'solver-{}'.format(states),
+                lambda: ModularSolver(size, topology, states).matrices(),
+                lambda matrices: ModularSolver(size, topology, states,
+                    matrices))
+
+    # Light chasing only works for the plus neighbourhood itself, not for
+    # whatever else might be named so.
+    if topology.key == get_topology(TOPOLOGY).key:
+        return default_cache.get(size, topology, 'solver',
+                lambda: BoardSolver(size).matrices(),
+                lambda matrices: BoardSolver(size, matrices))
+
+    return default_cache.get(size, topology, 'solver',
+            lambda: MatrixSolver(size, topology).matrices(),
+            lambda matrices: MatrixSolver(size, topology, matrices))
+
+
+class SolutionPlayer(object):
+    """Plays the solution of a `GameModel`'s board one step at a time.
+
+    Each move is first shown and then played on the next step, so a view can
+    highlight it in between. `stop` puts the board back the way it was at
+    `start`.
+    """
+
+    def __init__(self, game):
+        self.game = game
+
+        # The moves left to be shown, last one first, and the one being shown
+        # right now, if any. Both as `(i, j)` coordinates.
+        self.moves = []
+        self.current = None
+
+        # The game as it was at `start`.
+        self._snapshot = None
+        self._lit_count = 0
+
+    def start(self):
+        """Take the game's solution, as it stands, to play."""
+
+        self._snapshot = self.game.snapshot()
+        self._lit_count = self.game.board.lit_count
+        self.current = None
+
+        # The game keeps its solution up to date as moves are made, so there's
+        # nothing to solve here. Reversed, so that popping plays them top to
+        # bottom.
+        self.moves = self.game.solution[::-1]
+
+    def step(self):
+        """Move forward one step. Returns `'show'` when the next move is now
+        in `current`, `'play'` when it was played and `'done'` once there are
+        no moves left."""
+
+        if self.current is not None:
+            # Not recorded, the player's undo history is left as it was.
+            self.game.press(*self.current, record=False)
+            self.current = None
+            return 'play'
+
+        elif self.moves:
+            self.current = self.moves.pop()
+            return 'show'
+
+        else:
+            return 'done'
+
+    def progress(self):
+        """Fraction of the lights on at `start` that have been turned off, from
+        0 to 1. A move can turn on more lights than it turns off, so it may go
+        down as well as up along the way."""
+
+        if not self._lit_count:
+            return 1.
+
+        return max(0., 1 - self.game.board.lit_count / self._lit_count)
+
+    def run(self):
+        """Play all of the remaining moves at once."""
+
+        while self.step() != 'done':
+            pass
+
+    def stop(self):
+
+        if self._snapshot is not None:
+            self.game.restore(self._snapshot)
+
+        self._snapshot = self.current = None
+        self.moves = []
+
+
+class SolverState(EventSystem):
+    """Shows the solution of the current game, one move at a time, by driving
+    a `SolutionPlayer` from timers of the app's `scheduler`."""
+
+    # A move is shown for this many seconds of scheduler time, then there's a
+    # short pause before the next one.
+    SHOW_TIME = 1
+    PAUSE_TIME = .6
+
+    def __init__(self, display, scheduler):
+        self.display = display
+        self.scheduler = scheduler
+
+        self.game = None
+        self.player = None
+
+        # The timer of the next step, while playing.
+        self.timer = None
+
+    def step(self):
+        stage = self.player.step()
+
+        # Highlight the move being shown, if any.
+        self.game.set_spotlight(self.player.current)
+
+        if stage == 'done':
+            # No moves left. Finished.
+            self.timer = None
+            self.emit('done-solving', solved=True)
+            return
+
+        delay = self.SHOW_TIME if stage == 'show' else self.PAUSE_TIME
+        self.timer = self.scheduler.call_later(delay, self.step)
+
+    def dirty_rects(self):
+        return self.game.dirty_rects()
+
+    def draw(self, rect=None):
+        self.game.draw(rect)
 
     def handle(self, event):
         # XXX: This is a hack. There should be a better way.
         self.game.menu_btn.handle(event)
 
+        # Big boards can still be zoomed and panned while being solved.
+        if self.game.view is not None:
+            self.game.view.handle(event)
+
     def activated(self):
-        # These values will be used to restore the `self.game` to its state
-        # before the solver bagan.
-        self._board = copy.deepcopy(self.game.board)
-        self._solution = copy.deepcopy(self.game.solution)
-        self._level = copy.deepcopy(self.game.level)
+        self.player = SolutionPlayer(self.game.model)
+        self.player.start()
+        self.timer = self.scheduler.call_later(0, self.step)
 
     def deactivated(self):
 
-        self.game.board = self._board
-        self.game.solution = self._solution
-        self.game.level = self._level
-
-        self._board = self._solution = self._level = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
 
-        self.spotlight.in_spotlight = False
-        self.spotlight = None
-        self.spot_stage = 'show'
+        # Put the game back to its state before the solver began.
+        self.player.stop()
+        self.game.set_spotlight(None)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Timing of the game's start, from the first import to the first frame.
+
+This only uses the standard library, so that `main.py` can import it before
+anything else and time the rest of the imports too.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer(object):
+    """Collects how long each phase of starting up took, by group: imports,
+    app setup, states and so on, until the first frame. Asset load times come
+    from the asset manager and are added to the report, though they are also
+    part of the phases that loaded them."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+        # `(group, name, seconds)` of each phase, in the order they ended.
+        self.phases = []
+
+        # Seconds from `start` to the first frame on the display, once it's
+        # drawn.
+        self.first_frame = None
+
+    @contextmanager
+    def phase(self, group, name):
+
+        # Once started, there's nothing more to time.
+        if self.first_frame is not None:
+            yield
+            return
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phases.append((group, name, time.perf_counter() - start))
+
+    def mark_first_frame(self):
+
+        if self.first_frame is None:
+            self.first_frame = time.perf_counter() - self.start
+
+    def report(self, asset_times=None):
+        """The phases by group, slowest group first, and the total."""
+
+        phases = list(self.phases)
+
+        if asset_times:
+            phases.extend(('assets', name, seconds)
+                    for name, seconds in asset_times.items())
+
+        groups = {}
+        for group, name, seconds in phases:
+            groups.setdefault(group, []).append((name, seconds))
+
+        lines = []
+        for group, items in sorted(groups.items(),
+                key=lambda item: -sum(seconds for _, seconds in item[1])):
+            lines.append('{:8.2f} ms  {}'.format(sum(seconds
+                    for _, seconds in items) * 1000, group))
+
+            for name, seconds in items:
+                lines.append('{:8.2f} ms    {}'.format(seconds * 1000, name))
+
+        if self.first_frame is not None:
+            lines.append('{:8.2f} ms  to the first frame'.format(
+                    self.first_frame * 1000))
+
+        return '\n'.join(lines)
+
+
+startup = StartupTimer()
+
+
+@contextmanager
+def blocked_imports(*names):
+    """Make importing the modules `names` fail within the block, for the
+    optional imports of a package that's loading. Modules already imported
+    aren't affected, and any of them can be imported after the block."""
+
+    blocked = [name for name in names if name not in sys.modules]
+
+    for name in blocked:
+        sys.modules[name] = None
+
+    try:
+        yield
+    finally:
+        for name in blocked:
+            if name in sys.modules and sys.modules[name] is None:
+                del sys.modules[name]
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Exhaustive analysis of every position of a board size.
+
+    python statespace.py build states.lps --size 5
+    python statespace.py info states.lps
+    python statespace.py check states.lps --count 100000
+
+`build` makes every combination of presses on an empty board, from the
+toggle masks alone, across all CPU cores. The fewest presses that make each
+of the `2 ** (size * size)` positions is the length of its minimal solution,
+and positions no combination makes are unsolvable. They are saved as a table
+with one byte per position, so the minimal move count of any position is a
+single lookup. As it owes nothing to the solver, `check` tests the solver and
+the level generator against it.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import mmap
+import time
+import random
+import struct
+import argparse
+import multiprocessing
+import numpy as np
+from batch import bit_count
+from board import popcount, toggle_masks
+from solver import TOPOLOGY, get_solver
+from levels import DIFFICULTIES, DEFAULT_DIFFICULTY, LevelGenerator
+from topology import TOPOLOGIES, get_topology
+
+# Header of a table: magic, format version, board size, a reserved field,
+# topology and number of positions. It's followed by one byte per position, in
+# the order of `Board.state`.
+MAGIC = b'LPSS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI16sQ')
+
+# Table value of unsolvable positions.
+UNSOLVABLE = 0xff
+
+# Every worker process builds a whole table, one byte per position, which the
+# main one merges into its own. That's 32 MB each at 5x5, in a couple of
+# seconds on one core, and 64 GB each for the next size up, 6x6.
+MAX_CELLS = 25
+
+# Presses of this many low cells are made all at once, one array operation
+# over their combinations per combination of the other cells.
+CHUNK_BITS = 16
+
+
+def span(masks):
+    """The XOR of the `masks` of the pressed cells of each of the
+    `2 ** len(masks)` press patterns of those cells, as a uint64 array."""
+
+    values = np.zeros(1 << len(masks), dtype=np.uint64)
+
+    for bit, mask in enumerate(masks):
+        values[1 << bit:2 << bit] = values[:1 << bit] ^ np.uint64(mask)
+
+    return values
+
+
+# Set in each worker process by `init_worker`.
+_worker = {}
+
+
+def init_worker(cells, masks):
+    low_bits = min(cells, CHUNK_BITS)
+    states = span(masks[:low_bits])
+    counts = bit_count(np.arange(1 << low_bits, dtype=np.uint64))
+
+    # Low press patterns that make the same position are only kept with the
+    # fewest presses, so that a chunk's positions are all different.
+    order = np.lexsort((counts, states))
+    states, counts = states[order], counts[order]
+    first = np.ones(len(states), dtype=bool)
+    first[1:] = states[1:] != states[:-1]
+
+    _worker['cells'] = cells
+    _worker['low_states'] = states[first]
+    _worker['low_counts'] = counts[first]
+    _worker['high_masks'] = masks[low_bits:]
+
+
+def press_range(first, count):
+    """The fewest presses that make each position, out of the press patterns
+    whose cells above the low `CHUNK_BITS` are the Gray codes of `first` to
+    `first + count - 1`, as the bytes of a whole table."""
+
+    low_states = _worker['low_states']
+    low_counts = _worker['low_counts']
+    high_masks = _worker['high_masks']
+
+    table = np.full(1 << _worker['cells'], UNSOLVABLE, dtype=np.uint8)
+
+    gray = first ^ (first >> 1)
+    high = 0
+    for bit, mask in enumerate(high_masks):
+        if gray >> bit & 1:
+            high ^= mask
+
+    for step in range(first, first + count):
+
+        # Consecutive Gray codes differ by one cell, one more XOR.
+        if step > first:
+            bit = (step & -step).bit_length() - 1
+            gray ^= 1 << bit
+            high ^= high_masks[bit]
+
+        states = low_states ^ np.uint64(high)
+        table[states] = np.minimum(table[states], low_counts + popcount(gray))
+
+    return table.tobytes()
+
+
+def _press_task(task):
+    return press_range(*task)
+
+
+def build_table(path, size, topology=TOPOLOGY, jobs=None, progress=None):
+    """Make every press pattern of `size` boards in `topology` with `jobs`
+    processes, all cores by default, and save the table of the fewest presses
+    for each position to `path`. Calls `progress(done, total)` with the press
+    patterns made so far. Returns the number of positions per minimal move
+    count, unsolvable ones under `None`."""
+
+    topology = get_topology(topology)
+    cells = size * size
+
+    if cells > MAX_CELLS:
+        raise ValueError('A {0}x{0} board has {1} cells, {2} at most can be '
+                'enumerated.'.format(size, cells, MAX_CELLS))
+
+    masks = toggle_masks(size, topology)
+
+    total = 1 << cells
+    high_count = 1 << max(0, cells - CHUNK_BITS)
+    jobs = jobs or multiprocessing.cpu_count()
+
+    # One range of high press patterns per process. Each gives a whole table,
+    # as any patterns can make the same position, and they are merged here.
+    per_task = -(-high_count // jobs)
+    tasks = [(first, min(per_task, high_count - first))
+            for first in range(0, high_count, per_task)]
+
+    table = np.full(total, UNSOLVABLE, dtype=np.uint8)
+    done = 0
+
+    pool = multiprocessing.Pool(jobs, init_worker, (cells, masks))
+
+    try:
+        for (_, count), data in zip(tasks, pool.imap(_press_task, tasks)):
+            np.minimum(table, np.frombuffer(data, dtype=np.uint8), out=table)
+            done += count * total // high_count
+
+            if progress is not None:
+                progress(done, total)
+    finally:
+        pool.close()
+        pool.join()
+
+    with open(path, 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, size, 0,
+                topology.name.encode('ascii'), total))
+        table_file.write(table.tobytes())
+
+    return histogram(np.bincount(table, minlength=256))
+
+
+def histogram(counts):
+    return dict((None if value == UNSOLVABLE else value, int(count))
+            for value, count in enumerate(counts) if count)
+
+
+class StateTable(object):
+    """A memory-mapped table of the minimal move count of every position."""
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as table_file:
+            self.buffer = mmap.mmap(table_file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+
+        magic, version, self.size, _, topology, self.count = (
+                HEADER.unpack_from(self.buffer))
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} state table.'.format(path,
+                    VERSION))
+
+        self.topology = topology.rstrip(b'\0').decode('ascii')
+
+    def __len__(self):
+        return self.count
+
+    def moves(self, state):
+        """The minimal number of moves that solve the position `state`, as in
+        `Board.state`, or `None` if it can't be solved."""
+
+        value = self.buffer[HEADER.size + state]
+        return None if value == UNSOLVABLE else value
+
+    def is_solvable(self, state):
+        return self.buffer[HEADER.size + state] != UNSOLVABLE
+
+    def moves_histogram(self):
+        values = np.frombuffer(self.buffer, dtype=np.uint8,
+                offset=HEADER.size, count=self.count)
+        return histogram(np.bincount(values, minlength=256))
+
+    def close(self):
+        self.buffer.close()
+
+
+def press_position(presses, masks):
+    """The position the press pattern `presses` makes on an empty board."""
+
+    state = 0
+    for index, mask in enumerate(masks):
+        if presses >> index & 1:
+            state ^= mask
+
+    return state
+
+
+def check_table(table, count, difficulty=DEFAULT_DIFFICULTY, seed=None):
+    """Compare the solver on `count` random positions, and the level
+    generator on `count` levels, against `table`. Returns a list of the
+    mismatches found, as messages."""
+
+    rng = random.Random(seed)
+    solver = get_solver(table.size, table.topology)
+    masks = toggle_masks(table.size, table.topology)
+    errors = []
+
+    for _ in range(count):
+        state = rng.randrange(table.count)
+        presses = solver.solve(state)
+        moves = None if presses is None else popcount(presses)
+
+        if moves != table.moves(state):
+            errors.append('Solver: {} moves for position {:#x}, the table has '
+                    '{}.'.format(moves, state, table.moves(state)))
+        elif presses is not None and press_position(presses, masks) != state:
+            errors.append('Solver: the solution of position {:#x} makes '
+                    '{:#x}.'.format(state, press_position(presses, masks)))
+
+    generator = LevelGenerator.for_difficulty(table.size, difficulty, rng,
+            table.topology)
+
+    for _ in range(count):
+        presses = generator.generate_presses()
+
+        state = press_position(presses, masks)
+
+        if popcount(presses) != table.moves(state):
+            errors.append('Level generator: {} moves for position {:#x}, the '
+                    'table has {}.'.format(popcount(presses), state,
+                        table.moves(state)))
+
+    return errors
+
+
+def print_histogram(moves_histogram, total):
+
+    for moves, count in sorted(moves_histogram.items(),
+            key=lambda item: -1 if item[0] is None else item[0]):
+        label = 'unsolvable' if moves is None else '{:4} moves'.format(moves)
+        print('{:>10}: {:>12,} {:7.2%}'.format(label, count, count / total))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find the minimal move count '
+            'of every position of a board size.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    build_parser = commands.add_parser('build', help='Make every press '
+            'pattern and save the table of minimal move counts.')
+    build_parser.add_argument('path')
+    build_parser.add_argument('--size', type=int, default=5)
+    build_parser.add_argument('--topology', choices=sorted(TOPOLOGIES),
+            default=TOPOLOGY)
+    build_parser.add_argument('--jobs', type=int, default=None,
+            help='Number of processes, one per CPU core by default.')
+
+    info_parser = commands.add_parser('info', help='Show the positions in a '
+            'table by minimal move count.')
+    info_parser.add_argument('path')
+
+    check_parser = commands.add_parser('check', help='Check the solver and '
+            'the level generator against a table.')
+    check_parser.add_argument('path')
+    check_parser.add_argument('--count', type=int, default=10000)
+    check_parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES),
+            default=DEFAULT_DIFFICULTY)
+    check_parser.add_argument('--seed', type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+
+        def progress(done, total):
+            sys.stdout.write('\r{:6.1%}'.format(done / total))
+            sys.stdout.flush()
+
+        start = time.perf_counter()
+        moves_histogram = build_table(args.path, args.size, args.topology,
+                args.jobs, progress)
+        seconds = time.perf_counter() - start
+        total = 1 << (args.size * args.size)
+
+        print('\rSolved {:,} positions in {:.1f} s, {:,.0f} positions/s, saved '
+                'to {}.'.format(total, seconds, total / seconds, args.path))
+        print_histogram(moves_histogram, total)
+
+    elif args.command == 'info':
+        table = StateTable(args.path)
+        print('{0}x{0} {1}, {2:,} positions'.format(table.size, table.topology,
+                len(table)))
+        print_histogram(table.moves_histogram(), len(table))
+
+    else:
+        table = StateTable(args.path)
+        errors = check_table(table, args.count, args.difficulty, args.seed)
+
+        for error in errors:
+            print(error)
+
+        print('Checked {} positions and {} levels, {} mismatches.'.format(
+                args.count, args.count, len(errors)))
+
+        return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# encoding: utf-8
+
+"""Shared setup of the tests, run from the repository with `python -m pytest`.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import sys
+import pytest
+import pygame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# These must be set before pygame is first imported.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from cache import default_cache
+
+
+@pytest.fixture(autouse=True)
+def matrix_cache(tmp_path, monkeypatch):
+    """Keep the solvers' matrices in a directory of the test's own, rather
+    than in the user's cache, starting with none in memory."""
+
+    monkeypatch.setattr(default_cache, 'directory', str(tmp_path /
+            'matrices'))
+    default_cache.clear()
+
+    yield default_cache
+
+    default_cache.clear()
+
+
+@pytest.fixture
+def display(monkeypatch):
+    """The game's display, on the dummy video driver. Assets are loaded from
+    the repository."""
+
+    monkeypatch.chdir(ROOT)
+    pygame.init()
+
+    return pygame.display.set_mode((320, 420))
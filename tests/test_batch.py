@@ -0,0 +1,70 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch import boards_to_states, get_batch_solver, states_to_boards
+from board import popcount, toggle_masks
+from solver import get_solver
+from test_solver import press_position
+
+
+def made_states(size, count, seed):
+    """Positions made by random presses, so all of them are solvable."""
+
+    rng = random.Random(seed)
+    masks = toggle_masks(size)
+    states = []
+
+    for _ in range(count):
+        state = 0
+        for index in rng.sample(range(size * size), rng.randint(1, size *
+                size)):
+            state ^= masks[index]
+
+        states.append(state)
+
+    return states
+
+
+def test_boards_round_trip():
+    states = [0, 1, (1 << 25) - 1, 0x1234567]
+    assert boards_to_states(states_to_boards(states, 5)) == states
+
+
+# Nullities 4, 2, 8, 16 and 20, the last two past one pass per null space
+# vector.
+@pytest.mark.parametrize('size, count', [(4, 200), (5, 200), (9, 100),
+        (19, 20), (30, 2)])
+def test_batch_matches_scalar(size, count):
+    scalar = get_solver(size)
+    states = made_states(size, count, size)
+
+    solvable, solutions = get_batch_solver(size).solve(states_to_boards(states,
+            size))
+
+    assert solvable.all()
+
+    for state, presses in zip(states, boards_to_states(solutions)):
+        assert popcount(presses) == popcount(scalar.solve(state))
+        assert press_position(presses, toggle_masks(size)) == state
+
+
+def test_unsolvable_boards():
+    scalar = get_solver(4)
+    states = list(range(1 << 16))
+
+    solvable, solutions = get_batch_solver(4).solve(states_to_boards(states,
+            4))
+
+    for state, ok, presses in zip(states, solvable.tolist(),
+            boards_to_states(solutions)):
+        expected = scalar.solve(state)
+        assert ok == (expected is not None)
+        assert popcount(presses) == (0 if expected is None else
+                popcount(expected))
@@ -0,0 +1,52 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+from board import Board, popcount
+from model import GameModel
+
+
+def test_lit_count_follows_every_change():
+    board = Board(6)
+    rng = random.Random(6)
+
+    for _ in range(300):
+        i, j = rng.randrange(6), rng.randrange(6)
+        action = rng.randrange(3)
+
+        if action == 0:
+            board.toggle(i, j)
+        elif action == 1:
+            board.set_value(i, j, rng.random() < .5)
+        else:
+            board.apply_moves([(i, j), (j, i)])
+
+        assert board.lit_count == popcount(board.state)
+        assert board.is_solved() == (board.state == 0)
+
+
+def test_toggle_and_toggle_index_agree():
+    board = Board(5)
+    other = Board(5)
+
+    for index in range(25):
+        board.toggle(*divmod(index, 5))
+        other.toggle_index(index)
+        assert board.snapshot() == other.snapshot()
+
+
+def test_game_over_only_once_solved():
+    model = GameModel(5, level=[(0, 0), (3, 4)])
+    overs = []
+    model.listen('game-over', overs.append)
+
+    model.press(0, 0)
+    model.check_game_over()
+    assert not model.is_game_over and not overs
+
+    model.press(3, 4)
+    model.check_game_over()
+    assert model.is_game_over and len(overs) == 1
+    assert model.lights_left == 0
@@ -0,0 +1,80 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import pygame
+import pytest
+from pygame.locals import MOUSEWHEEL
+from board import make_board
+from boardview import BoardView
+
+VIEWPORT = pygame.Rect(10, 90, 300, 300)
+
+
+def pixels(surface):
+    return pygame.image.tobytes(surface, 'RGBA')
+
+
+def assert_same_as_rendered(view):
+    refreshed = pixels(view.surface)
+    view.render()
+    assert refreshed == pixels(view.surface)
+
+
+def test_cells_partly_out_of_view(display):
+    board = make_board(8, states=3)
+    view = BoardView(display, board, VIEWPORT)
+    view.pitch = 45
+    view.offset_x, view.offset_y = 67, 26
+    view.invalidate()
+    view.refresh()
+
+    # The cells along the top and left edges, which are cut by the viewport.
+    for index in list(range(8)) + list(range(0, 64, 8)):
+        board.toggle_index(index)
+        rects = view.refresh()
+
+        for rect in rects:
+            assert VIEWPORT.contains(rect)
+
+        assert_same_as_rendered(view)
+
+
+@pytest.mark.parametrize('size, states', [(8, 3), (20, 2), (120, 2)])
+def test_refresh_after_pan_and_zoom_matches_render(display, size, states):
+    board = make_board(size, states=states)
+    view = BoardView(display, board, VIEWPORT)
+    rng = random.Random(size)
+    view.refresh()
+
+    for step in range(60):
+        action = rng.randrange(4)
+
+        if action == 0:
+            view.zoom(rng.choice([1.5, 1 / 1.5]), (rng.randrange(10, 310),
+                    rng.randrange(90, 390)))
+        elif action == 1:
+            view.pan(rng.randrange(-70, 70), rng.randrange(-70, 70))
+        elif action == 2:
+            view.spotlight = rng.choice([None, rng.randrange(size * size)])
+
+        for _ in range(rng.randrange(1, 4)):
+            board.toggle_index(rng.randrange(size * size))
+
+        view.refresh()
+        assert_same_as_rendered(view)
+
+
+def test_sideways_scrolling_doesnt_zoom(display):
+    view = BoardView(display, make_board(40), VIEWPORT)
+    pitch = view.pitch
+
+    view.handle(pygame.event.Event(MOUSEWHEEL, x=1, y=0,
+            pos=VIEWPORT.center))
+    assert view.pitch == pitch
+
+    view.handle(pygame.event.Event(MOUSEWHEEL, x=0, y=1,
+            pos=VIEWPORT.center))
+    assert view.pitch > pitch
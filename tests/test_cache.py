@@ -0,0 +1,109 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import threading
+import time
+from cache import MatrixCache, MatrixSet, encode_matrix_set
+from solver import BoardSolver, MatrixSolver, ModularSolver, get_solver
+from topology import Topology
+
+
+def test_matrix_set_round_trip():
+    matrices = {
+        'wide': ([0, 1, (1 << 100) - 1, 1 << 99], 100),
+        'narrow': ([3, 0, 5], 3),
+        'empty': ([], 7),
+    }
+
+    matrix_set = MatrixSet(encode_matrix_set(6, 'torus', matrices))
+
+    assert (matrix_set.size, matrix_set.topology) == (6, 'torus')
+
+    for name, (rows, width) in matrices.items():
+        assert list(matrix_set[name]) == rows
+        assert matrix_set[name].width == width
+
+
+def test_matrix_cache_saves_and_maps_back(tmp_path):
+    cache = MatrixCache(str(tmp_path))
+    built = []
+
+    def build():
+        built.append(True)
+        return {'rows': ([1, 2, 3], 5)}
+
+    assert list(cache.get(3, 'plus', 'test', build)['rows']) == [1, 2, 3]
+
+    cache.clear()
+    assert list(cache.get(3, 'plus', 'test', build)['rows']) == [1, 2, 3]
+    assert len(built) == 1
+
+
+def test_matrix_cache_evicts_the_oldest(tmp_path):
+    cache = MatrixCache(str(tmp_path), max_bytes=1)
+
+    for size in range(3):
+        cache.get(size, 'plus', 'test', lambda: {'rows': ([1], 8)})
+
+    # The most recently used set is kept, even over the budget.
+    assert [size for size, _, _ in cache.entries] == [2]
+
+
+def test_matrix_cache_builds_once_across_threads(tmp_path):
+    cache = MatrixCache(str(tmp_path), max_bytes=1 << 20)
+    built = []
+    values = []
+
+    def build():
+        built.append(True)
+        time.sleep(.05)
+        return {'rows': ([1, 2], 8)}
+
+    def get(size):
+        values.append(cache.get(size, 'plus', 'test', build))
+
+    threads = [threading.Thread(target=get, args=(size % 2,))
+            for size in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 2
+    assert len(set(map(id, values))) == 2
+    assert cache.nbytes == sum(nbytes for _, nbytes in
+            cache.entries.values())
+
+
+def test_matrix_cache_tells_same_named_topologies_apart(tmp_path):
+    cache = MatrixCache(str(tmp_path))
+    plus = Topology.from_pattern('.#.\n###\n.#.', name='custom')
+    cross = Topology.from_pattern('#.#\n.#.\n#.#', name='custom')
+
+    cache.get(3, plus, 'test', lambda: {'rows': ([1], 1)})
+    cache.get(3, cross, 'test', lambda: {'rows': ([0], 1)})
+    cache.clear()
+
+    assert len(os.listdir(str(tmp_path))) == 2
+    assert list(cache.get(3, plus, 'test', None)['rows']) == [1]
+    assert list(cache.get(3, cross, 'test', None)['rows']) == [0]
+
+
+def test_factorisations_load_from_the_cache(matrix_cache):
+    fresh = [BoardSolver(5), MatrixSolver(5, 'king'),
+            ModularSolver(4, 'torus', 3)]
+    keys = [(5, 'plus', 2), (5, 'king', 2), (4, 'torus', 3)]
+
+    for key in keys:
+        get_solver(*key)
+
+    assert len(os.listdir(matrix_cache.directory)) == len(keys)
+
+    # Mapped back from the files.
+    matrix_cache.clear()
+
+    for solver, key in zip(fresh, keys):
+        assert get_solver(*key).matrices() == solver.matrices()
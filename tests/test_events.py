@@ -0,0 +1,105 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import gc
+import pytest
+from events import Event, EventSystem
+
+
+class Recorder(object):
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def handle(self, event):
+        self.calls.append((self.name, event.type))
+
+
+def test_type_handlers_then_wildcard_ones_in_order():
+    source = EventSystem()
+    calls = []
+
+    source.listen('*', Recorder('any', calls).handle)
+    source.listen('click', Recorder('first', calls).handle)
+    source.listen('click', Recorder('second', calls).handle)
+    source.listen('key', Recorder('key', calls).handle)
+
+    source.emit('click')
+    source.emit('move')
+
+    assert calls == [('first', 'click'), ('second', 'click'), ('any', 'click'),
+            ('any', 'move')]
+
+
+def test_handlers_added_after_an_emit_are_called():
+    source = EventSystem()
+    calls = []
+
+    source.listen('click', Recorder('first', calls).handle)
+    source.emit('click')
+    source.listen('*', Recorder('any', calls).handle)
+    source.emit('click')
+
+    assert calls == [('first', 'click'), ('first', 'click'), ('any', 'click')]
+
+
+def test_events_carry_their_arguments():
+    source = EventSystem()
+    events = []
+    source.listen('click', events.append)
+
+    source.emit('click', pos=(1, 2), button=3)
+    source.emit(Event('click', pos=(4, 5)))
+
+    assert [event.pos for event in events] == [(1, 2), (4, 5)]
+    assert events[0].button == 3
+
+    with pytest.raises(AttributeError):
+        events[1].button
+
+    with pytest.raises(ValueError):
+        source.emit(Event('click'), pos=(0, 0))
+
+
+def test_emitting_without_listeners():
+    EventSystem().emit('click', pos=(0, 0))
+
+
+def test_unlisten():
+    source = EventSystem()
+    calls = []
+    first = Recorder('first', calls)
+    second = Recorder('second', calls)
+
+    source.listen('click', first.handle)
+    source.listen('click', second.handle, weak=True)
+    source.emit('click')
+
+    source.unlisten('click', first.handle)
+    source.unlisten('click', second.handle)
+    source.unlisten('key', first.handle)
+    source.emit('click')
+
+    assert calls == [('first', 'click'), ('second', 'click')]
+
+
+def test_weak_handlers_go_with_their_object():
+    source = EventSystem()
+    calls = []
+    kept = Recorder('kept', calls)
+    replaced = Recorder('replaced', calls)
+
+    source.listen('click', kept.handle, weak=True)
+    source.listen('click', replaced.handle, weak=True)
+    source.emit('click')
+
+    del replaced
+    gc.collect()
+    source.emit('click')
+
+    assert calls == [('kept', 'click'), ('replaced', 'click'),
+            ('kept', 'click')]
+    assert len(source._handlers['click']) == 1
@@ -0,0 +1,64 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import time
+from frames import FramePacer, FrameTimeOverlay
+
+
+def test_pacer_times_the_work_and_counts_dropped_frames():
+    pacer = FramePacer(fps=100)
+
+    for work in (0, .02, 0, .03):
+        pacer.begin_frame()
+        time.sleep(work)
+        pacer.end_frame()
+
+    assert pacer.frame_count == 4
+    assert pacer.dropped == 2
+
+    # The sleep after each frame's work isn't counted.
+    assert pacer.average() < .02
+    assert pacer.percentile(100) >= .03
+
+
+def test_pacer_keeps_to_the_frame_rate():
+    pacer = FramePacer(fps=50)
+    start = time.perf_counter()
+
+    for _ in range(6):
+        pacer.begin_frame()
+        pacer.end_frame()
+
+    # The first tick doesn't wait, the others wait out 20 ms each.
+    assert time.perf_counter() - start >= .09
+
+
+def test_percentiles():
+    pacer = FramePacer(history=5)
+
+    assert pacer.percentile(50) == pacer.average() == 0
+
+    # Only the last 5 frames are kept.
+    pacer.frame_times.extend([.5, .1, .4, .2, .3, .6])
+
+    assert pacer.percentile(0) == .1
+    assert pacer.percentile(50) == .3
+    assert pacer.percentile(75) == .4
+    assert pacer.percentile(100) == .6
+
+
+def test_overlay_draws_only_over_its_rect(display):
+    pacer = FramePacer()
+    overlay = FrameTimeOverlay(display, pacer)
+    overlay.render()
+
+    display.fill((255, 255, 255))
+    overlay.draw(display.get_rect().inflate(0, -100))
+    assert display.get_at(overlay.rect.topleft)[:3] == (255, 255, 255)
+
+    overlay.draw()
+    assert overlay.rect.bottom == display.get_height()
+    assert display.get_at((overlay.rect.right - 1,
+            overlay.rect.top))[:3] == (0, 0, 0)
@@ -0,0 +1,62 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import pytest
+from board import popcount
+from levelpack import LevelPack, write_pack
+from levels import LevelGenerator
+from solver import get_solver
+
+
+@pytest.fixture
+def levels():
+    generator = LevelGenerator(5, 3, 9, random.Random(3))
+    return [generator.generate_presses() for _ in range(200)]
+
+
+def test_level_pack_round_trip(tmp_path, levels):
+    path = str(tmp_path / 'levels.lpk')
+
+    write_pack(path, 5, levels, 'plus')
+    pack = LevelPack(path)
+
+    assert (len(pack), pack.size, pack.topology) == (200, 5, 'plus')
+    assert sorted(pack.presses(position)
+            for position in range(200)) == sorted(levels)
+
+    histogram = {}
+    for presses in levels:
+        histogram[popcount(presses)] = histogram.get(popcount(presses), 0) + 1
+    assert pack.moves_histogram() == histogram
+
+    pack.close()
+
+
+def test_pack_levels_are_in_band(tmp_path, levels):
+    path = str(tmp_path / 'levels.lpk')
+    write_pack(path, 5, levels, 'plus')
+    pack = LevelPack(path)
+
+    solver = get_solver(5)
+    source = pack.generator(5, 6, random.Random(1))
+    for _ in range(20):
+        level = source.generate()
+        assert 5 <= len(level) <= 6
+        assert solver.moves(solver.press_pattern(i * 5 + j
+                for i, j in level)) == level
+
+    with pytest.raises(ValueError):
+        pack.generator(10, 12)
+
+    pack.close()
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'levels.lpk'
+    path.write_bytes(b'\0' * 64)
+
+    with pytest.raises(ValueError):
+        LevelPack(str(path))
@@ -0,0 +1,86 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import sys
+import random
+import subprocess
+import pytest
+from board import popcount
+from levels import LevelGenerator, LevelPool, difficulty_band
+from levels import max_minimal_moves
+from solver import get_solver
+from topology import TOPOLOGIES
+from test_solver import fewest_presses
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('topology', sorted(TOPOLOGIES))
+@pytest.mark.parametrize('size', [1, 2, 3, 4])
+def test_max_minimal_moves(size, topology):
+    assert max_minimal_moves(get_solver(size, topology)) == max(
+            fewest_presses(size, topology).values())
+
+
+def test_unreachable_band_is_rejected():
+
+    # No 4x4 level takes more than 7 moves.
+    with pytest.raises(ValueError):
+        LevelGenerator.for_difficulty(4, 'hard')
+
+    LevelGenerator(4, 7, 7)
+
+
+@pytest.mark.parametrize('difficulty', ['easy', 'normal', 'hard'])
+def test_levels_are_minimal_and_in_band(difficulty):
+    generator = LevelGenerator.for_difficulty(5, difficulty,
+            random.Random(1))
+    min_moves, max_moves = difficulty_band(5, difficulty)
+
+    for _ in range(50):
+        presses = generator.generate_presses()
+        assert min_moves <= popcount(presses) <= max_moves
+        assert generator.solver.minimize(presses) == presses
+
+
+def test_seeded_pool_gives_the_same_levels():
+    levels = []
+
+    for _ in range(2):
+        pool = LevelPool(LevelGenerator.for_difficulty(5,
+                rng=random.Random(7)), capacity=4)
+        levels.append([pool.take() for _ in range(10)])
+        pool.close()
+
+    assert levels[0] == levels[1]
+
+
+class FailingGenerator(object):
+
+    def generate(self):
+        raise ValueError('No level.')
+
+
+def test_pool_raises_what_its_thread_did():
+    pool = LevelPool(FailingGenerator())
+
+    with pytest.raises(ValueError, match='No level'):
+        pool.take()
+
+    pool.thread.join(1)
+    assert not pool.thread.is_alive()
+
+
+@pytest.mark.parametrize('args', [['--size', '4', '--difficulty', 'hard'],
+        ['--states', '3', '--level-pack', 'levels.lpk']])
+def test_main_reports_settings_it_cant_start_with(args):
+    result = subprocess.run([sys.executable, 'main.py'] + args, cwd=ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, timeout=60)
+
+    assert result.returncode == 2
+    assert 'main.py: error:' in result.stderr
+    assert 'Traceback' not in result.stderr
@@ -0,0 +1,47 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from app import App
+from memory import app_report
+
+
+def report_rows(app):
+    return dict((row[0], row[1:]) for row in app_report(app).rows)
+
+
+def test_shared_objects_arent_counted_under_the_states(display):
+    app = App(seed=1)
+    app.menu
+
+    # Levels the pool adds would change which row small ints count in.
+    app.level_pool.close()
+    app.level_pool.thread.join()
+
+    before = report_rows(app)
+
+    # Timers reached from the game through the scheduler it shares.
+    for _ in range(100):
+        app.scheduler.call_later(60, len, bytearray(8000))
+
+    after = report_rows(app)
+
+    # Small ints are shared by everything, and might move between rows.
+    assert abs(after['game'][3] - before['game'][3]) < 1000
+    assert abs(after['menu'][3] - before['menu'][3]) < 1000
+    assert after['scheduler'][3] > before['scheduler'][3] + 100 * 8000
+
+
+def test_report_covers_the_app(display):
+    app = App(seed=1, states=3)
+    report = app_report(app)
+
+    names = [row[0] for row in report.rows]
+    assert names[:6] == ['display', 'assets', 'solver matrices',
+            'level pool', 'scheduler', 'app']
+
+    # Surfaces are only counted once, the display's with the display.
+    assert report.rows[0][1] == 1
+    assert report.rows[1][1] >= 3
+    assert 'total' in report.format()
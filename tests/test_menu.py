@@ -0,0 +1,58 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import pygame
+from pygame.locals import MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+from menu import MenuButtonBar
+
+
+def mouse(type_, pos, button=1):
+    return pygame.event.Event(type_, pos=pos, button=button)
+
+
+def test_button_index_finds_what_a_scan_does(display):
+    bar = MenuButtonBar(display)
+
+    for y in range(-5, bar.rect.height + 5):
+        for x in range(0, bar.rect.width, 7):
+            under = [button for button in bar.buttons
+                    if button.contains((x, y))]
+            assert bar.button_at((x, y)) is (under[0] if under else None)
+
+
+def test_click_emits_the_buttons_event(display):
+    bar = MenuButtonBar(display, solve_button=False)
+    clicks = []
+    bar.listen('*', lambda event: clicks.append(event.type))
+
+    restart = bar.buttons[1].rect.move(bar.rect.topleft).center
+    bar.handle(mouse(MOUSEBUTTONDOWN, restart))
+    bar.handle(mouse(MOUSEBUTTONUP, restart))
+
+    # Released off the button it was pressed on.
+    bar.handle(mouse(MOUSEBUTTONDOWN, restart))
+    bar.handle(mouse(MOUSEBUTTONUP, (0, 0)))
+
+    assert clicks == ['restart-click']
+
+
+def test_only_pressed_buttons_are_redrawn(display):
+    bar = MenuButtonBar(display)
+    bar.draw()
+
+    pos = bar.buttons[0].rect.move(bar.rect.topleft).center
+    bar.handle(pygame.event.Event(MOUSEMOTION, pos=pos, rel=(1, 1),
+            buttons=(0, 0, 0)))
+    bar.handle(mouse(MOUSEBUTTONDOWN, pos, button=3))
+    assert bar.dirty_rects() == []
+
+    bar.handle(mouse(MOUSEBUTTONDOWN, pos))
+    assert bar.dirty_rects() == [bar.buttons[0].rect.move(bar.rect.topleft)]
+
+    bar.draw()
+    assert bar.dirty_rects() == []
+
+    bar.handle(mouse(MOUSEBUTTONUP, pos))
+    assert len(bar.dirty_rects()) == 1
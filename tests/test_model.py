@@ -0,0 +1,160 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import pytest
+from board import popcount
+from model import CyclicGameModel, GameModel
+
+
+def random_moves(size, count, seed):
+    rng = random.Random(seed)
+    return [(rng.randrange(size), rng.randrange(size)) for _ in range(count)]
+
+
+def test_presses_solve_the_board():
+    model = GameModel(5, level=[(0, 0), (1, 2)])
+
+    for i, j in random_moves(5, 30, 2):
+        model.press(i, j)
+
+        board = model.make_board()
+        board.state = model.board.state
+        board.apply_moves(model.solver.moves(model.presses))
+        assert board.is_solved()
+
+
+@pytest.mark.parametrize('size', [4, 5, 9])
+def test_tracked_solution_stays_minimal(size):
+    model = GameModel(size, rng=random.Random(size))
+    solver = model.solver
+    rng = random.Random(size)
+
+    for step in range(60):
+        # Mostly moves of the solution, which keep it minimal without
+        # reducing it again, and some others.
+        solution = model.solution
+        if solution and step % 3:
+            i, j = rng.choice(solution)
+        else:
+            i, j = rng.randrange(size), rng.randrange(size)
+
+        model.press(i, j)
+
+        expected = solver.solve(model.board.state)
+        assert popcount(model.solution_presses()) == popcount(expected)
+
+        hint = model.hint()
+        assert (hint is None) == model.board.is_solved()
+        if hint is not None:
+            assert hint in model.solution
+
+
+def test_without_minimal_the_presses_are_the_solution():
+    model = GameModel(4, level=[(0, 0), (0, 0), (1, 1)], minimal=False)
+    assert model.solution == [(1, 1)]
+
+    model.press(2, 2)
+    assert model.solution == [(1, 1), (2, 2)]
+
+
+def test_undo_and_redo():
+    model = GameModel(5, level=[(0, 0), (2, 3), (4, 4)])
+    start = model.snapshot()
+    moves = random_moves(5, 10, 1)
+    snapshots = []
+
+    for i, j in moves:
+        model.press(i, j)
+        snapshots.append(model.snapshot())
+
+    for snapshot in reversed(snapshots[:-1]):
+        assert model.undo()
+        assert model.snapshot()[:2] == snapshot[:2]
+
+    assert model.undo()
+    assert model.snapshot()[:2] == start[:2]
+    assert not model.undo()
+
+    for snapshot in snapshots:
+        assert model.redo()
+        assert model.snapshot()[:2] == snapshot[:2]
+
+    assert not model.redo()
+
+
+def test_a_move_clears_the_redo_history():
+    model = GameModel(5, level=[(1, 1)])
+    model.press(0, 0)
+    model.undo()
+    model.press(4, 4)
+
+    assert not model.redo()
+    assert model.history == [24]
+
+
+def test_solution_stays_minimal_through_undo():
+    model = GameModel(5, rng=random.Random(5))
+
+    for i, j in random_moves(5, 20, 5):
+        model.press(i, j)
+        model.solution_presses()
+
+        if i < 2:
+            model.undo()
+
+        assert popcount(model.solution_presses()) == popcount(
+                model.solver.solve(model.board.state))
+
+
+def test_restore_puts_the_game_back():
+    model = GameModel(5, level=[(2, 2)])
+    snapshot = model.snapshot()
+    solution = model.solution
+
+    model.press(0, 0)
+    model.press(1, 4)
+    model.restore(snapshot)
+
+    assert model.snapshot() == snapshot
+    assert model.solution == solution
+    assert model.lights_left == popcount(model.board.state)
+
+
+def test_cyclic_undo_redo_and_minimal():
+    model = CyclicGameModel(4, level=[(0, 0), (1, 2), (1, 2)], states=3)
+    start = model.snapshot()
+    solver = model.solver
+
+    for i, j in random_moves(4, 12, 3):
+        model.press(i, j)
+        assert sum(model.solution_presses()) == sum(solver.solve(
+                model.board.state))
+
+    while model.undo():
+        pass
+
+    assert model.snapshot()[:2] == start[:2]
+
+    while model.redo():
+        pass
+
+    board = model.make_board()
+    board.state = model.board.state
+    board.apply_moves(model.solution)
+    assert board.is_solved()
+
+
+@pytest.mark.parametrize('topology', ['torus', 'king', 'king-torus'])
+def test_presses_solve_other_topologies(topology):
+    model = GameModel(6, level=[(0, 0), (5, 5)], topology=topology)
+
+    for i, j in random_moves(6, 10, 6):
+        model.press(i, j)
+
+    board = model.make_board()
+    board.state = model.board.state
+    board.apply_moves(model.solution)
+    assert board.is_solved()
@@ -0,0 +1,67 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import pytest
+from profiler import Profiler
+
+
+class Work(object):
+
+    def step(self, value):
+        return value * 2
+
+    def fail(self):
+        raise ValueError('Failed.')
+
+
+def test_instrumented_calls_are_timed_once():
+    profiler = Profiler()
+    work = Work()
+
+    profiler.instrument(work, 'step')
+    profiler.instrument(work, 'step')
+    profiler.instrument(work, 'missing')
+
+    assert work.step(21) == 42
+    assert [name for name, _, _ in profiler.samples()] == ['Work.step']
+
+
+def test_calls_that_raise_are_timed():
+    profiler = Profiler()
+    work = Work()
+    profiler.instrument(work, 'fail', name='fail')
+
+    with pytest.raises(ValueError):
+        work.fail()
+
+    assert [name for name, _, _ in profiler.samples()] == ['fail']
+
+
+def test_ring_buffer_keeps_the_newest():
+    profiler = Profiler(capacity=4)
+
+    for index in range(10):
+        profiler.record(str(index), index, 1)
+
+    assert [name for name, _, _ in profiler.samples()] == ['6', '7', '8',
+            '9']
+
+
+def test_trace_file(tmp_path):
+    profiler = Profiler()
+    profiler.record('draw', profiler.origin + .5, .002)
+
+    path = str(tmp_path / 'trace.json')
+    profiler.dump(path)
+
+    with open(path) as trace_file:
+        events = json.load(trace_file)['traceEvents']
+
+    assert events[0]['ph'] == 'M'
+    assert events[1]['name'] == 'draw'
+    assert events[1]['ph'] == 'X'
+    assert events[1]['ts'] == pytest.approx(500000)
+    assert events[1]['dur'] == pytest.approx(2000)
@@ -0,0 +1,107 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import pygame
+import pytest
+from pygame.locals import KEYDOWN, MOUSEBUTTONDOWN, MOUSEBUTTONUP
+from pygame.locals import MOUSEMOTION, MOUSEWHEEL, QUIT, K_z, KMOD_CTRL
+from app import App
+from replay import InputRecorder, ReplayClock, read_log, replay
+
+# Frame time of the main loop while something is running, in seconds.
+FRAME = 1 / 60
+
+
+def test_input_log_round_trip(tmp_path):
+    path = str(tmp_path / 'session.lpr')
+    clock = ReplayClock()
+    events = [
+        pygame.event.Event(MOUSEBUTTONDOWN, button=1, pos=(10, 200)),
+        pygame.event.Event(MOUSEMOTION, pos=(11, 201), rel=(1, -1),
+                buttons=(0, 1, 1)),
+        pygame.event.Event(MOUSEWHEEL, x=0, y=-2, pos=(30, 40)),
+        pygame.event.Event(KEYDOWN, key=K_z, mod=KMOD_CTRL),
+        pygame.event.Event(QUIT),
+    ]
+
+    recorder = InputRecorder(path, 1234, {'game_size': 5}, clock)
+    for milliseconds, event in enumerate(events):
+        clock.time = milliseconds * .25
+        recorder.record(event)
+    recorder.close()
+
+    seed, settings, replayed = read_log(path)
+
+    assert (seed, settings) == (1234, {'game_size': 5})
+    assert [milliseconds for milliseconds, _ in replayed] == [0, 250, 500,
+            750, 1000]
+    assert [event.type for _, event in replayed] == [event.type
+            for event in events]
+
+    for event, (_, other) in zip(events, replayed):
+        for name, value in event.__dict__.items():
+            assert getattr(other, name) == value
+
+
+def play(app, clock, timed_events):
+    """Give the `(milliseconds, event)` pairs to `app` at their time, running
+    its timers in between like `App.main_loop` does."""
+
+    for milliseconds, event in timed_events:
+        seconds = milliseconds / 1000
+
+        while True:
+            timeout = app.scheduler.timeout()
+
+            if timeout is None or clock.time + timeout > seconds:
+                break
+
+            clock.time += max(timeout, FRAME)
+            app.update()
+            app.draw()
+
+        clock.time = seconds
+        app.handle(event)
+        app.update()
+        app.draw()
+
+
+def click(milliseconds, pos):
+    return [(milliseconds, pygame.event.Event(MOUSEBUTTONDOWN, button=1,
+            pos=pos)), (milliseconds + 50, pygame.event.Event(MOUSEBUTTONUP,
+                button=1, pos=pos))]
+
+
+def cell_center(app, i, j):
+    pitch = app.game.light_size + app.game.light_gap
+    return (int(app.game.board_x + j * pitch + app.game.light_size // 2),
+            int(app.game.board_y + i * pitch + app.game.light_size // 2))
+
+
+@pytest.mark.parametrize('speed', [1, 3])
+def test_replay_ends_where_the_recording_did(display, tmp_path, speed):
+    path = str(tmp_path / 'session.lpr')
+    clock = ReplayClock()
+    app = App(seed=11, record_path=path, speed=speed, clock=clock)
+
+    play(app, clock, click(100, app.game.menu_btn.rect.center))
+    bar = app.menu.menu_bar
+    solve = bar.buttons[2].rect.move(bar.rect.topleft).center
+
+    # A click on the board while the solver plays its moves does nothing. The
+    # next one, once it's done, toggles the cell.
+    play(app, clock, click(400, solve) + click(900, cell_center(app, 0, 0)) +
+            click(60000, cell_center(app, 1, 1)) +
+            [(60500, pygame.event.Event(KEYDOWN, key=K_z, mod=0))])
+
+    app.recorder.close()
+    app.level_pool.close()
+    recorded = app.game.board.state
+
+    replayed, stats = replay(path)
+
+    assert stats['events'] == 9
+    assert replayed.game.board.state == recorded
+    assert replayed.game.model.history == app.game.model.history == [6]
@@ -0,0 +1,100 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import pytest
+from scheduler import INSTANT, Scheduler
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.time = 0.
+
+    def __call__(self):
+        return self.time
+
+
+def test_instant_runs_timers_in_deadline_order():
+    scheduler = Scheduler(Clock(), INSTANT)
+    calls = []
+
+    scheduler.call_later(3, calls.append, 'c')
+    scheduler.call_later(1, calls.append, 'a')
+    scheduler.call_later(2, calls.append, 'b1')
+    scheduler.call_later(2, calls.append, 'b2')
+    scheduler.call_later(0, calls.append, 'now')
+
+    assert scheduler.timeout() == 0
+    scheduler.advance()
+
+    assert calls == ['now', 'a', 'b1', 'b2', 'c']
+    assert scheduler.now == 3
+    assert scheduler.timeout() is None
+
+
+def test_instant_runs_timers_set_from_timers():
+    scheduler = Scheduler(Clock(), INSTANT)
+    calls = []
+
+    def step(count):
+        calls.append((count, scheduler.now))
+
+        if count < 3:
+            scheduler.call_later(.5, step, count + 1)
+
+    scheduler.call_later(1, step, 0)
+    scheduler.call_later(1.8, calls.append, 'between')
+    scheduler.advance()
+
+    assert calls == [(0, 1), (1, 1.5), 'between', (2, 2), (3, 2.5)]
+
+
+def test_timers_run_when_the_clock_reaches_them():
+    clock = Clock()
+    scheduler = Scheduler(clock, speed=2)
+    calls = []
+
+    timer = scheduler.call_later(1, calls.append, 'cancelled')
+    scheduler.call_later(1, calls.append, 'a')
+    scheduler.call_later(3, calls.append, 'b')
+    timer.cancel()
+
+    assert scheduler.timeout() == .5
+
+    clock.time = .4
+    scheduler.advance()
+    assert calls == []
+    assert scheduler.timeout() == pytest.approx(.1)
+
+    clock.time = 1
+    scheduler.advance()
+    assert calls == ['a']
+
+    clock.time = 1.5
+    scheduler.advance()
+    assert calls == ['a', 'b']
+    assert scheduler.timeout() is None
+
+
+def test_tweens():
+    clock = Clock()
+    scheduler = Scheduler(clock)
+    progress = []
+    done = []
+
+    scheduler.tween(2, progress.append, lambda: done.append(True))
+    assert scheduler.timeout() == 0
+
+    for clock.time in (1, 3):
+        scheduler.advance()
+
+    assert progress == [0, .5, 1]
+    assert done == [True]
+    assert scheduler.timeout() is None
+
+    scheduler.speed = INSTANT
+    scheduler.tween(10, progress.append)
+    scheduler.advance()
+    assert progress[-2:] == [0, 1]
@@ -0,0 +1,195 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import random
+import asyncio
+import pytest
+
+pytest.importorskip('numpy')
+
+from board import popcount
+from server import GameServer
+from solver import get_solver
+
+
+class Client(object):
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.request_id = 0
+
+    async def send_line(self, line):
+        self.writer.write(line + b'\n')
+        return json.loads((await self.reader.readline()).decode('utf-8'))
+
+    async def call(self, op, **request):
+        self.request_id += 1
+        request.update(id=self.request_id, op=op)
+
+        reply = await self.send_line(json.dumps(request).encode('utf-8'))
+        assert reply.pop('id') == self.request_id
+        return reply
+
+    async def call_all(self, requests):
+        """Send all of `requests` at once, and return their replies in the
+        same order, whatever order they come back in."""
+
+        for request_id, request in enumerate(requests, 1):
+            self.writer.write(json.dumps(dict(request,
+                    id=request_id)).encode('utf-8') + b'\n')
+
+        replies = {}
+        for _ in requests:
+            reply = json.loads((await self.reader.readline()).decode('utf-8'))
+            replies[reply.pop('id')] = reply
+
+        return [replies[request_id]
+                for request_id in range(1, len(requests) + 1)]
+
+
+def run(scenario, seed=None):
+    """Run `scenario(client, server)` against a new server on its own event
+    loop, and return what it returns."""
+
+    async def main():
+        server = GameServer(random.Random(seed))
+        listener = await asyncio.start_server(server.handle_connection,
+                '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+        try:
+            return await scenario(Client(reader, writer), server)
+        finally:
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            server.shutdown(wait=True)
+
+    return asyncio.run(main())
+
+
+def test_session_round_trip():
+
+    async def scenario(client, server):
+        game = await client.call('new', size=5, difficulty='easy')
+        session = game['session']
+        state = int(game['state'], 16)
+        solver = get_solver(5)
+        moves = [list(move) for move in solver.moves(solver.solve(state))]
+
+        assert game['moves'] == 0 and not game['solved']
+
+        hint = await client.call('hint', session=session)
+        assert hint['hint'] in moves
+
+        pressed = await client.call('press', session=session,
+                moves=moves[:1])
+        assert pressed['moves'] == 1
+        assert (await client.call('state', session=session)) == pressed
+
+        # Submitted moves count from the level's start, not the board now.
+        result = await client.call('submit', session=session, moves=moves)
+        assert result == {'solved': True, 'moves': len(moves),
+                'minimal': len(moves)}
+
+        pressed = await client.call('press', session=session,
+                moves=moves[1:])
+        assert pressed['solved']
+
+        assert (await client.call('close', session=session)) == {
+                'closed': True}
+        assert 'error' in await client.call('state', session=session)
+
+    run(scenario)
+
+
+def test_validate():
+
+    async def scenario(client, server):
+        solver = get_solver(7, 'torus')
+        state = 0x1234567 << 20
+        solution = solver.solve(state)
+        moves = [list(move) for move in solver.moves(solution)]
+
+        replies = await client.call_all([
+            {'op': 'validate', 'size': 7, 'topology': 'torus',
+                'state': format(state, 'x'), 'moves': moves},
+            {'op': 'validate', 'size': 7, 'topology': 'torus',
+                'state': format(state, 'x'), 'moves': moves[1:]},
+        ])
+
+        assert replies == [
+            {'solved': True, 'moves': len(moves),
+                'minimal': popcount(solution)},
+            {'solved': False, 'moves': len(moves) - 1,
+                'minimal': popcount(solution)},
+        ]
+
+        # Both came in on the same turn, so they were checked together.
+        assert (server.validator.batches, server.validator.checks) == (1, 2)
+
+    run(scenario)
+
+
+@pytest.mark.parametrize('request_', [
+    {'op': 'jump'},
+    {'op': 'state', 'session': 1},
+    {'op': 'new', 'size': 4, 'difficulty': 'hard'},
+    {'op': 'new', 'difficulty': 'impossible'},
+    {'op': 'new', 'size': 65},
+    {'op': 'new', 'size': 33, 'topology': 'king'},
+    {'op': 'new', 'size': 5.0},
+    {'op': 'new', 'topology': 'hex'},
+    {'op': 'new', 'seed': [1]},
+    {'op': 'validate', 'state': 'lit'},
+    {'op': 'validate', 'state': '2000000'},
+    {'op': 'validate', 'state': '1', 'moves': [[0, 5]]},
+    {'op': 'validate', 'state': '1', 'moves': [[0.0, 1]]},
+    {'op': 'validate', 'state': '1', 'moves': [[True, 1]]},
+    {'op': 'validate', 'state': '1', 'moves': [[0, 1, 2]]},
+    {'op': 'validate', 'state': '1', 'moves': 'a1'},
+])
+def test_bad_requests_get_an_error(request_):
+
+    async def scenario(client, server):
+        reply = await client.call(**request_)
+        assert list(reply) == ['error']
+
+        # The connection is still good.
+        assert 'session' in await client.call('new', size=3)
+
+    run(scenario)
+
+
+def test_lines_that_arent_requests_get_an_error():
+
+    async def scenario(client, server):
+        assert 'error' in await client.send_line(b'{"op": ')
+        assert 'error' in await client.send_line(b'[1, 2]')
+        assert 'session' in await client.call('new', size=3)
+
+    run(scenario)
+
+
+def test_seeded_servers_make_the_same_levels():
+    requests = [{'op': 'new', 'size': size, 'difficulty': 'easy'}
+            for size in (5, 3, 9, 5, 4, 7, 5, 6)]
+
+    async def scenario(client, server):
+        replies = await client.call_all(requests)
+        return [(reply['session'], reply['state']) for reply in replies]
+
+    assert run(scenario, seed=7) == run(scenario, seed=7)
+
+
+def test_seeded_levels_are_the_same_on_any_server():
+
+    async def scenario(client, server):
+        return await client.call('new', size=6, seed='daily')
+
+    assert run(scenario, seed=1)['state'] == run(scenario, seed=2)['state']
@@ -0,0 +1,140 @@
+# encoding: utf-8
+
+"""The solvers against every press pattern of small boards, made from the
+toggle masks alone."""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import itertools
+import pytest
+from board import CyclicBoard, popcount, toggle_masks
+from solver import MatrixSolver, get_solver
+from topology import TOPOLOGIES, Topology, get_topology
+
+
+def fewest_presses(size, topology='plus'):
+    """The fewest presses that make each position reachable on an empty
+    board, by making every press pattern in Gray code order."""
+
+    masks = toggle_masks(size, topology)
+    fewest = {0: 0}
+    state = presses = 0
+
+    for step in range(1, 1 << len(masks)):
+        bit = (step & -step).bit_length() - 1
+        presses ^= 1 << bit
+        state ^= masks[bit]
+
+        if popcount(presses) < fewest.get(state, len(masks) + 1):
+            fewest[state] = popcount(presses)
+
+    return fewest
+
+
+def press_position(presses, masks):
+    state = 0
+    for index, mask in enumerate(masks):
+        if presses >> index & 1:
+            state ^= mask
+
+    return state
+
+
+@pytest.mark.parametrize('topology', sorted(TOPOLOGIES))
+@pytest.mark.parametrize('size', [1, 2, 3, 4])
+def test_solutions_are_minimal(size, topology):
+    solver = get_solver(size, topology)
+    masks = toggle_masks(size, topology)
+    fewest = fewest_presses(size, topology)
+
+    for state in range(1 << (size * size)):
+        presses = solver.solve(state)
+
+        if state not in fewest:
+            assert presses is None
+        else:
+            assert press_position(presses, masks) == state
+            assert popcount(presses) == fewest[state]
+
+
+def test_big_board_is_solved():
+    solver = get_solver(100)
+    masks = toggle_masks(100)
+    rng = random.Random(100)
+    presses = 0
+
+    for index in rng.sample(range(len(masks)), 500):
+        presses |= 1 << index
+
+    state = press_position(presses, masks)
+    solution = solver.solve(state)
+
+    assert press_position(solution, masks) == state
+    assert popcount(solution) <= popcount(presses)
+
+
+def test_moves_and_press_pattern_agree():
+    solver = get_solver(5)
+    moves = [(0, 0), (1, 3), (4, 4)]
+
+    presses = solver.press_pattern(i * 5 + j for i, j in moves)
+
+    assert solver.moves(presses) == moves
+    assert solver.count(presses) == 3
+
+
+@pytest.mark.parametrize('topology', ['plus', 'torus'])
+@pytest.mark.parametrize('size, states', [(2, 3), (3, 3), (2, 5)])
+def test_modular_solutions_are_minimal(size, states, topology):
+    solver = get_solver(size, topology, states)
+    neighbours = get_topology(topology).neighbours(size)
+    cells = size * size
+
+    # Making the moves of `presses` on a board turns it off when the board
+    # is what they make of an empty one, stepped backwards.
+    fewest = {}
+    for presses in itertools.product(range(states), repeat=cells):
+        made = [0] * cells
+        for index, count in enumerate(presses):
+            for cell in neighbours[index]:
+                made[cell] += count
+
+        state = bytes(-value % states for value in made)
+        fewest[state] = min(fewest.get(state, sum(presses)), sum(presses))
+
+    for state in itertools.product(range(states), repeat=cells):
+        state = bytes(state)
+        presses = solver.solve(state)
+
+        if state not in fewest:
+            assert presses is None
+            continue
+
+        board = CyclicBoard(size, states, state, topology)
+        board.apply_moves(solver.moves(presses))
+        assert board.is_solved()
+        assert sum(presses) == fewest[state]
+
+
+def test_modular_solvers_are_limited():
+
+    with pytest.raises(ValueError):
+        get_solver(3, 'plus', 4)
+
+
+def test_topologies_with_the_same_name_get_their_own_solver():
+    plus = Topology.from_pattern('.#.\n###\n.#.', name='custom')
+    cross = Topology.from_pattern('#.#\n.#.\n#.#', name='custom')
+    impostor = Topology.from_pattern('#.#\n.#.\n#.#', name='plus')
+
+    assert plus.key != cross.key
+    assert get_solver(4, plus) is not get_solver(4, cross)
+    assert isinstance(get_solver(4, impostor), MatrixSolver)
+
+    for topology in (plus, cross, impostor):
+        masks = toggle_masks(4, topology)
+        state = masks[0] ^ masks[5]
+        assert press_position(get_solver(4, topology).solve(state),
+                masks) == state
@@ -0,0 +1,53 @@
+# encoding: utf-8
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import pytest
+
+pytest.importorskip('numpy')
+
+import solver
+from statespace import StateTable, build_table, check_table
+from test_solver import fewest_presses
+
+
+@pytest.mark.parametrize('size, topology', [(3, 'torus'), (4, 'plus')])
+def test_state_table_round_trip(tmp_path, size, topology):
+    path = str(tmp_path / 'states.lps')
+    histogram = build_table(path, size, topology, jobs=2)
+    table = StateTable(path)
+    fewest = fewest_presses(size, topology)
+    total = 1 << (size * size)
+
+    assert (len(table), table.size, table.topology) == (total, size,
+            topology)
+
+    for state in range(total):
+        assert table.moves(state) == fewest.get(state)
+
+    assert sum(histogram.values()) == total
+    assert table.moves_histogram() == histogram
+    assert check_table(table, 200, 'easy', seed=1) == []
+
+    table.close()
+
+
+def test_check_finds_a_wrong_solver(tmp_path, monkeypatch):
+    path = str(tmp_path / 'states.lps')
+    build_table(path, 4, jobs=1)
+    table = StateTable(path)
+
+    # Solutions that are never reduced to the fewest moves.
+    monkeypatch.setattr(solver.BoardSolver, 'minimize',
+            lambda self, presses: presses)
+
+    assert check_table(table, 200, 'easy', seed=1)
+
+    table.close()
+
+
+def test_boards_past_the_table_budget_are_refused(tmp_path):
+
+    with pytest.raises(ValueError):
+        build_table(str(tmp_path / 'states.lps'), 6)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""Which cells a move toggles.
+
+A topology is a neighbourhood, given as `(di, dj)` offsets from the pressed
+cell, and whether the board wraps around at its edges. Its neighbour tables
+are computed once per board size, so that a move is a plain loop over a tuple
+of cell indexes, or a single XOR with a mask, and never checks the edges.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import zlib
+
+PLUS_OFFSETS = ((0, 0), (0, 1), (0, -1), (1, 0), (-1, 0))
+KING_OFFSETS = tuple((di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1))
+
+
+class Topology(object):
+    """A named neighbourhood. `name` is what the matrix cache and level packs
+    store, so it must fit in 16 ASCII characters.
+
+    Names are chosen freely, so what's computed from a topology is cached by
+    its `key` instead, which also has a digest of the offsets and wrapping.
+    """
+
+    def __init__(self, name, offsets, wrap=False):
+
+        if len(name.encode('ascii')) > 16:
+            raise ValueError('Topology names are at most 16 characters, got '
+                    '{!r}.'.format(name))
+
+        self.name = name
+        self.offsets = tuple(offsets)
+        self.wrap = wrap
+
+        self.key = '{}-{:08x}'.format(name, zlib.crc32('{}{}'.format(
+                sorted(set(self.offsets)), wrap).encode('ascii')))
+
+        # Whether a move at `a` toggles `b` exactly when a move at `b` toggles
+        # `a`, which makes the toggle matrix symmetric.
+        self.is_symmetric = set(self.offsets) == set(
+                (-di, -dj) for di, dj in self.offsets)
+
+        self._neighbours = {}
+        self._masks = {}
+
+    @classmethod
+    def from_pattern(cls, pattern, wrap=False, name=None):
+        """A topology from a picture of the neighbourhood, such as
+
+            .#.
+            ###
+            .#.
+
+        with `#` for toggled cells, anything else for the others. The pattern
+        has an odd number of rows and columns, the middle one being the
+        pressed cell.
+        """
+
+        rows = [row.strip() for row in pattern.strip().splitlines()]
+        height, width = len(rows), len(rows[0])
+
+        if (height % 2 == 0 or width % 2 == 0 or
+                any(len(row) != width for row in rows)):
+            raise ValueError('A neighbourhood pattern must be a rectangle of '
+                    'odd width and height.')
+
+        offsets = [(i - height // 2, j - width // 2)
+                for i, row in enumerate(rows)
+                for j, char in enumerate(row) if char == '#']
+
+        if name is None:
+            # Only needed here, and slow to import for the game's start.
+            import hashlib
+
+            digest = hashlib.sha1('{}{}'.format(sorted(offsets),
+                    wrap).encode('ascii')).hexdigest()
+            name = 'custom-' + digest[:9]
+
+        return cls(name, offsets, wrap)
+
+    def neighbours(self, size):
+        """A tuple per cell of a `size` x `size` board, of the indexes of the
+        cells a move there toggles. Cell `(i, j)` is index `i * size + j`."""
+
+        try:
+            return self._neighbours[size]
+        except KeyError:
+            pass
+
+        table = []
+
+        for i in range(size):
+            for j in range(size):
+                cells = []
+
+                for di, dj in self.offsets:
+                    ni, nj = i + di, j + dj
+
+                    if self.wrap:
+                        ni, nj = ni % size, nj % size
+                    elif not (0 <= ni < size and 0 <= nj < size):
+                        continue
+
+                    index = ni * size + nj
+
+                    # On small wrapped boards, two offsets can land on the
+                    # same cell.
+                    if index not in cells:
+                        cells.append(index)
+
+                table.append(tuple(cells))
+
+        self._neighbours[size] = table
+        return table
+
+    def masks(self, size):
+        """The `neighbours(size)` of each cell as a bit mask."""
+
+        try:
+            return self._masks[size]
+        except KeyError:
+            pass
+
+        masks = self._masks[size] = [sum(1 << index for index in cells)
+                for cells in self.neighbours(size)]
+        return masks
+
+    def __unicode__(self):
+        return '<Topology {}>'.format(self.name)
+
+    __str__ = __repr__ = __unicode__
+
+
+TOPOLOGIES = dict((topology.name, topology) for topology in [
+    Topology('plus', PLUS_OFFSETS),
+    Topology('torus', PLUS_OFFSETS, wrap=True),
+    Topology('king', KING_OFFSETS),
+    Topology('king-torus', KING_OFFSETS, wrap=True),
+])
+
+DEFAULT_TOPOLOGY = 'plus'
+
+
+def get_topology(topology=DEFAULT_TOPOLOGY):
+    """The `Topology` named `topology`, or `topology` itself if it already is
+    one."""
+
+    if isinstance(topology, Topology):
+        return topology
+
+    try:
+        return TOPOLOGIES[topology]
+    except KeyError:
+        raise ValueError('Unknown topology {!r}, expected one of {}.'.format(
+                topology, ', '.join(sorted(TOPOLOGIES))))